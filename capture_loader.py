@@ -0,0 +1,234 @@
+import io
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# BinaryLog only needs NumPy, so it is imported on its own rather than through the
+# modules package, which would pull in the Wi-Fi collectors
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main', 'modules'))
+from BinaryLog import is_binary_log, read_binary_log
+
+'''
+Shared loader for capture files used by the plot scripts.
+
+CSV captures are read in fixed-size byte blocks and each block is parsed with
+the pandas C engine, so counting lines, skipping malformed rows and converting
+values happen in a single pass over the file. Only the requested columns are
+kept, as one compact float64 array instead of a DataFrame of the whole file.
+
+Binary logs written by CSVLogger(log_format='binary') (see main/modules/BinaryLog.py)
+are memory-mapped directly.
+'''
+
+class Capture:
+    '''
+    Columns of a capture file as a (rows, columns) float64 array.
+    Column 0 is the timestamp in seconds since the epoch.
+    '''
+    def __init__(self, data, columns, bad_lines=0, invalid_timestamps=0, total_lines=None):
+        self.data = data
+        self.columns = list(columns)  # Column indices in the original file
+        self.bad_lines = bad_lines  # Lines that could not be parsed or had too few fields
+        self.invalid_timestamps = invalid_timestamps  # Rows dropped for a missing timestamp
+        self.total_lines = total_lines
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self.data[:, 0]
+
+    def column(self, index) -> np.ndarray:
+        '''
+        Returns a view of one column, by its position in the loaded columns.
+        '''
+        return self.data[:, index]
+
+    def datetimes(self, start=None, stop=None) -> np.ndarray:
+        '''
+        Converts (a slice of) the timestamps to datetime64[ns] without building a DataFrame.
+        '''
+        seconds = self.timestamps[start:stop]
+        return (seconds * 1e9).astype('int64').view('datetime64[ns]')
+
+    def decimated(self, index, buckets):
+        '''
+        Min/max decimated datetimes and values of one column, see minmax_indices.
+
+        :param index: Position of the column in the loaded columns.
+        :param buckets: Number of buckets, usually the plot width in pixels.
+        :return: (datetimes, values, decimated) where decimated tells if samples were dropped.
+        '''
+        values = self.column(index)
+        indices = minmax_indices(self.timestamps, values, buckets)
+        datetimes = (self.timestamps[indices] * 1e9).astype('int64').view('datetime64[ns]')
+        return datetimes, values[indices], len(indices) < len(values)
+
+    def slice(self, start=None, stop=None) -> 'Capture':
+        return Capture(self.data[start:stop], self.columns)
+
+def count_fields(path) -> int:
+    '''
+    Number of comma separated fields in the first non-empty line of a CSV file.
+    '''
+    with open(path, 'rb') as file:
+        for line in file:
+            if line.strip():
+                return line.count(b',') + 1
+    raise pd.errors.EmptyDataError(f"'{path}' is empty.")
+
+def _resolve_columns(columns, n_fields):
+    if columns is None:
+        return list(range(n_fields))
+    resolved = [c + n_fields if c < 0 else c for c in columns]
+    if any(c < 0 or c >= n_fields for c in resolved):
+        raise ValueError(f"Column index out of range for a file with {n_fields} columns.")
+    return resolved
+
+def _parse_block(block, n_fields, columns):
+    # The C engine takes the row width from the first line of the data, so every block
+    # starts with a placeholder row of the expected width, which is dropped afterwards
+    placeholder = b','.join([b'0'] * n_fields) + b'\n'
+    frame = pd.read_csv(
+        io.BytesIO(placeholder + block),
+        header=None,
+        names=list(range(n_fields)),
+        engine='c',
+        index_col=False,
+        on_bad_lines='skip',    # Skips lines with too many fields
+        float_precision='round_trip',
+        na_values=['None'],
+        skip_blank_lines=True,
+    )
+    # Columns are selected after parsing, with usecols the C engine would not skip long lines
+    frame = frame.iloc[1:][columns]
+    try:
+        return frame.to_numpy(dtype=np.float64)
+    except (ValueError, TypeError):
+        # Non-numeric fields become NaN
+        return frame.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+
+def iter_csv_chunks(path, columns=None, chunk_bytes=16 * 1024 * 1024):
+    '''
+    Yields (values, lines, short) for consecutive blocks of a headerless CSV capture,
+    where values is a float64 array of the requested columns, lines is the number of
+    non-empty lines in the block and short the number of those with fewer fields than
+    the first line (their missing fields are NaN).
+
+    :param columns: Column indices to keep (negative indices count from the end),
+                    defaults to all columns of the first line.
+    :param chunk_bytes: Approximate number of bytes parsed at a time.
+    '''
+    n_fields = count_fields(path)
+    columns = _resolve_columns(columns, n_fields)
+    with open(path, 'rb') as file:
+        remainder = b''
+        while True:
+            block = file.read(chunk_bytes)
+            if not block:
+                break
+            block = remainder + block
+            cut = block.rfind(b'\n') + 1
+            if cut == 0:
+                remainder = block
+                continue
+            block, remainder = block[:cut], block[cut:]
+            yield (_parse_block(block, n_fields, columns), *_count_lines(block, n_fields))
+        if remainder.strip():
+            yield (_parse_block(remainder + b'\n', n_fields, columns), *_count_lines(remainder, n_fields))
+
+def _count_lines(block, n_fields) -> tuple:
+    # Non-blank lines, and how many of them have fewer than n_fields fields
+    lines = short = 0
+    for line in block.split(b'\n'):
+        if line.strip():
+            lines += 1
+            if line.count(b',') < n_fields - 1:
+                short += 1
+    return lines, short
+
+def load_capture(path, columns=None, chunk_bytes=16 * 1024 * 1024) -> Capture:
+    '''
+    Loads the given columns of a capture file, CSV or binary log.
+
+    Rows whose timestamp (column 0) cannot be parsed are dropped. For CSV files the
+    number of malformed lines, skipped for too many fields or padded with NaN for too
+    few, is reported in Capture.bad_lines.
+
+    :param path: Path to the capture file.
+    :param columns: Column indices to load, e.g. [0, -1]. Column 0 (the timestamp)
+                    is always loaded first. Defaults to all columns.
+    :param chunk_bytes: Approximate number of bytes parsed at a time for CSV files.
+    :return: A Capture.
+    '''
+    if columns is not None and (not columns or columns[0] != 0):
+        columns = [0] + [c for c in columns if c != 0]
+
+    if is_binary_log(path):
+        return _load_binary(path, columns)
+
+    chunks = []
+    total_lines = short_lines = 0
+    for values, lines, short in iter_csv_chunks(path, columns, chunk_bytes):
+        chunks.append(values)
+        total_lines += lines
+        short_lines += short
+    n_columns = len(columns) if columns is not None else count_fields(path)
+    data = np.concatenate(chunks) if chunks else np.empty((0, n_columns))
+    bad_lines = total_lines - len(data) + short_lines
+
+    valid = ~np.isnan(data[:, 0])
+    invalid_timestamps = int((~valid).sum())
+    if invalid_timestamps:
+        data = data[valid]
+    return Capture(data, _resolve_columns(columns, count_fields(path)), bad_lines=bad_lines,
+                   invalid_timestamps=invalid_timestamps, total_lines=total_lines)
+
+def _load_binary(path, columns):
+    records = read_binary_log(path)
+    n_fields = records.shape[1]
+    columns = _resolve_columns(columns, n_fields)
+    # Selecting every column in order keeps the memory map, otherwise only the chosen columns are read
+    data = records if columns == list(range(n_fields)) else records[:, columns]
+    return Capture(data, columns, total_lines=len(records))
+
+def minmax_indices(x, y, buckets) -> np.ndarray:
+    '''
+    Indices of the samples to draw so that a line plot of (x, y) looks the same at
+    a resolution of `buckets` pixels: x is split into `buckets` equally wide
+    intervals and the minimum and maximum of y in each interval are kept, in their
+    original order. Spikes therefore stay visible however many samples there are.
+
+    :param x: Increasing x values (e.g. timestamps in seconds).
+    :param y: Values, NaNs are ignored.
+    :param buckets: Number of intervals, usually the width of the axes in pixels.
+    :return: Sorted indices into x and y, at most 2 * buckets of them.
+    '''
+    n = len(y)
+    if n <= 2 * buckets:
+        return np.arange(n)
+
+    edges = np.searchsorted(x, np.linspace(x[0], x[-1], buckets + 1)[1:-1])
+    edges = np.concatenate(([0], edges, [n]))
+    counts = np.diff(edges)
+    starts = edges[:-1][counts > 0]
+    counts = counts[counts > 0]
+    bucket = np.repeat(np.arange(len(starts)), counts)
+
+    indices = []
+    for reduce in (np.fmin, np.fmax):
+        extremes = reduce.reduceat(y, starts)
+        # First sample of every bucket that equals the bucket's extreme
+        hits = np.flatnonzero(y == np.repeat(extremes, counts))
+        _, first = np.unique(bucket[hits], return_index=True)
+        indices.append(hits[first])
+    return np.unique(np.concatenate(indices))
+
+def axes_pixel_width(ax) -> int:
+    '''
+    Width of a matplotlib Axes in display pixels.
+    '''
+    figure = ax.get_figure()
+    return max(1, int(round(ax.get_position().width * figure.get_figwidth() * figure.dpi)))
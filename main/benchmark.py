@@ -0,0 +1,456 @@
+# Benchmarks the filters, the queues between modules and whole pipelines, e.g.
+#   python benchmark.py --output bench.json
+#   python benchmark.py --quick --input ../raw_rssi.csv --output bench.json
+#   python benchmark.py --compare bench_previous.json --output bench.json
+# Results are written as JSON. With --compare, metrics that got worse by more than
+# --tolerance compared to an earlier run are listed and the exit status is 1.
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import queue
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import numpy as np
+from modules import *
+from modules.test_filter import TESTFilter
+
+# Module configurations benchmarked one sample at a time and as arrays
+MODULES = [
+    ('TESTFilter', {}),
+    ('MeanFilter', {'window_size': 10}),
+    ('MeanFilter', {'window_size': 100}),
+    ('MeanFilter', {'window_size': 1000}),
+    ('MeanFilter', {'window_size': 100, 'mode': 'exponential'}),
+    ('MeanFilter', {'window_size': 100, 'mode': 'time'}),
+    ('MedianFilter', {'window_size': 10}),
+    ('MedianFilter', {'window_size': 100}),
+    ('MedianFilter', {'window_size': 1000}),
+    ('MedianFilter', {'window_size': 100, 'backend': 'statistics'}),
+    ('SavitzkyGolayFilter', {'window_size': 21, 'polyorder': 2}),
+    ('SavitzkyGolayFilter', {'window_size': 101, 'polyorder': 3}),
+    ('SavitzkyGolayFilter', {'window_size': 21, 'polyorder': 2, 'backend': 'scipy'}),
+    ('KalmanFilter', {'dt': 0.1, 'process_var': 0.005}),
+    ('KalmanFilter', {'dt': 0.1, 'process_var': 0.005, 'model': 'constant_velocity'}),
+    ('LogdistancePathLossModel', {'n': 2}),
+]
+
+# Filters placed between the source and a LogdistancePathLossModel in the pipeline benchmarks
+CHAINS = [
+    [],
+    [('MeanFilter', {'window_size': 30})],
+    [('MedianFilter', {'window_size': 21})],
+    [('KalmanFilter', {'dt': 0.01, 'process_var': 0.005})],
+    [('SavitzkyGolayFilter', {'window_size': 21, 'polyorder': 2}), ('KalmanFilter', {'dt': 0.01, 'process_var': 0.005})],
+]
+
+# Metrics used by --compare, and whether larger values are better
+COMPARED_METRICS = {
+    'throughput': True,
+    'latency_p50_us': False,
+    'latency_p99_us': False,
+    'hop_latency_us': False,
+    'growth_bytes_per_1k': False,
+}
+
+def create_module(name, params):
+    return globals()[name](**params)
+
+def stop_module(module):
+    # Every processing loop stops on a None sentinel
+    module.input.put(None)
+
+def percentiles(values_ns) -> dict:
+    us = np.asarray(values_ns, dtype=float) / 1000.0
+    return {
+        'latency_mean_us': float(us.mean()),
+        'latency_p50_us': float(np.percentile(us, 50)),
+        'latency_p99_us': float(np.percentile(us, 99)),
+        'latency_max_us': float(us.max()),
+    }
+
+def load_input(args, count) -> tuple:
+    '''
+    :return: (timestamps, values) with `count` samples, recorded or synthetic.
+    '''
+    if args.input:
+        recorded = np.genfromtxt(args.input, delimiter=',', usecols=(0, args.column), ndmin=2)
+        recorded = recorded[~np.isnan(recorded).any(axis=1)]
+        if not len(recorded):
+            raise ValueError(f"'{args.input}' has no usable rows.")
+        # Repeat the recording as often as needed, keeping the timestamps increasing
+        repeats = int(np.ceil(count / len(recorded)))
+        offsets = recorded[:, 0] - recorded[0, 0]
+        period = offsets[-1] + (np.median(np.diff(offsets)) if len(offsets) > 1 else 0.1)
+        timestamps = (offsets[np.newaxis, :] + period * np.arange(repeats)[:, np.newaxis]).reshape(-1)[:count]
+        return timestamps, np.resize(recorded[:, 1], count)
+    source = SimulatedRSSISource(rate=10.0, trajectory=SimulatedRSSISource.oscillating_trajectory(1, 15, 120),
+                                 fading_k=2.0, outlier_prob=0.01, seed=args.seed)
+    timestamps, values, _ = source.generate(count)
+    return timestamps, values
+
+def bench_step(name, params, timestamps, values) -> dict:
+    '''
+    Per-sample latency and throughput of step().
+    '''
+    module = create_module(name, params)
+    module.process_array(values[:1000], timestamps[:1000])  # Warm up, e.g. lazy imports
+    module.reset()
+    durations = np.empty(len(values), dtype=np.int64)
+    clock = time.perf_counter_ns
+    step = module.step
+    gc.disable()
+    try:
+        for i, (value, timestamp) in enumerate(zip(values.tolist(), timestamps.tolist())):
+            start = clock()
+            step(value, timestamp)
+            durations[i] = clock() - start
+    finally:
+        gc.enable()
+    stop_module(module)
+    metrics = percentiles(durations)
+    metrics['throughput'] = len(values) / (durations.sum() / 1e9)
+    return metrics
+
+def bench_array(name, params, timestamps, values) -> dict:
+    '''
+    Throughput of process_array() on the whole input.
+    '''
+    module = create_module(name, params)
+    module.process_array(values[:1000], timestamps[:1000])
+    module.reset()
+    start = time.perf_counter()
+    module.process_array(values, timestamps)
+    elapsed = time.perf_counter() - start
+    stop_module(module)
+    return {'throughput': len(values) / elapsed, 'seconds': elapsed}
+
+def bench_memory(name, params, timestamps, values) -> dict:
+    '''
+    Memory retained by a module while it processes a stream. A module with bounded
+    state should show no growth between the first and the last part of the stream.
+    '''
+    module = create_module(name, params)
+    split = len(values) // 5
+    tracemalloc.start()
+    try:
+        for value, timestamp in zip(values[:split].tolist(), timestamps[:split].tolist()):
+            module.step(value, timestamp)
+        gc.collect()
+        after_first, _ = tracemalloc.get_traced_memory()
+        for value, timestamp in zip(values[split:].tolist(), timestamps[split:].tolist()):
+            module.step(value, timestamp)
+        gc.collect()
+        after_all, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    stop_module(module)
+    return {
+        'retained_bytes': after_all,
+        'peak_bytes': peak,
+        'growth_bytes_per_1k': (after_all - after_first) / ((len(values) - split) / 1000),
+    }
+
+def bench_queue_hops(hops, count) -> dict:
+    '''
+    Latency and throughput of moving items through a chain of passthrough modules.
+    '''
+    pipeline = Pipeline()
+    modules = [TESTFilter() for _ in range(hops)]
+    for module in modules:
+        pipeline.add_module(module)
+    first, last = modules[0].input, modules[-1].output
+
+    # Latency: one item in flight at a time
+    rounds = min(count, 2000)
+    durations = np.empty(rounds, dtype=np.int64)
+    for i in range(rounds):
+        start = time.perf_counter_ns()
+        first.put(i)
+        last.get()
+        durations[i] = time.perf_counter_ns() - start
+
+    # Throughput: as many items in flight as the queues take
+    start = time.perf_counter()
+    for i in range(count):
+        first.put(i)
+    for i in range(count):
+        last.get()
+    elapsed = time.perf_counter() - start
+
+    for module in modules:
+        stop_module(module)
+    metrics = percentiles(durations)
+    metrics['hop_latency_us'] = metrics['latency_p50_us'] / hops
+    metrics['throughput'] = count / elapsed
+    return metrics
+
+def calibrated_model():
+    '''
+    LogdistancePathLossModel that outputs from the first sample, so the pipeline
+    benchmarks measure the filters' warm-up only.
+    '''
+    model = LogdistancePathLossModel(n=2)
+    model.PL_0 = 40.0
+    model.calibrated = True
+    return model
+
+def chain_warmup(chain) -> int:
+    '''
+    Number of samples the windowed filters of a chain withhold before the first output.
+    '''
+    return sum(params['window_size'] - 1 for name, params in chain
+               if name in ('MeanFilter', 'MedianFilter', 'SavitzkyGolayFilter'))
+
+def build_pipeline(chain, source, batch_size, queue_size):
+    pipeline = Pipeline(batch_size=batch_size, max_latency=0.005, queue_size=queue_size)
+    pipeline.add_module(source)
+    modules = [create_module(name, params) for name, params in chain]
+    modules.append(calibrated_model())
+    for module in modules:
+        pipeline.add_module(module)
+    return pipeline, modules
+
+def stop_source(source, output):
+    '''
+    Stops the source while reading the pipeline's output, so a source blocked on a
+    full bounded queue can finish.
+    '''
+    stopper = threading.Thread(target=source.stop)
+    stopper.start()
+    while stopper.is_alive():
+        try:
+            output.get(timeout=0.01)
+        except queue.Empty:
+            pass
+
+def drain_samples(output, until, received, latencies=None):
+    '''
+    Reads Samples (or lists of Samples) from output until the monotonic time `until`.
+    '''
+    while time.monotonic() < until:
+        try:
+            item = output.get(timeout=0.05)
+        except queue.Empty:
+            continue
+        now = time.monotonic()
+        for sample in (item if isinstance(item, list) else [item]):
+            received.append(sample)
+            if latencies is not None:
+                latencies.append((now - sample.t_monotonic) * 1e9)
+
+def bench_pipeline_rate(chain, rate, duration, batch_size, seed, min_samples=100) -> dict:
+    '''
+    Runs a real-time synthetic source at `rate` Hz through a chain and measures the
+    end-to-end latency (from the sample's nominal acquisition time to its arrival at
+    the end of the pipeline) and the share of samples delivered.
+
+    The run is extended past `duration` until the chain's warm-up plus min_samples
+    samples were emitted, and the throughput is taken over the time after the warm-up.
+    '''
+    warmup = chain_warmup(chain)
+    duration = max(duration, (warmup + min_samples) / rate)
+    source = SimulatedRSSISource(rate=rate, seed=seed)
+    pipeline, modules = build_pipeline(chain, source, batch_size, queue_size=0)
+    received, latencies = [], []
+    source.start()
+    drain_samples(modules[-1].output, time.monotonic() + duration, received, latencies)
+    source.stop()
+    drain_samples(modules[-1].output, time.monotonic() + 0.2, received, latencies)
+    for module in modules:
+        stop_module(module)
+
+    emitted = source.timing_stats()['emitted']
+    # The windowed filters withhold their warm-up samples, nothing is delivered for them
+    metrics = percentiles(latencies) if latencies else {}
+    metrics['emitted'] = emitted
+    metrics['warmup'] = warmup
+    metrics['delivered'] = len(received)
+    metrics['duration'] = duration
+    metrics['throughput'] = len(received) / (duration - warmup / rate)
+    metrics['max_queue_depth'] = max(s.get('high_watermark', 0) for s in pipeline.stats().values())
+    return metrics
+
+def bench_pipeline_throughput(chain, duration, batch_size, seed) -> dict:
+    '''
+    Sustained throughput with the source emitting as fast as the pipeline accepts,
+    through bounded queues so the slowest stage sets the pace.
+    '''
+    source = SimulatedRSSISource(rate=100000, seed=seed, speed=None)
+    pipeline, modules = build_pipeline(chain, source, batch_size, queue_size=64)
+    received = []
+    source.start()
+    start = time.monotonic()
+    drain_samples(modules[-1].output, start + duration, received)
+    elapsed = time.monotonic() - start
+    stop_source(source, modules[-1].output)
+    for module in modules:
+        stop_module(module)
+    return {'throughput': len(received) / elapsed, 'delivered': len(received), 'emitted': source.emitted}
+
+def bench_pipeline_memory(chain, count, batch_size, seed) -> dict:
+    '''
+    Memory retained by a whole pipeline (source, queues and modules) while `count`
+    samples stream through it as fast as it accepts them. As with bench_memory, a
+    pipeline with bounded state shows no growth between the first fifth and the end.
+    '''
+    source = SimulatedRSSISource(rate=100000, seed=seed, speed=None)
+    pipeline, modules = build_pipeline(chain, source, batch_size, queue_size=64)
+    output = modules[-1].output
+    split = count // 5
+    received = 0
+    after_first = None
+    tracemalloc.start()
+    try:
+        source.start()
+        while received < count:
+            try:
+                item = output.get(timeout=1.0)
+            except queue.Empty:
+                break
+            received += len(item) if isinstance(item, list) else 1
+            if after_first is None and received >= split:
+                gc.collect()
+                after_first, _ = tracemalloc.get_traced_memory()
+        gc.collect()
+        after_all, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        stop_source(source, output)
+        for module in modules:
+            stop_module(module)
+    if after_first is None:
+        after_first = after_all
+    return {
+        'retained_bytes': after_all,
+        'peak_bytes': peak,
+        'delivered': received,
+        'growth_bytes_per_1k': (after_all - after_first) / (max(received - split, 1) / 1000),
+    }
+
+def git_revision():
+    try:
+        result = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def result_key(result) -> str:
+    return json.dumps([result['benchmark'], result['name'], result['params']], sort_keys=True)
+
+def compare(results, baseline_file, tolerance) -> list:
+    '''
+    :return: Descriptions of the metrics that got worse than in the baseline by more than tolerance.
+    '''
+    with open(baseline_file) as file:
+        baseline = {result_key(result): result for result in json.load(file)['results']}
+    regressions = []
+    for result in results:
+        previous = baseline.get(result_key(result))
+        if previous is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            new, old = result['metrics'].get(metric), previous['metrics'].get(metric)
+            if new is None or old is None or old == 0:
+                continue
+            change = (new - old) / abs(old)
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{result['benchmark']} {result['name']} {result['params']}: "
+                                   f"{metric} {old:.4g} -> {new:.4g} ({change:+.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the RSSI filters and pipelines.')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON file for the results')
+    parser.add_argument('--input', help='Recorded CSV file to use instead of synthetic RSSI')
+    parser.add_argument('--column', type=int, default=1, help='Column of --input holding the RSSI')
+    parser.add_argument('--samples', type=int, default=50000, help='Samples per module benchmark')
+    parser.add_argument('--rates', type=float, nargs='+', default=[10, 100, 1000],
+                        help='Source rates in Hz for the real-time pipeline benchmarks')
+    parser.add_argument('--duration', type=float, default=2.0, help='Seconds per pipeline benchmark')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--quick', action='store_true', help='Fewer samples and shorter runs, for smoke tests')
+    parser.add_argument('--skip', nargs='+', default=[], choices=['step', 'array', 'memory', 'queue', 'pipeline'],
+                        help='Benchmark groups to leave out')
+    parser.add_argument('--compare', help='Earlier results to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative slowdown for --compare')
+    args = parser.parse_args()
+
+    # Samples delivered after the warm-up of a chain in every real-time pipeline run
+    min_samples = 100
+    if args.quick:
+        args.samples = min(args.samples, 5000)
+        args.duration = min(args.duration, 0.5)
+        min_samples = 20
+
+    timestamps, values = load_input(args, args.samples)
+    results = []
+
+    def record(benchmark, name, params, metrics):
+        results.append({'benchmark': benchmark, 'name': name, 'params': params, 'metrics': metrics})
+        summary = ', '.join(f"{k}={v:.4g}" for k, v in metrics.items() if k in COMPARED_METRICS)
+        print(f"{benchmark:<20} {name:<26} {json.dumps(params):<60} {summary}")
+
+    for name, params in MODULES:
+        if 'step' not in args.skip:
+            record('step', name, params, bench_step(name, params, timestamps, values))
+        if 'array' not in args.skip:
+            record('array', name, params, bench_array(name, params, timestamps, values))
+        if 'memory' not in args.skip:
+            record('memory', name, params, bench_memory(name, params, timestamps, values))
+
+    if 'queue' not in args.skip:
+        for hops in (1, 4, 8):
+            record('queue_hops', 'TESTFilter', {'hops': hops}, bench_queue_hops(hops, args.samples))
+
+    if 'pipeline' not in args.skip:
+        for chain in CHAINS:
+            name = ' > '.join([n for n, _ in chain] + ['LogdistancePathLossModel'])
+            params = [p for _, p in chain]
+            for rate in args.rates:
+                for batch_size in (1, 64):
+                    metrics = bench_pipeline_rate(chain, rate, args.duration, batch_size, args.seed, min_samples)
+                    record('pipeline_rate', name, {'chain': params, 'rate': rate, 'batch_size': batch_size}, metrics)
+            for batch_size in (1, 64):
+                metrics = bench_pipeline_throughput(chain, args.duration, batch_size, args.seed)
+                record('pipeline_throughput', name, {'chain': params, 'batch_size': batch_size}, metrics)
+                if 'memory' not in args.skip:
+                    metrics = bench_pipeline_memory(chain, args.samples, batch_size, args.seed)
+                    record('pipeline_memory', name, {'chain': params, 'batch_size': batch_size}, metrics)
+
+    output = {
+        'metadata': {
+            'time': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'git_revision': git_revision(),
+            'python': sys.version,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'input': args.input or 'synthetic',
+            'samples': args.samples,
+            'seed': args.seed,
+            'duration': args.duration,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as file:
+        json.dump(output, file, indent=1)
+    print(f"Results written to '{args.output}'.")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} compared to '{args.compare}'.")
+
+if __name__ == '__main__':
+    main()
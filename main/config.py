@@ -1,4 +1,26 @@
 # Configuration file for settings
 
 ####  RSSI Collector settings  ####
-COLLECTOR_INTERVAL = 0.1
\ No newline at end of file
+COLLECTOR_INTERVAL = 0.1
+# Where RSSI readings come from: 'proc' (/proc/net/wireless), 'iw' (nl80211 via iw),
+# 'scan' (a full pywifi scan per reading) or 'auto' (the first link backend that works, else scan)
+COLLECTOR_BACKEND = 'auto'
+# Wi-Fi interface name, e.g. 'wlan0'. None uses the first interface pywifi finds
+COLLECTOR_INTERFACE = None
+
+####  Device discovery settings  ####
+# Offline mode never opens sockets or scans: the interface comes from COLLECTOR_INTERFACE
+# and the SSID from the cache
+DISCOVERY_OFFLINE = False
+# Last discovered interface, MAC address and SSID, reused for DISCOVERY_CACHE_TTL seconds
+DISCOVERY_CACHE_FILE = '~/.cache/rssi_pipeline/discovery.json'
+DISCOVERY_CACHE_TTL = 300
+
+####  Path loss model settings  ####
+# Calibration profiles (PL_0 and n per device, access point and environment), fitted with
+# `main.py --calibrate` and applied at startup
+CALIBRATION_FILE = '~/.cache/rssi_pipeline/calibration.json'
+# Tag of the current environment, fits made in different rooms or buildings are kept apart
+CALIBRATION_ENVIRONMENT = 'default'
+# Seconds between background saves of a fit that is being refined
+CALIBRATION_AUTOSAVE_INTERVAL = 30
\ No newline at end of file
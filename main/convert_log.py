@@ -0,0 +1,7 @@
+# Convert pipeline logs between the CSV and binary formats, e.g.
+#   python convert_log.py to-binary ../median_static.csv median_static.p2log
+#   python convert_log.py to-csv median_static.p2log median_static.csv
+from modules.BinaryLog import main
+
+if __name__ == '__main__':
+    main()
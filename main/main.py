@@ -1,8 +1,10 @@
 import time
+import argparse
 import matplotlib.pyplot as plt
 import numpy as np
 from scipy import stats
 from modules import *
+from config import CALIBRATION_FILE
 import queue
 
 # Configuration
@@ -11,16 +13,25 @@ DISTANCES = [1, 2, 3, 4, 5, 10, 15, 20]  # Distances in meters
 NUM_SAMPLES = 40  # Number of RSSI samples per distance
 CONFIDENCE = 0.95  # Confidence level for intervals
 
+parser = argparse.ArgumentParser()
+parser.add_argument('--quiet', action='store_true', help="Don't print every logged row")
+parser.add_argument('--log-format', choices=['csv', 'binary'], default='csv',
+                    help="Log file format, binary logs can be converted to CSV with convert_log.py")
+parser.add_argument('--calibrate', action='store_true',
+                    help="Fit PL_0 and n from NUM_SAMPLES readings at each of DISTANCES before logging")
+args = parser.parse_args()
+
 # Initialize Pipeline
-pipeline = Pipeline()
+pipeline = Pipeline(capture=True, tag_samples=True)  # Capture and tag every stage for the CSV logger
 
 rssi_collector = RSSICollector(interval=INTERVAL)
 # You can uncomment and choose a filter if needed
 #filter = MeanFilter(window_size=30)
 #filter = KalmanFilter(dt=INTERVAL, process_var=0.005)
+#filter = KalmanFilter(dt=INTERVAL, process_var=0.005, model='constant_velocity')  # Tracks a moving device
 #filter = SavitzkyGolayFilter(window_size=20, polyorder=0)
 #filter = MedianFilter(window_size=20)
-distance_estimator = LogdistancePathLossModel(initial_distance=1, P_tx = 20, d_0 = 1, n=2)
+distance_estimator = LogdistancePathLossModel(initial_distance=1, P_tx = 20, d_0 = 1, n=2, calibration_file=CALIBRATION_FILE)
 
 pipeline.add_module(rssi_collector)
 #pipeline.add_module(filter)
@@ -30,11 +41,24 @@ rssi_collector.start()
 
 outputs = pipeline.get_outputs()
 
-logger1 = CSVLogger(filename='mean_30.csv', outputs=outputs, interval=INTERVAL)
+log_file = 'mean_30.csv' if args.log_format == 'csv' else 'mean_30.p2log'
+logger1 = CSVLogger(filename=log_file, outputs=outputs, interval=INTERVAL, log_format=args.log_format, quiet=args.quiet)
 logger1.start()
 
 #outputs = pipeline.get_outputs()
 
+if args.calibrate:
+    for distance in DISTANCES:
+        input(f"\nPlace the device at {distance} meter(s) and press Enter to start calibrating...")
+        target = distance_estimator.calibrator.count + NUM_SAMPLES
+        distance_estimator.reference_distance = distance
+        while distance_estimator.calibrator.count < target:
+            time.sleep(INTERVAL)
+        distance_estimator.reference_distance = None
+        calibrator = distance_estimator.calibrator
+        print(f"Distance {distance}m  |  PL_0 = {calibrator.PL_0:.2f}, n = {calibrator.n:.2f}, sigma = {calibrator.sigma:.2f} dB")
+    distance_estimator.save_calibration()
+
 # Data storage
 data = []
 means = []
@@ -48,6 +72,7 @@ except KeyboardInterrupt:
     print("Terminating program...")
     logger1.stop()
     logger1.join()
+    distance_estimator.save_calibration()
 '''
 try:
     for distance in DISTANCES:
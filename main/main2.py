@@ -3,6 +3,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 from scipy import stats
 from modules import *
+from config import CALIBRATION_FILE
 import queue
 
 # Configuration
@@ -11,35 +12,38 @@ DISTANCES = [1, 2, 3, 4, 5, 10, 15, 20]  # Distances in meters
 NUM_SAMPLES = 40  # Number of RSSI samples per distance
 CONFIDENCE = 0.95  # Confidence level for intervals
 
-pipeline = Pipeline()
-rssi_collector = RSSICollector(interval=INTERVAL)
-distance_estimator = LogdistancePathLossModel(n=2)
+# One scan per interval feeds all four pipelines
+collector = MultiBSSIDCollector(interval=INTERVAL)
+
+pipeline = Pipeline(capture=True)
+rssi_collector = collector.subscribe()
+distance_estimator = LogdistancePathLossModel(n=2, calibration_file=CALIBRATION_FILE)
 pipeline.add_module(rssi_collector)
 pipeline.add_module(distance_estimator)
 outputs = pipeline.get_outputs()
 
-pipeline1 = Pipeline()
-rssi_collector1 = RSSICollector(interval=INTERVAL)
+pipeline1 = Pipeline(capture=True)
+rssi_collector1 = collector.subscribe()
 filter = MeanFilter(window_size=30)
-distance_estimator1 = LogdistancePathLossModel(n=2)
+distance_estimator1 = LogdistancePathLossModel(n=2, calibration_file=CALIBRATION_FILE)
 pipeline1.add_module(rssi_collector1)
 pipeline1.add_module(filter)
 pipeline1.add_module(distance_estimator1)
 outputs1 = pipeline1.get_outputs()
 
-pipeline2 = Pipeline()
-rssi_collector2 = RSSICollector(interval=INTERVAL)
+pipeline2 = Pipeline(capture=True)
+rssi_collector2 = collector.subscribe()
 filter = SavitzkyGolayFilter(window_size=20, polyorder=0)
-distance_estimator2 = LogdistancePathLossModel(n=2)
+distance_estimator2 = LogdistancePathLossModel(n=2, calibration_file=CALIBRATION_FILE)
 pipeline2.add_module(rssi_collector2)
 pipeline2.add_module(filter)
 pipeline2.add_module(distance_estimator2)
 outputs2 = pipeline2.get_outputs()
 
-pipeline3 = Pipeline()
-rssi_collector3 = RSSICollector(interval=INTERVAL)
+pipeline3 = Pipeline(capture=True)
+rssi_collector3 = collector.subscribe()
 filter = KalmanFilter(dt=INTERVAL, process_var=0.005)
-distance_estimator3 = LogdistancePathLossModel(n=2)
+distance_estimator3 = LogdistancePathLossModel(n=2, calibration_file=CALIBRATION_FILE)
 pipeline3.add_module(rssi_collector3)
 pipeline3.add_module(filter)
 pipeline3.add_module(distance_estimator3)
@@ -73,13 +77,13 @@ class Analyzer:
 
 try:
     for distance in DISTANCES:
-        for collector in [rssi_collector, rssi_collector1, rssi_collector2, rssi_collector3]:
-            collector.start()
+        for stream in [rssi_collector, rssi_collector1, rssi_collector2, rssi_collector3]:
+            stream.start()
 
         time.sleep(5)
 
-        for collector in [rssi_collector, rssi_collector1, rssi_collector2, rssi_collector3]:
-            collector.stop()
+        for stream in [rssi_collector, rssi_collector1, rssi_collector2, rssi_collector3]:
+            stream.stop()
 
         print("move")
 
@@ -102,6 +106,9 @@ try:
         #    temp.append(out)
         while len(temp) <= NUM_SAMPLES:
             out = distance_estimator.output.get()
+            if isinstance(out, Sample):
+                # The collector timestamps its readings, only the value is analysed
+                out = out.value
             if out is None or out == 0:
                 continue
             print(f"{len(temp)}/50 \t|  Distance {distance}m  |  RSSI: {out}", end='\r')
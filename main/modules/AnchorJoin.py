@@ -0,0 +1,118 @@
+from .Module import Module, Sample
+from typing import Optional
+import threading
+import numpy as np
+
+class AnchorInput:
+    '''
+    Output queue of one anchor's last pipeline stage, tags every item with the anchor
+    and forwards it to the input of an AnchorJoin module.
+    '''
+    def __init__(self, target_queue, anchor):
+        self.target_queue = target_queue
+        self.anchor = anchor
+
+    def put(self, item, *args, **kwargs):
+        # Upstream modules do not forward their stop sentinel, the other anchors keep running
+        if item is not None:
+            self.target_queue.put((self.anchor, item), *args, **kwargs)
+
+    def __getattr__(self, attr):
+        return getattr(self.target_queue, attr)
+
+class AnchorJoin(Module):
+    '''
+    Base class for modules fed by one pipeline per anchor (access point) that need
+    the values of all anchors from the same scan.
+
+    The last module of each anchor's pipeline is attached with connect(). Values are
+    joined on the Sample sequence number given by the collector, and emit() is called
+    once per scan, in sequence order: as soon as every anchor reported, or with the
+    anchors that did once the scan is overtaken. A scan is overtaken when a newer
+    scan completes or when more than max_pending scans are waiting. Values arriving
+    for a scan that was already emitted are dropped (counted in `late`).
+    '''
+    def __init__(self, anchors: dict, max_pending: int = 4):
+        '''
+        :param anchors: Mapping of anchor name (e.g. BSSID) to its position.
+        :param max_pending: Number of incomplete scans kept waiting for missing anchors.
+        '''
+        super().__init__()
+        self.names = [self.anchor_key(name) for name in anchors]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.anchors = np.asarray(list(anchors.values()), dtype=float)
+        self.max_pending = max_pending
+        self.reset_join()
+
+    @staticmethod
+    def anchor_key(name):
+        return name.lower() if isinstance(name, str) else name
+
+    def anchor_values(self, mapping: dict) -> np.ndarray:
+        '''
+        Converts a mapping of anchor name to value into an array in anchor order, NaN where missing.
+        '''
+        values = np.full(len(self.names), np.nan)
+        for name, value in mapping.items():
+            values[self.index[self.anchor_key(name)]] = value
+        return values
+
+    def connect(self, anchor, module: Module):
+        '''
+        Feeds the values output by `module` (the last module of an anchor's pipeline) into this stage.
+        '''
+        key = self.anchor_key(anchor)
+        if key not in self.index:
+            raise KeyError(f"Unknown anchor {anchor!r}.")
+        module.output = AnchorInput(self.input, key)
+
+    def start(self):
+        self.process_thread = threading.Thread(target=self.process, daemon=True)
+        self.process_thread.start()
+
+    def stop(self):
+        self.input.put(None)
+        self.process_thread.join()
+
+    def reset_join(self):
+        self.pending = {}               # Scan sequence number -> [Sample, values]
+        self.last_emitted = None        # Sequence number of the last emitted scan
+        self.late = 0                   # Values dropped because their scan was already emitted
+
+    def handle(self, data):
+        '''
+        Joins the values arriving from the anchors on their sequence numbers.
+        '''
+        anchor, item = data
+        samples = item if isinstance(item, list) else [item]
+        index = self.index[anchor]
+        for sample in samples:
+            if not isinstance(sample, Sample):
+                raise TypeError(f"{type(self).__name__} needs Samples to join the anchors, use a "
+                                "MultiBSSIDCollector or a Pipeline with tag_samples=True.")
+            if self.last_emitted is not None and sample.seq <= self.last_emitted:
+                self.late += 1
+                continue
+            entry = self.pending.get(sample.seq)
+            if entry is None:
+                entry = self.pending[sample.seq] = [sample, np.full(len(self.names), np.nan)]
+            entry[1][index] = sample.value
+            if not np.isnan(entry[1]).any():
+                self._flush(sample.seq)
+        while len(self.pending) > self.max_pending:
+            self._flush(min(self.pending))
+
+    def _flush(self, seq: int):
+        # Emits the scan `seq` after all older pending scans, in sequence order
+        for older in sorted(key for key in self.pending if key <= seq):
+            self.last_emitted = older
+            self.emit(*self.pending.pop(older))
+
+    def emit(self, sample: Sample, values: np.ndarray):
+        '''
+        Processes the joined values of one scan.
+
+        :param sample: A Sample of the scan, for its sequence number and timestamps.
+        :param values: Values in anchor order, NaN for anchors that did not report.
+        '''
+        raise NotImplementedError
@@ -0,0 +1,217 @@
+import argparse
+import csv
+import os
+import struct
+import time
+import numpy as np
+
+'''
+Fixed-width binary log format used by CSVLogger(log_format='binary').
+
+A file starts with a 32 byte header, all fields little-endian:
+
+    offset  size  field
+    0       8     magic, b'P2RSSI\x00\x00'
+    8       4     format version (uint32), currently 1
+    12      4     number of columns per record (uint32)
+    16      16    reserved, zero
+
+followed by records of `columns` float64 values (little-endian). Column 0 is
+the timestamp in seconds since the epoch and the remaining columns are the
+pipeline outputs, in the same order as the CSV layout. Missing values are NaN.
+
+Records are only ever appended, so a file that is still being written (or was
+cut off by a crash) can be read up to its last complete record, and the whole
+file can be memory-mapped as a (rows, columns) array without parsing.
+'''
+
+MAGIC = b'P2RSSI\x00\x00'
+VERSION = 1
+HEADER = struct.Struct('<8sII16x')
+HEADER_SIZE = HEADER.size
+RECORD_DTYPE = np.dtype('<f8')
+
+class BinaryLogWriter:
+    '''
+    Buffered writer for the binary log format.
+
+    Rows are collected in a preallocated array and written in one call once
+    `flush_rows` rows are buffered or the oldest buffered row is `flush_interval`
+    seconds old. The file is fsynced at most every `fsync_interval` seconds
+    (0 fsyncs on every flush, None never fsyncs before close).
+    '''
+    def __init__(self, filename, columns, flush_rows=1024, flush_interval=1.0, fsync_interval=5.0):
+        self.filename = filename
+        self.columns = columns
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.buffer = np.empty((flush_rows, columns), dtype=RECORD_DTYPE)
+        self.buffered = 0
+        self.rows_written = 0
+        self.first_buffered = None
+        self.last_fsync = time.monotonic()
+        self.file = open(filename, mode='wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, columns))
+
+    def write_rows(self, rows):
+        for row in rows:
+            if self.buffered == 0:
+                self.first_buffered = time.monotonic()
+            self.buffer[self.buffered] = [np.nan if value is None else value for value in row]
+            self.buffered += 1
+            if self.buffered == self.flush_rows:
+                self.flush()
+        self.flush_if_due()
+
+    def flush_if_due(self):
+        if self.buffered and time.monotonic() - self.first_buffered >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self.buffered:
+            self.file.write(self.buffer[:self.buffered].tobytes())
+            self.rows_written += self.buffered
+            self.buffered = 0
+        self.file.flush()
+        if self.fsync_interval is not None and time.monotonic() - self.last_fsync >= self.fsync_interval:
+            os.fsync(self.file.fileno())
+            self.last_fsync = time.monotonic()
+
+    def close(self):
+        self.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+class CSVRecordWriter:
+    '''
+    Buffered writer for the CSV layout, with the same interface as BinaryLogWriter.
+    '''
+    def __init__(self, filename, columns=None, flush_rows=1024, flush_interval=1.0, fsync_interval=5.0):
+        self.filename = filename
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.buffer = []
+        self.rows_written = 0
+        self.first_buffered = None
+        self.last_fsync = time.monotonic()
+        self.file = open(filename, mode='w', newline='')
+        self.writer = csv.writer(self.file)
+
+    @property
+    def buffered(self):
+        return len(self.buffer)
+
+    def write_rows(self, rows):
+        if rows and not self.buffer:
+            self.first_buffered = time.monotonic()
+        self.buffer.extend(rows)
+        if len(self.buffer) >= self.flush_rows:
+            self.flush()
+        self.flush_if_due()
+
+    def flush_if_due(self):
+        if self.buffer and time.monotonic() - self.first_buffered >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.writer.writerows(self.buffer)
+            self.rows_written += len(self.buffer)
+            self.buffer = []
+        self.file.flush()
+        if self.fsync_interval is not None and time.monotonic() - self.last_fsync >= self.fsync_interval:
+            os.fsync(self.file.fileno())
+            self.last_fsync = time.monotonic()
+
+    def close(self):
+        self.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+def read_binary_log(filename, mmap=True) -> np.ndarray:
+    '''
+    Reads a binary log as a (rows, columns) float64 array. A trailing partial
+    record is ignored.
+
+    :param filename: Path to the log file.
+    :param mmap: Memory-map the file instead of reading it into memory.
+    :return: The records, column 0 is the timestamp.
+    '''
+    with open(filename, 'rb') as file:
+        magic, version, columns = HEADER.unpack(file.read(HEADER_SIZE))
+    if magic != MAGIC:
+        raise ValueError(f"'{filename}' is not a binary log file.")
+    if version != VERSION:
+        raise ValueError(f"Unsupported binary log version {version}.")
+
+    rows = (os.path.getsize(filename) - HEADER_SIZE) // (columns * RECORD_DTYPE.itemsize)
+    if rows == 0:
+        return np.empty((0, columns), dtype=RECORD_DTYPE)
+    if mmap:
+        return np.memmap(filename, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(rows, columns))
+    with open(filename, 'rb') as file:
+        file.seek(HEADER_SIZE)
+        return np.fromfile(file, dtype=RECORD_DTYPE, count=rows * columns).reshape(rows, columns)
+
+def is_binary_log(filename) -> bool:
+    with open(filename, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+def csv_to_binary(csv_file, binary_file, chunk_rows=65536):
+    '''
+    Converts a CSVLogger CSV file to the binary format. Rows with a different
+    number of fields than the first row are skipped.
+
+    :return: Number of rows written.
+    '''
+    writer = None
+    with open(csv_file, newline='') as file:
+        reader = csv.reader(file)
+        chunk = []
+        for row in reader:
+            if not row:
+                continue
+            if writer is None:
+                writer = BinaryLogWriter(binary_file, len(row), flush_rows=chunk_rows, fsync_interval=None)
+            if len(row) != writer.columns:
+                continue
+            try:
+                chunk.append([float(value) if value not in ('', 'None') else np.nan for value in row])
+            except ValueError:
+                continue
+            if len(chunk) >= chunk_rows:
+                writer.write_rows(chunk)
+                chunk = []
+        if writer is None:
+            raise ValueError(f"'{csv_file}' is empty.")
+        writer.write_rows(chunk)
+        writer.close()
+    return writer.rows_written
+
+def binary_to_csv(binary_file, csv_file, chunk_rows=65536):
+    '''
+    Converts a binary log back to the headerless CSVLogger layout.
+
+    :return: Number of rows written.
+    '''
+    records = read_binary_log(binary_file)
+    with open(csv_file, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        for start in range(0, len(records), chunk_rows):
+            writer.writerows(records[start:start + chunk_rows].tolist())
+    return len(records)
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert between the CSV and binary pipeline log formats.')
+    parser.add_argument('direction', choices=['to-binary', 'to-csv'])
+    parser.add_argument('source')
+    parser.add_argument('destination')
+    args = parser.parse_args()
+
+    if args.direction == 'to-binary':
+        rows = csv_to_binary(args.source, args.destination)
+    else:
+        rows = binary_to_csv(args.source, args.destination)
+    print(f"Converted {rows} rows from '{args.source}' to '{args.destination}'.")
@@ -0,0 +1,108 @@
+import queue
+
+class BoundedQueue(queue.Queue):
+    '''
+    queue.Queue with a selectable overflow policy and depth/drop counters.
+
+    Overflow policies, applied when maxsize > 0 and the queue is full:
+        'block':           put() waits for space, as queue.Queue does (backpressure).
+        'drop_oldest':     the oldest queued item is discarded to make room.
+        'drop_newest':     the new item is discarded.
+        'coalesce_latest': all queued items are discarded and replaced by the new one,
+                           so the reader always gets the most recent value.
+
+    The None sentinel used to stop modules is never dropped.
+    '''
+    POLICIES = ('block', 'drop_oldest', 'drop_newest', 'coalesce_latest')
+
+    def __init__(self, maxsize=0, overflow='block'):
+        super().__init__(maxsize)
+        self._check_policy(overflow)
+        self.overflow = overflow
+        self.put_count = 0       # Items accepted by put()
+        self.dropped = 0         # Items discarded by the overflow policy
+        self.high_watermark = 0  # Largest depth seen
+        self.listeners = []      # Events set on every put, see add_listener
+
+    def _check_policy(self, overflow):
+        if overflow not in self.POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}', expected one of {self.POLICIES}.")
+
+    def add_listener(self, event):
+        '''
+        Registers a threading.Event that is set whenever an item is put, so one
+        thread can wait for data on several queues.
+        '''
+        self.listeners.append(event)
+
+    def _notify_listeners(self):
+        for event in self.listeners:
+            event.set()
+
+    def configure(self, maxsize=None, overflow=None):
+        '''
+        Changes the capacity and/or overflow policy in place, so threads already
+        waiting on the queue keep working.
+        '''
+        if overflow is not None:
+            self._check_policy(overflow)
+        with self.mutex:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if overflow is not None:
+                self.overflow = overflow
+            # Wake up producers in case the queue grew
+            self.not_full.notify_all()
+
+    def put(self, item, block=True, timeout=None):
+        if self.overflow == 'block':
+            super().put(item, block, timeout)
+            with self.mutex:
+                self.put_count += 1
+                self.high_watermark = max(self.high_watermark, self._qsize())
+            self._notify_listeners()
+            return
+
+        with self.mutex:
+            if item is not None and 0 < self.maxsize <= self._qsize():
+                if self.overflow == 'drop_newest':
+                    self.dropped += 1
+                    return
+                # A queued None sentinel is kept, only data items are discarded
+                if self.overflow == 'drop_oldest':
+                    discarded = self._drop_oldest()
+                else:  # coalesce_latest
+                    kept = [queued for queued in self.queue if queued is None]
+                    discarded = self._qsize() - len(kept)
+                    self.queue.clear()
+                    self.queue.extend(kept)
+                self.dropped += discarded
+                self.unfinished_tasks -= discarded
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.put_count += 1
+            self.high_watermark = max(self.high_watermark, self._qsize())
+            self.not_empty.notify()
+        self._notify_listeners()
+
+    def _drop_oldest(self) -> int:
+        # Removes the oldest item that is not a sentinel, returns the number removed
+        for index, queued in enumerate(self.queue):
+            if queued is not None:
+                del self.queue[index]
+                return 1
+        return 0
+
+    def stats(self) -> dict:
+        '''
+        :return: Current depth, capacity, overflow policy and counters.
+        '''
+        with self.mutex:
+            return {
+                'depth': self._qsize(),
+                'maxsize': self.maxsize,
+                'overflow': self.overflow,
+                'put_count': self.put_count,
+                'dropped': self.dropped,
+                'high_watermark': self.high_watermark,
+            }
@@ -1,52 +1,168 @@
-import csv
 import time
+import queue
 import threading
+from collections import deque
+from .Module import Sample
+from .BinaryLog import BinaryLogWriter, CSVRecordWriter
 
 class CSVLogger(threading.Thread):
-    def __init__(self, filename, outputs, interval=0.1):
+    '''
+    Logs the outputs of a pipeline to a CSV file, one row per sample.
+
+    The logger waits for data instead of polling: every output that supports
+    add_listener() (TapReaders from Pipeline.get_outputs() and module output
+    queues) wakes it up when an item arrives. Outputs without listeners are
+    polled every `interval` seconds. Each wakeup drains everything pending.
+
+    If the pipeline tags samples (Pipeline(tag_samples=True)) the outputs are
+    joined on the sample sequence number and the row timestamp is the time the
+    sample was acquired. A sample that a stage withheld (e.g. while a filter
+    window was filling up) is skipped. Untagged outputs are paired in arrival order.
+
+    Rows are written in buffered batches, either as CSV or in the fixed-width
+    binary format described in BinaryLog (log_format='binary'), which can be
+    memory-mapped with BinaryLog.read_binary_log.
+    '''
+    WRITERS = {
+        'csv': CSVRecordWriter,
+        'binary': BinaryLogWriter,
+    }
+
+    def __init__(self, filename, outputs, interval=0.1, max_pending=10000,
+                 log_format='csv', flush_rows=1024, flush_interval=1.0, fsync_interval=5.0, quiet=False):
+        '''
+        filename: Path of the log file.
+        outputs: Queues or TapReaders to log, e.g. from Pipeline.get_outputs().
+        interval: Polling interval for outputs that cannot wake the logger.
+        max_pending: Per-output limit on values waiting for a join.
+        log_format: 'csv' or 'binary'.
+        flush_rows: Number of rows buffered before they are written.
+        flush_interval: Maximum time in seconds a row stays buffered.
+        fsync_interval: Minimum time in seconds between fsyncs, None to only fsync on close.
+        quiet: Don't print every row to stdout.
+        '''
         super().__init__()
+        if log_format not in self.WRITERS:
+            raise ValueError(f"Unknown log format '{log_format}', expected one of {tuple(self.WRITERS)}.")
         self.filename = filename
         self.outputs = outputs
         self.interval = interval
-        self.file = open(self.filename, mode='w', newline='')
-        self.writer = csv.writer(self.file)
+        self.max_pending = max_pending  # Per-output limit on values waiting for a join
+        self.quiet = quiet
+        self.pending = [deque() for _ in outputs]  # Untagged values in arrival order
+        self.pending_tagged = [{} for _ in outputs]  # Tagged values keyed by sequence number
+        self.log_format = log_format
+        self.record_writer = self.WRITERS[log_format](self.filename, len(outputs) + 1,
+                                                  flush_rows=flush_rows, flush_interval=flush_interval,
+                                                  fsync_interval=fsync_interval)
         self.running = threading.Event()
         self.running.set()
+        self.wakeup = threading.Event()
         self.lock = threading.Lock()
+        self.closed = False
+
+        self.event_driven = True
+        for capture_q in self.outputs:
+            if hasattr(capture_q, 'add_listener'):
+                capture_q.add_listener(self.wakeup)
+            else:
+                self.event_driven = False
 
         # Optionally, write headers if needed
         #self.write_headers()
 
     def write_headers(self):
+        # Binary logs hold only numbers, their layout is described by their own header
+        if self.log_format != 'csv':
+            return
         headers = ['timestamp'] + [f'output_{i}' for i in range(len(self.outputs))]
-        self.writer.writerow(headers)
+        self.record_writer.write_rows([headers])
+
+    def drain(self):
+        '''
+        Moves all pending items from the outputs into the per-output join buffers.
+        '''
+        for index, capture_q in enumerate(self.outputs):
+            while True:
+                try:
+                    data = capture_q.get_nowait()
+                except queue.Empty:
+                    break
+                # Batches from a batched pipeline are logged one value per row
+                for item in (data if isinstance(data, list) else [data]):
+                    if isinstance(item, Sample):
+                        pending = self.pending_tagged[index]
+                        pending[item.seq] = item
+                        if len(pending) > self.max_pending:
+                            del pending[next(iter(pending))]
+                    else:
+                        pending = self.pending[index]
+                        pending.append(item)
+                        if len(pending) > self.max_pending:
+                            pending.popleft()
+
+    def join_rows(self) -> list:
+        '''
+        Builds rows from the values that are available for every output.
+        '''
+        rows = []
+
+        # Tagged samples: each output delivers sequence numbers in increasing order,
+        # so if the smallest pending sequence number is missing from an output that
+        # already delivered a later one, that sample can never be completed.
+        pending = self.pending_tagged
+        while pending and all(pending):
+            heads = [next(iter(p)) for p in pending]
+            seq = min(heads)
+            if all(head == seq for head in heads):
+                samples = [p.pop(seq) for p in pending]
+                rows.append([samples[0].t_wall] + [sample.value for sample in samples])
+            else:
+                for p in pending:
+                    p.pop(seq, None)
+
+        # Untagged values are paired in arrival order
+        now = time.time()
+        while self.pending and all(self.pending):
+            rows.append([now] + [p.popleft() for p in self.pending])
+        return rows
 
     def run(self):
         try:
             while self.running.is_set():
-                data_row = [time.time()]
-
-                for capture_q in self.outputs:                    
-                    if not capture_q.empty():
-                        data = capture_q.get()
-                        data_row.append(data)
-                    else:
-                        data_row.append(None)
+                if not self.event_driven:
+                    timeout = self.interval
+                elif self.record_writer.buffered:
+                    timeout = self.record_writer.flush_interval
+                else:
+                    timeout = None
+                self.wakeup.wait(timeout=timeout)
+                self.wakeup.clear()
 
-                # Check if all fields have values (no `None` or empty fields)
-                if all(value is not None for value in data_row[1:]):  # Skip timestamp in the check
-                    with self.lock:
-                        self.writer.writerow(data_row)
-                    print(data_row)
-
-                time.sleep(self.interval)
+                self.drain()
+                rows = self.join_rows()
+                with self.lock:
+                    if self.closed:
+                        break
+                    self.record_writer.write_rows(rows)
+                if not self.quiet:
+                    for data_row in rows:
+                        print(data_row)
         except Exception as e:
             print(f"Logging encountered an error: {e}")
         finally:
-            self.stop()
+            self.close()
 
-    def stop(self):
-        self.running.clear()
+    def close(self):
         with self.lock:
-            self.file.close()
+            if self.closed:
+                return
+            self.closed = True
+            self.record_writer.close()
         print(f"Logging stopped. File '{self.filename}' closed.")
+
+    def stop(self):
+        self.running.clear()
+        self.wakeup.set()
+        if not self.is_alive():
+            self.close()
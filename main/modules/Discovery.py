@@ -0,0 +1,283 @@
+from pywifi import PyWiFi, const
+from typing import Optional
+import json
+import os
+import re
+import shutil
+import socket
+import subprocess
+import threading
+import time
+import psutil
+from config import COLLECTOR_INTERFACE, DISCOVERY_OFFLINE, DISCOVERY_CACHE_FILE, DISCOVERY_CACHE_TTL
+
+def find_internet_connected_interface():
+    """Finds the network interface used for the internet connection."""
+    try:
+        # Use a temporary socket to detect the IP used for internet connection
+        test_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        test_socket.settimeout(2)
+        test_socket.connect(("8.8.8.8", 80))
+        ip = test_socket.getsockname()[0]
+        test_socket.close()
+
+        # Match the IP address to a network interface
+        for interface, addrs in psutil.net_if_addrs().items():
+            for addr in addrs:
+                if addr.address == ip:
+                    return interface  # Return the interface name
+    except Exception as e:
+        print(f"Error detecting interface: {e}")
+        return None
+
+def get_interface_mac(interface_name):
+    """Retrieves the MAC address of a local interface, None if it has none."""
+    for addr in psutil.net_if_addrs().get(interface_name, []):
+        if addr.family == psutil.AF_LINK:  # Checks for MAC address type
+            return addr.address
+    return None
+
+def get_mac_address():
+    """Retrieves the MAC address of the current internet-connected interface."""
+    interface_name = find_internet_connected_interface()
+    if not interface_name:
+        print("No active internet connection or interface could be detected.")
+        return None
+
+    # Retrieve MAC address of the detected interface
+    mac = get_interface_mac(interface_name)
+    if mac is None:
+        print("MAC address not found for the internet-connected interface.")
+    return mac
+
+def get_connected_ssid(iface) -> Optional[str]:
+    """Gets the SSID of the network the pywifi interface is connected to, None if unknown."""
+    try:
+        iface.scan()
+        scan_results = iface.scan_results()
+        for network in scan_results:
+            if iface.status() == const.IFACE_CONNECTED and network.ssid:
+                return network.ssid
+    except Exception as e:
+        print(f"Error retrieving connected SSID: {e}")
+    return None
+
+def get_link_ssid(interface_name) -> Optional[str]:
+    """Reads the SSID of the current link with `iw dev <interface> link`, without scanning."""
+    if not interface_name or shutil.which('iw') is None:
+        return None
+    try:
+        result = subprocess.run(['iw', 'dev', interface_name, 'link'], capture_output=True, timeout=1.0)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    match = re.search(rb'SSID:\s*(.+)', result.stdout)
+    return match.group(1).strip().decode(errors='replace') if match else None
+
+def get_link_bssid(interface_name) -> Optional[str]:
+    """Reads the BSSID of the current link with `iw dev <interface> link`, without scanning."""
+    if not interface_name or shutil.which('iw') is None:
+        return None
+    try:
+        result = subprocess.run(['iw', 'dev', interface_name, 'link'], capture_output=True, timeout=1.0)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    match = re.search(rb'Connected to\s+([0-9a-fA-F:]{17})', result.stdout)
+    return match.group(1).decode().lower() if match else None
+
+class DeviceDiscovery:
+    '''
+    Lazy, cached discovery of the Wi-Fi interface, the device MAC address, and the
+    SSID and BSSID of the connected access point.
+
+    Nothing is looked up until it is first needed, and every result is kept for the
+    lifetime of the object, so collectors sharing one DeviceDiscovery (see
+    shared_discovery()) pay for each lookup at most once. Results are also written
+    to a small JSON cache file and reused by later runs until cache_ttl seconds
+    after each was discovered.
+
+    In offline mode nothing touches the network or the radio: the interface name
+    comes from config (COLLECTOR_INTERFACE), the MAC address is read from that
+    interface and the SSID and BSSID are only taken from the cache, however old.
+    '''
+    FIELDS = ('interface', 'mac_address', 'connected_ssid', 'connected_bssid')
+
+    def __init__(self, interface: Optional[str] = COLLECTOR_INTERFACE, offline: bool = DISCOVERY_OFFLINE,
+                 cache_file: Optional[str] = DISCOVERY_CACHE_FILE, cache_ttl: float = DISCOVERY_CACHE_TTL):
+        '''
+        :param interface: Name of the Wi-Fi interface, None to use pywifi's first interface.
+        :param offline: Never open sockets or scan, see above.
+        :param cache_file: Path of the JSON cache, None to disable it.
+        :param cache_ttl: Age in seconds after which a cached field is ignored (except in offline mode).
+        '''
+        if offline and not interface:
+            raise ValueError("Offline discovery needs the interface name (COLLECTOR_INTERFACE).")
+        self.configured_interface = interface
+        self.offline = offline
+        self.cache_file = os.path.expanduser(cache_file) if cache_file else None
+        self.cache_ttl = cache_ttl
+        self.lock = threading.RLock()
+        self.values = {}  # Discovered fields, see FIELDS
+        self.discovered = set()  # Fields looked up by this object rather than taken from the cache
+        self._iface = None
+        self._cache = None
+
+    def _load_cache(self) -> dict:
+        # Every field has its own discovery time in 'times', a field is only
+        # used while it is younger than cache_ttl (any age in offline mode)
+        if self._cache is None:
+            self._cache = {'times': {}}
+            if self.cache_file:
+                try:
+                    with open(self.cache_file) as file:
+                        cache = json.load(file)
+                    times = cache.get('times') or {}
+                    now = time.time()
+                    for field in self.FIELDS:
+                        if field in cache and field in times and (self.offline or now - times[field] <= self.cache_ttl):
+                            self._cache[field] = cache[field]
+                            self._cache['times'][field] = times[field]
+                except (OSError, ValueError, AttributeError, TypeError):
+                    pass
+            # A cache written for another interface does not apply
+            if self.configured_interface and self._cache.get('interface') not in (None, self.configured_interface):
+                self._cache = {'times': {}}
+        return self._cache
+
+    def _save_cache(self):
+        if not self.cache_file:
+            return
+        # Only fields discovered by this object get a new time, fields taken from the
+        # cache keep theirs and expire on schedule. Failed lookups are not cached,
+        # so the next run tries again
+        cache = self._load_cache()
+        now = time.time()
+        for field in self.discovered:
+            if self.values.get(field) is not None:
+                cache[field] = self.values[field]
+                cache['times'][field] = now
+        if self.configured_interface:
+            cache['interface'] = self.configured_interface
+            cache['times'].setdefault('interface', now)
+        try:
+            os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+            with open(self.cache_file, 'w') as file:
+                json.dump(cache, file)
+        except OSError as e:
+            print(f"Could not write the discovery cache: {e}")
+
+    def _get(self, field, discover):
+        with self.lock:
+            if field not in self.values:
+                cache = self._load_cache()
+                if field in cache:
+                    self.values[field] = cache[field]
+                else:
+                    self.values[field] = discover()
+                    self.discovered.add(field)
+                    self._save_cache()
+            return self.values[field]
+
+    @property
+    def interface(self) -> Optional[str]:
+        '''Name of the Wi-Fi interface.'''
+        if self.configured_interface:
+            return self.configured_interface
+        return self._get('interface', lambda: self.wifi_interface().name())
+
+    @property
+    def mac_address(self) -> Optional[str]:
+        '''MAC address identifying this device.'''
+        if self.offline:
+            return self._get('mac_address', lambda: get_interface_mac(self.interface))
+        return self._get('mac_address', get_mac_address)
+
+    @property
+    def connected_ssid(self) -> Optional[str]:
+        '''SSID of the connected network, None if not connected or unknown.'''
+        if self.offline:
+            with self.lock:
+                return self.values.get('connected_ssid', self._load_cache().get('connected_ssid'))
+        return self._get('connected_ssid', self._discover_ssid)
+
+    @property
+    def connected_bssid(self) -> Optional[str]:
+        '''BSSID (MAC address) of the connected access point, None if not connected or unknown.'''
+        if self.offline:
+            with self.lock:
+                return self.values.get('connected_bssid', self._load_cache().get('connected_bssid'))
+        return self._get('connected_bssid', self._discover_bssid)
+
+    def _discover_bssid(self) -> Optional[str]:
+        bssid = get_link_bssid(self.interface)
+        if bssid:
+            return bssid
+        ssid = self.connected_ssid
+        if not ssid:
+            return None
+        # Without iw, take the strongest access point of the connected SSID from a scan
+        try:
+            iface = self.wifi_interface()
+            iface.scan()
+            networks = [network for network in iface.scan_results() if network.ssid == ssid]
+        except Exception as e:
+            print(f"Error retrieving connected BSSID: {e}")
+            return None
+        if not networks:
+            return None
+        return max(networks, key=lambda network: network.signal).bssid.strip().rstrip(':').lower()
+
+    def _discover_ssid(self) -> Optional[str]:
+        ssid = get_link_ssid(self.interface)
+        if ssid:
+            return ssid
+        iface = self.wifi_interface()
+        if iface.status() != const.IFACE_CONNECTED:
+            print("Wi-Fi interface is not connected or ready.")
+            return None
+        # Only scan when the link cannot be queried directly
+        return get_connected_ssid(iface)
+
+    def wifi_interface(self):
+        '''
+        The pywifi interface object, matched by name if an interface is configured.
+        '''
+        with self.lock:
+            if self._iface is None:
+                interfaces = PyWiFi().interfaces()
+                if not interfaces:
+                    raise RuntimeError("No Wi-Fi interface found.")
+                self._iface = interfaces[0]
+                if self.configured_interface:
+                    for iface in interfaces:
+                        if iface.name() == self.configured_interface:
+                            self._iface = iface
+                            break
+            return self._iface
+
+    def refresh(self):
+        '''
+        Forgets everything discovered so far, including the cache file.
+        '''
+        with self.lock:
+            self.values = {}
+            self.discovered = set()
+            self._cache = {'times': {}}
+            self._iface = None
+            if self.cache_file:
+                try:
+                    os.remove(self.cache_file)
+                except OSError:
+                    pass
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def shared_discovery() -> DeviceDiscovery:
+    '''
+    The DeviceDiscovery shared by all collectors that are not given their own.
+    '''
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = DeviceDiscovery()
+        return _shared
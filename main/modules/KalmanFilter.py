@@ -1,43 +1,85 @@
 import numpy as np
 import threading
+import time
+from scipy.signal import lfilter
 from .Module import Module
 
 class KalmanFilter(Module):
+    MODELS = ('constant', 'constant_velocity')
+
     def __init__(self,
                  dt: float = 1.0,
                  process_var: float = 1e-4,
                  measurement_var: float = 1.0,
                  initial_state: list = [0.0],
-                 initial_uncertainty: np.ndarray = np.array([[1.0]])):
+                 initial_uncertainty: np.ndarray = np.array([[1.0]]),
+                 model: str = 'constant',
+                 use_timestamps: bool = True,
+                 arrival_time: bool = False):
         """
         Initializes the Kalman Filter for filtering RSSI data.
         
-        :param dt: Time step between updates.
-        :param process_var: Process variance (uncertainty in the model).
+        :param dt: Time step between updates. Used as the nominal step when no timestamps are available.
+        :param process_var: Process variance (uncertainty in the model). For the constant velocity
+                            model this is the spectral density of the white noise acceleration.
         :param measurement_var: Measurement variance (uncertainty in RSSI).
-        :param initial_state: Initial state vector [RSSI].
-        :param initial_uncertainty: Initial uncertainty (covariance matrix).
+        :param initial_state: Initial state vector [RSSI] or [RSSI, rate]. Missing entries are zero.
+        :param initial_uncertainty: Initial uncertainty (covariance matrix). A 1x1 matrix is expanded
+                                    to the diagonal of the model's state dimension.
+        :param model: 'constant' assumes the filtered quantity (RSSI or distance) is constant,
+                      'constant_velocity' tracks its value and rate of change.
+        :param use_timestamps: Derive dt from measurement timestamps instead of the fixed dt argument.
+        :param arrival_time: Use the time a value is processed as its timestamp when it has none.
+                             Off by default, the nominal dt is used for values without timestamps,
+                             so the result does not depend on queueing delays or batching.
         """
         super().__init__()
+        if model not in self.MODELS:
+            raise ValueError(f"Unknown model '{model}', expected one of {self.MODELS}.")
+        self.model = model
+        dim = 1 if model == 'constant' else 2
+
         # Time step
         self.dt = dt
+        self.use_timestamps = use_timestamps
+        self.arrival_time = arrival_time
+        self.last_timestamp = None
+        self.process_var = process_var
+
+        # Plain float arithmetic is used instead of 1x1 matrices for a scalar state
+        self.scalar = dim == 1
 
         # State vector and covariance matrix
-        self.x = np.array(initial_state, dtype=float)  # [RSSI]
-        self.P = np.array(initial_uncertainty, dtype=float)  # [[P]]
+        x0 = np.zeros(dim)
+        given = np.ravel(np.array(initial_state, dtype=float))[:dim]
+        x0[:len(given)] = given
+        P0 = np.array(initial_uncertainty, dtype=float)
+        if P0.shape != (dim, dim):
+            P0 = np.eye(dim) * P0.reshape(-1)[0]
+        self.initial_state = x0
+        self.initial_uncertainty = P0
+        self.x = x0  # [RSSI] or [RSSI, rate]
+        self.P = P0
 
         # State transition matrix
-        self.A = np.array([[1.0]])  # Assuming RSSI is constant without control input
+        self.A = np.eye(dim)  # Assuming RSSI is constant without control input
 
         # Control matrix (unused)
-        self.B = np.array([0.0])
+        self.B = np.zeros(dim)
 
         # Measurement matrix
-        self.H = np.array([[1.0]])
+        self.H = np.zeros((1, dim))
+        self.H[0, 0] = 1.0
 
         # Process and measurement noise covariance matrices
         self.Q = np.array([[process_var]])  # Process noise
         self.R = np.array([[measurement_var]])  # Measurement noise
+        self._transition_dt = None
+        if not self.scalar:
+            self.set_dt(dt)
+
+        # Relative change in P below which the scalar gain is treated as converged
+        self.gain_tolerance = 1e-12
 
         # Start the processing thread
         self.thread = threading.Thread(target=self.run, daemon=True)
@@ -56,39 +98,141 @@ class KalmanFilter(Module):
                     # Sentinel value to terminate the thread
                     break
 
-                # Check if the data is a list (multiple RSSI measurements)
-                if isinstance(data, list):
-                    for rssi in data:
-                        self.process_rssi(rssi)
-                else:
-                    # Assume it's a single RSSI measurement
-                    self.process_rssi(data)
+                # Gather a batch of RSSI measurements if batching is enabled
+                data, stop = self.gather(data)
+
+                # Lists (multiple RSSI measurements) are filtered with process_batch
+                # and forwarded as one list, single measurements one at a time
+                self.handle(data)
+                if stop:
+                    break
 
             except Exception as e:
                 print(f"KalmanFilter encountered an error: {e}")
 
-    def process_rssi(self, rssi: float):
+    @property
+    def x(self) -> np.ndarray:
+        if self.scalar:
+            return np.array([self._x])
+        return self._x
+
+    @x.setter
+    def x(self, value):
+        value = np.array(value, dtype=float)
+        if self.scalar:
+            self._x = float(value.reshape(-1)[0])
+        else:
+            self._x = value
+
+    @property
+    def P(self) -> np.ndarray:
+        if self.scalar:
+            return np.array([[self._P]])
+        return self._P
+
+    @P.setter
+    def P(self, value):
+        value = np.array(value, dtype=float)
+        if self.scalar:
+            self._P = float(value.reshape(-1)[0])
+        else:
+            self._P = value
+
+    def set_dt(self, dt: float):
         """
-        Processes a single RSSI measurement through the Kalman Filter.
-        
-        :param rssi: Received Signal Strength Indicator.
+        Rebuilds the state transition and process noise matrices for a time step.
+        The constant model does not depend on dt.
+
+        :param dt: Time step in seconds.
+        """
+        if self.model == 'constant' or dt == self._transition_dt:
+            return
+        q = self.process_var
+        self.A = np.array([[1.0, dt],
+                           [0.0, 1.0]])
+        # Continuous white noise acceleration integrated over dt
+        self.Q = q * np.array([[dt ** 3 / 3, dt ** 2 / 2],
+                               [dt ** 2 / 2, dt]])
+        self._transition_dt = dt
+
+    def elapsed(self, timestamp: float = None) -> float:
+        """
+        Time step since the previous measurement.
+
+        :param timestamp: Measurement time in seconds, None if unknown.
+        :return: dt, or the nominal dt if timestamps are disabled, the measurement has no timestamp
+                 (unless arrival_time is set) or this is the first measurement.
+        """
+        if not self.use_timestamps:
+            return self.dt
+        if timestamp is None:
+            if not self.arrival_time:
+                # The next timestamped measurement starts over with the nominal dt
+                self.last_timestamp = None
+                return self.dt
+            timestamp = time.monotonic()
+        last, self.last_timestamp = self.last_timestamp, timestamp
+        if last is None:
+            return self.dt
+        return max(timestamp - last, 0.0)
+
+    def reset(self):
+        """
+        Restores the initial state and covariance.
+        """
+        self.x = self.initial_state
+        self.P = self.initial_uncertainty
+        self.last_timestamp = None
+
+    def step(self, value: float, timestamp: float = None) -> float:
+        """
+        Runs one predict/update cycle and returns the filtered RSSI.
+
+        :param value: Received Signal Strength Indicator.
+        :param timestamp: Measurement time in seconds, if known, see elapsed().
+        :return: The filtered RSSI.
         """
         # Prediction step
-        self.predict()
+        if not self.scalar:
+            self.predict(self.elapsed(timestamp))
+        else:
+            self.predict()
 
         # Update step with the new RSSI measurement
-        self.update(rssi)
+        self.update(value)
 
         # Extract the filtered RSSI
-        filtered_rssi = self.x[0]
+        return self._x if self.scalar else self.x[0]
+
+    def process_array(self, values, timestamps=None) -> np.ndarray:
+        return self.process_batch(values, timestamps)
+
+    def process_rssi(self, rssi: float, timestamp: float = None):
+        """
+        Processes a single RSSI measurement through the Kalman Filter.
+        
+        :param rssi: Received Signal Strength Indicator.
+        :param timestamp: Measurement time in seconds, if known, see elapsed().
+        """
+        filtered_rssi = self.step(rssi, timestamp)
 
         # Output the filtered RSSI to the next module
         self.output.put(filtered_rssi)
 
-    def predict(self):
+    def predict(self, dt: float = None):
         """
         Prediction step of the Kalman Filter.
+
+        :param dt: Time step since the last update, defaults to the nominal dt.
         """
+        if self.scalar:
+            a = self.A[0, 0]
+            self._x = a * self._x
+            self._P = a * self._P * a + self.Q[0, 0]
+            return
+
+        self.set_dt(self.dt if dt is None else dt)
+
         # Predict the next state
         self.x = self.A @ self.x
 
@@ -101,21 +245,89 @@ class KalmanFilter(Module):
         
         :param measurement: Received Signal Strength Indicator.
         """
+        if self.scalar:
+            h = self.H[0, 0]
+            S = h * self._P * h + self.R[0, 0]
+            K = self._P * h / S
+            self._x = self._x + K * (measurement - h * self._x)
+            self._P = (1.0 - K * h) * self._P
+            return
+
         # Measurement residual
         y = measurement - (self.H @ self.x)
 
         # Residual covariance
         S = self.H @ self.P @ self.H.T + self.R
 
-        # Kalman Gain
-        K = self.P @ self.H.T @ np.linalg.inv(S)
+        # Kalman Gain, K = P H^T S^-1 solved without forming the inverse (P and S are symmetric)
+        K = np.linalg.solve(S, self.H @ self.P).T
 
         # Update the state estimate
         self.x = self.x + (K @ y).flatten()
 
-        # Update the covariance matrix
-        I = np.eye(self.P.shape[0])
-        self.P = (I - K @ self.H) @ self.P
+        # Update the covariance matrix in Joseph form, which keeps P symmetric positive definite
+        I_KH = np.eye(self.P.shape[0]) - K @ self.H
+        self.P = I_KH @ self.P @ I_KH.T + K @ self.R @ K.T
+
+    def process_batch(self, measurements, timestamps=None) -> np.ndarray:
+        """
+        Filters a whole array of RSSI measurements in one call and returns the
+        filtered RSSI for every measurement. The filter state is advanced as if
+        each measurement had been passed to process_rssi, but nothing is put on
+        the output queue.
+
+        For a scalar state the covariance and gain sequence do not depend on the
+        measurements. The gains are iterated until they converge, and the
+        remaining samples are then a constant-coefficient first order recursion,
+        which is evaluated with scipy.signal.lfilter.
+
+        :param measurements: Array-like of RSSI measurements.
+        :param timestamps: Optional array-like of measurement times in seconds, used to derive dt.
+                           Without timestamps dt is derived as in step(), the nominal dt unless
+                           arrival_time is set.
+        :return: NumPy array of filtered RSSI values.
+        """
+        z = np.asarray(measurements, dtype=float).reshape(-1)
+        out = np.empty_like(z)
+        if not self.scalar:
+            if timestamps is not None:
+                dts = [self.elapsed(t) for t in np.asarray(timestamps, dtype=float).reshape(-1)]
+            else:
+                dts = [self.elapsed() for _ in z]
+            for i, measurement in enumerate(z):
+                self.predict(dts[i])
+                self.update(measurement)
+                out[i] = self.x[0]
+            return out
+
+        a, h = self.A[0, 0], self.H[0, 0]
+        q, r = self.Q[0, 0], self.R[0, 0]
+        x, P = self._x, self._P
+
+        # Transient: run the recursion until the gain settles
+        i = 0
+        n = len(z)
+        converged = False
+        while i < n:
+            P_pred = a * P * a + q
+            K = P_pred * h / (h * P_pred * h + r)
+            P_new = (1.0 - K * h) * P_pred
+            x = a * x + K * (z[i] - h * a * x)
+            out[i] = x
+            i += 1
+            converged = abs(P_new - P) <= self.gain_tolerance * abs(P)
+            P = P_new
+            if converged:
+                break
+
+        # Steady state: x_k = c * x_{k-1} + K * z_k with a constant gain
+        if converged and i < n:
+            c = (1.0 - K * h) * a
+            out[i:] = lfilter([K], [1.0, -c], z[i:], zi=[c * x])[0]
+            x = out[-1]
+
+        self._x, self._P = float(x), float(P)
+        return out
 
 kalman_filter = KalmanFilter(
     dt=0.01,
@@ -1,6 +1,11 @@
 from .Module import Module
+from .PathLossCalibration import PathLossCalibrator, CalibrationStore
+from .Discovery import DeviceDiscovery, shared_discovery
+from config import CALIBRATION_ENVIRONMENT, CALIBRATION_AUTOSAVE_INTERVAL
+from typing import Optional
 import threading
 import math
+import numpy as np
 
 '''
 P_tx refers to the transmit power of the access point (AP) or device, measured in dBm.
@@ -10,13 +15,43 @@ Indoor Wi-Fi APs: Usually around 20 dBm.
 class LogdistancePathLossModel(Module):
     '''
     Log-distance path loss model that calibrates itself using initial RSSI measurements at a known distance.
+
+    Wi-Fi drivers report RSSI as whole dBm in a small range, so once calibrated the
+    distance of every integer RSSI in TABLE_RANGE is precomputed in a lookup table.
+    The table is rebuilt whenever P_tx, PL_0, n or d_0 change. Non-integer input
+    (e.g. from a filter) and values outside the table use the formula.
+
+    PL_0 and n can also be fitted across several distances: while reference_distance
+    is set, every input is taken as measured at that distance and refines a
+    recursive least squares fit (see PathLossCalibrator).
+
+    With a calibration_file the fit is kept in a CalibrationStore under the
+    device MAC address, the access point BSSID and an environment tag. Models of
+    the same access point share its profile, whichever saves last wins. A stored
+    fit is applied at construction, so no readings are withheld for calibration.
+    With refine=True the first calibration_samples readings still refine it (as
+    measured at initial_distance) while distances are output. New samples are
+    saved by a background thread every CALIBRATION_AUTOSAVE_INTERVAL seconds and
+    on stop().
     '''
-    def __init__(self, initial_distance = 1, P_tx = 20, d_0=1, calibration_samples=10, n=3):
+    TABLE_RANGE = (-128, 127)  # Integer RSSI values in the lookup table, inclusive
+
+    def __init__(self, initial_distance = 1, P_tx = 20, d_0=1, calibration_samples=10, n=3,
+                 calibration_file: Optional[str] = None, bssid: Optional[str] = None,
+                 environment: Optional[str] = CALIBRATION_ENVIRONMENT, refine: bool = False,
+                 discovery: DeviceDiscovery = None):
         '''
         initial_distance: The known distance at which initial RSSI measurements are taken.
         P_tx: Transmitted power in dBm.
         d_0: Reference distance (typically 1 meter).
         calibration_samples: Number of samples to collect during calibration.
+        n: Path loss exponent, None to estimate it. Used as the prior of the multi-distance fit.
+        calibration_file: CalibrationStore file the fit is loaded from and saved to, None to not persist it.
+        bssid: BSSID of the access point, None for the connected one (looked up by discovery).
+               Part of the stored profile's key.
+        environment: Environment tag, part of the stored profile's key.
+        refine: Keep refining a stored fit with the first calibration_samples readings.
+        discovery: DeviceDiscovery providing the MAC address and connected BSSID, defaults to the shared one.
         '''
         super().__init__()
         self.initial_distance = initial_distance
@@ -27,8 +62,69 @@ class LogdistancePathLossModel(Module):
         self.calibrated = False
         self.PL_0 = None
         self.n = n
+        self.initial_n = n
+        self.reference_distance = None  # Known distance of the incoming samples, see calibrate_sample()
+        self._refining = 0              # Readings left to refine a stored fit with
+        self.calibration_file = calibration_file
+        self.calibrator = None
+        self._unsaved = False
+        # Held while the fit is updated and while it is copied for saving, so the
+        # autosave thread never sees a half-updated fit or loses the unsaved flag
+        self._calibration_lock = threading.Lock()
+        self._stop_autosave = threading.Event()
+        if calibration_file:
+            self.store = CalibrationStore(calibration_file)
+            discovery = discovery if discovery is not None else shared_discovery()
+            if bssid is None:
+                bssid = discovery.connected_bssid
+                if bssid is None:
+                    print("Connected BSSID unknown, the calibration profile is shared by all access points.")
+            self.profile = (discovery.mac_address, bssid, environment)
+            self.calibrator = self.store.load(*self.profile)
+            if self.calibrator is not None and self.calibrator.count:
+                self.apply_fit()
+                print(f"Loaded calibration: PL_0 = {self.PL_0:.2f}, n = {self.n:.2f} ({self.calibrator.count} samples)")
+                if refine:
+                    self._refining = calibration_samples
+                    self.reference_distance = initial_distance
+            threading.Thread(target=self._autosave, daemon=True).start()
+        if self.calibrator is None:
+            self.calibrator = PathLossCalibrator(P_tx=P_tx, d_0=d_0, n=n)
         self.start()
 
+    def __setattr__(self, name, value):
+        # Changing a model parameter invalidates the lookup table
+        if name in ('P_tx', 'PL_0', 'n', 'd_0'):
+            self.__dict__['_table'] = self.__dict__['_table_list'] = None
+        super().__setattr__(name, value)
+
+    @property
+    def table(self) -> np.ndarray:
+        '''
+        Distance for every integer RSSI in TABLE_RANGE, built on first use after a parameter change.
+        '''
+        if self._table is None:
+            if self.PL_0 is None or self.n is None:
+                raise ValueError("Model is not calibrated.")
+            low, high = self.TABLE_RANGE
+            self._table = self.distance(np.arange(low, high + 1, dtype=float))
+            self._table_list = self._table.tolist()  # Indexing a list is faster for single values
+        return self._table
+
+    def distance(self, rssi):
+        '''
+        Log-distance path loss formula, for a single RSSI or a NumPy array.
+        '''
+        return self.d_0 * 10 ** ((self.P_tx - rssi - self.PL_0) / (10 * self.n))
+
+    def expected_rssi(self, distance):
+        '''
+        RSSI the model predicts at a distance, the inverse of distance(), for a single value or a NumPy array.
+        '''
+        if self.PL_0 is None or self.n is None:
+            raise ValueError("Model is not calibrated.")
+        return self.P_tx - self.PL_0 - 10 * self.n * np.log10(distance / self.d_0)
+
     def start(self):
         self.process_thread = threading.Thread(target=self.process, daemon=True)
         self.process_thread.start()
@@ -36,48 +132,143 @@ class LogdistancePathLossModel(Module):
     def stop(self):
         self.input.put(None)
         self.process_thread.join()
+        self._stop_autosave.set()
+        self.save_calibration()
+
+    def _autosave(self):
+        while not self._stop_autosave.wait(CALIBRATION_AUTOSAVE_INTERVAL):
+            try:
+                self.save_calibration()
+            except OSError as e:
+                print(f"Could not save the calibration: {e}")
 
     def calibrate(self):
         # Calculate average RSSI during calibration
         avg_rssi = sum(self.calibration_rssi_values) / len(self.calibration_rssi_values)
-        
-        # Estimate PL_0
-        self.PL_0 = self.P_tx - avg_rssi
-        # Estimate n using the known initial distance
+
+        # A single distance cannot tell PL_0 and n apart, so n is assumed
+        # unless it is fitted across distances with calibrate_sample()
         if self.n is None:
-            if self.initial_distance != self.d_0:
-                self.n = (self.P_tx - avg_rssi - self.PL_0) / (10 * math.log10(self.initial_distance / self.d_0))
-            else:
-                # If initial_distance equals d_0, path loss exponent n is undefined
-                # Assume n = 2 (free space) or any typical value
-                self.n = 2
+            self.n = 2  # Free space
+        # Estimate PL_0 from the path loss at the known initial distance
+        self.PL_0 = self.P_tx - avg_rssi - 10 * self.n * math.log10(self.initial_distance / self.d_0)
+
+        if self.calibration_file:
+            # Persist the samples so the next run starts calibrated
+            with self._calibration_lock:
+                self.calibrator.update_array([self.initial_distance] * len(self.calibration_rssi_values),
+                                             self.calibration_rssi_values)
+                self._unsaved = True
 
         self.calibrated = True
         print(f"Calibration completed: PL_0 = {self.PL_0:.2f}, n = {self.n:.2f}")
 
-    def process(self):
-        while True:
-            data = self.input.get()
+    def calibrate_sample(self, distance: float, rssi: float):
+        '''
+        Refines the multi-distance fit with one RSSI measured at a known distance
+        and applies it once calibration_samples labelled samples were seen.
+        '''
+        with self._calibration_lock:
+            self.calibrator.update(distance, rssi)
+            self._unsaved = True
+        if self.calibrated or self.calibrator.count >= self.calibration_samples:
+            self.apply_fit()
+
+    def apply_fit(self):
+        '''
+        Uses PL_0 and n of the multi-distance fit.
+        '''
+        # The fit determines P_tx - PL_0, so it carries over to this model's P_tx
+        self.PL_0 = self.calibrator.PL_0 + self.P_tx - self.calibrator.P_tx
+        self.n = self.calibrator.n
+        self.calibrated = True
 
-            if data is None:
-                break
+    def save_calibration(self):
+        '''
+        Writes the fit to the calibration store if it has new samples.
+        '''
+        if not self.calibration_file:
+            return
+        with self._calibration_lock:
+            if not self._unsaved:
+                return
+            state = self.calibrator.to_dict()
+            self._unsaved = False
+        self.store.save(*self.profile, state)
 
-            rssi = data
+    def reset(self):
+        self.calibration_rssi_values = []
+        self.calibrated = False
+        self.PL_0 = None
+        self.n = self.initial_n
+        if self.calibrator.count:
+            # A fitted calibration outlives the stream
+            self.apply_fit()
 
+    def step(self, value, timestamp=None):
+        rssi = value
+
+        if self.reference_distance is not None:
+            self.calibrate_sample(self.reference_distance, rssi)
+            if self._refining:
+                self._refining -= 1
+                if not self._refining:
+                    self.reference_distance = None
             if not self.calibrated:
-                # Collect calibration samples
-                self.calibration_rssi_values.append(rssi)
-                if len(self.calibration_rssi_values) >= self.calibration_samples:
-                    self.calibrate()
-                continue
+                return None
+        elif not self.calibrated:
+            # Collect calibration samples
+            self.calibration_rssi_values.append(rssi)
+            if len(self.calibration_rssi_values) >= self.calibration_samples:
+                self.calibrate()
+            return None
 
-            # Ensure calibration has been done before processing
-            if self.PL_0 is None or self.n is None:
-                raise ValueError("Model is not calibrated.")
+        # Ensure calibration has been done before processing
+        if self.PL_0 is None or self.n is None:
+            raise ValueError("Model is not calibrated.")
+
+        # Whole dBm values are looked up
+        table = self._table_list
+        if table is None:
+            self.table
+            table = self._table_list
+        if type(rssi) is int or (type(rssi) is float and rssi.is_integer()) or isinstance(rssi, np.integer):
+            index = int(rssi) - self.TABLE_RANGE[0]
+            if 0 <= index < len(table):
+                return table[index]
+
+        # Log-distance path loss formula to estimate distance
+        exponent = (self.P_tx - rssi - self.PL_0) / (10 * self.n)
+        return self.d_0 * (10 ** exponent)
+
+    def process_array(self, values, timestamps=None) -> np.ndarray:
+        '''
+        Vectorized step() over an array: samples still needed for calibration are
+        consumed one by one, the rest is converted in one pass, through the lookup
+        table for integer arrays and with the formula otherwise.
+        '''
+        if self.reference_distance is not None:
+            # Every sample refines the fit, which changes the parameters
+            return super().process_array(values, timestamps)
+        rssi = np.asarray(values).reshape(-1)
+        start = 0
+        while not self.calibrated and start < len(rssi):
+            self.step(rssi[start].item())
+            start += 1
+        rssi = rssi[start:]
+        if not len(rssi):
+            return np.empty(0)
+
+        if self.PL_0 is None or self.n is None:
+            raise ValueError("Model is not calibrated.")
+        if not np.issubdtype(rssi.dtype, np.integer):
+            return self.distance(rssi.astype(float, copy=False))
 
-            # Log-distance path loss formula to estimate distance
-            exponent = (self.P_tx - rssi - self.PL_0) / (10 * self.n)
-            distance = self.d_0 * (10 ** exponent)
-            
-            # Output the estimated distance
-            self.output.put(distance)
+        index = rssi.astype(np.intp) - self.TABLE_RANGE[0]
+        inside = (index >= 0) & (index < len(self.table))
+        if inside.all():
+            return self.table[index]
+        out = np.empty(len(rssi))
+        out[inside] = self.table[index[inside]]
+        out[~inside] = self.distance(rssi[~inside].astype(float))
+        return out
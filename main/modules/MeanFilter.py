@@ -1,14 +1,185 @@
 from .Module import Module
 import threading
-from statistics import mean
+import math
+import time
+from collections import deque
+
+class CompensatedSum:
+    '''
+    Running sum with Neumaier (improved Kahan) compensation.
+    '''
+    def __init__(self):
+        self.total = 0.0
+        self.compensation = 0.0
+
+    def add(self, value):
+        t = self.total + value
+        if abs(self.total) >= abs(value):
+            self.compensation += (self.total - t) + value
+        else:
+            self.compensation += (value - t) + self.total
+        self.total = t
+
+    def reset(self, value=0.0):
+        self.total = value
+        self.compensation = 0.0
+
+    @property
+    def value(self):
+        return self.total + self.compensation
+
+class RollingMean:
+    '''
+    O(1) sliding-window mean over a fixed-capacity ring buffer.
+
+    The sum is updated incrementally with compensated arithmetic and is rebuilt
+    exactly with math.fsum every `resync_interval` samples so long runs don't drift.
+    '''
+    def __init__(self, window_size, resync_interval=None):
+        if window_size < 1:
+            raise ValueError("window_size must be at least 1.")
+        self.window_size = window_size
+        self.resync_interval = resync_interval or max(1024, 16 * window_size)
+        self.ring = deque(maxlen=window_size)
+        self.sum = CompensatedSum()
+        self._since_resync = 0
+
+    def __len__(self):
+        return len(self.ring)
+
+    def clear(self):
+        self.ring.clear()
+        self.sum.reset()
+        self._since_resync = 0
+
+    def push(self, value, timestamp=None):
+        if len(self.ring) == self.window_size:
+            self.sum.add(-self.ring[0])
+        self.ring.append(value)
+        self.sum.add(value)
+        self._since_resync += 1
+        if self._since_resync >= self.resync_interval:
+            self.sum.reset(math.fsum(self.ring))
+            self._since_resync = 0
+
+    def mean(self):
+        return self.sum.value / len(self.ring)
+
+class ExponentialMean:
+    '''
+    Exponentially weighted moving average, y = y + alpha * (x - y).
+
+    alpha defaults to 2 / (window_size + 1), which gives the same centre of mass
+    as a simple mean over window_size samples.
+    '''
+    def __init__(self, window_size, alpha=None):
+        if window_size < 1:
+            raise ValueError("window_size must be at least 1.")
+        self.window_size = window_size
+        self.alpha = alpha if alpha is not None else 2.0 / (window_size + 1)
+        if not 0.0 < self.alpha <= 1.0:
+            raise ValueError("alpha must be in (0, 1].")
+        self.value = None
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.window_size)
+
+    def clear(self):
+        self.value = None
+        self.count = 0
+
+    def push(self, value, timestamp=None):
+        if self.value is None:
+            self.value = float(value)
+        else:
+            self.value += self.alpha * (value - self.value)
+        self.count += 1
+
+    def mean(self):
+        return self.value
+
+class TimeWeightedMean:
+    '''
+    Sliding-window mean over the last window_size samples where each sample is
+    weighted by the time elapsed since the previous sample, so irregular sampling
+    does not bias the average towards bursts of readings.
+    '''
+    def __init__(self, window_size, resync_interval=None):
+        if window_size < 1:
+            raise ValueError("window_size must be at least 1.")
+        self.window_size = window_size
+        self.resync_interval = resync_interval or max(1024, 16 * window_size)
+        self.ring = deque(maxlen=window_size)  # (weight, value) pairs
+        self.weight_sum = CompensatedSum()
+        self.weighted_sum = CompensatedSum()
+        self.value_sum = CompensatedSum()
+        self.last_timestamp = None
+        self._since_resync = 0
+
+    def __len__(self):
+        return len(self.ring)
+
+    def clear(self):
+        self.ring.clear()
+        self.weight_sum.reset()
+        self.weighted_sum.reset()
+        self.value_sum.reset()
+        self.last_timestamp = None
+        self._since_resync = 0
+
+    def push(self, value, timestamp=None):
+        if timestamp is None:
+            timestamp = time.monotonic()
+        weight = 0.0 if self.last_timestamp is None else max(timestamp - self.last_timestamp, 0.0)
+        self.last_timestamp = timestamp
+
+        if len(self.ring) == self.window_size:
+            old_weight, old_value = self.ring[0]
+            self.weight_sum.add(-old_weight)
+            self.weighted_sum.add(-old_weight * old_value)
+            self.value_sum.add(-old_value)
+        self.ring.append((weight, value))
+        self.weight_sum.add(weight)
+        self.weighted_sum.add(weight * value)
+        self.value_sum.add(value)
+
+        self._since_resync += 1
+        if self._since_resync >= self.resync_interval:
+            self.weight_sum.reset(math.fsum(w for w, _ in self.ring))
+            self.weighted_sum.reset(math.fsum(w * v for w, v in self.ring))
+            self.value_sum.reset(math.fsum(v for _, v in self.ring))
+            self._since_resync = 0
+
+    def mean(self):
+        total_weight = self.weight_sum.value
+        if total_weight <= 0.0:
+            # All samples share a timestamp, fall back to equal weights
+            return self.value_sum.value / len(self.ring)
+        return self.weighted_sum.value / total_weight
 
 class MeanFilter(Module):
     '''
     Mean Filter with configurable window size
+
+    mode: 'window' for a simple sliding-window mean, 'exponential' for an
+          exponentially weighted moving average (see alpha) or 'time' for a
+          sliding-window mean weighted by the time between samples.
     '''
-    def __init__(self, window_size=100):
+    ENGINES = {
+        'window': RollingMean,
+        'exponential': ExponentialMean,
+        'time': TimeWeightedMean,
+    }
+
+    def __init__(self, window_size=100, mode='window', alpha=None):
         super().__init__()
+        if mode not in self.ENGINES:
+            raise ValueError(f"Unknown mode '{mode}', expected one of {tuple(self.ENGINES)}.")
         self.window_size = window_size  # Set the window size
+        self.mode = mode
+        self.alpha = alpha
+        self.reset()
         self.start()
 
     def start(self):
@@ -19,15 +190,16 @@ class MeanFilter(Module):
         self.input.put(None)
         self.process_thread.join()
 
-    def process(self):
-        window = []
-        while True:
-            data = self.input.get()
-            if data is None:
-                break
-            window.append(data)
-            if len(window) > self.window_size:
-                window.pop(0)  # Keep the window at the correct size
-            if len(window) == self.window_size:
-                mean_value = mean(window)
-                self.output.put(mean_value)
+    def create_engine(self):
+        if self.mode == 'exponential':
+            return ExponentialMean(self.window_size, alpha=self.alpha)
+        return self.ENGINES[self.mode](self.window_size)
+
+    def reset(self):
+        self.window = self.create_engine()
+
+    def step(self, value, timestamp=None):
+        self.window.push(value, timestamp)
+        if len(self.window) == self.window_size:
+            return self.window.mean()
+        return None
@@ -1,14 +1,70 @@
 from .Module import Module
 import threading
+from bisect import bisect_left, insort
+from collections import deque
 from statistics import median
 
+class RollingMedian:
+    '''
+    Incremental sliding-window median backed by a sorted ring buffer.
+
+    The arrival order is kept in a fixed-size deque and the same values are kept
+    sorted in a list, so each new sample costs one binary search to insert and one
+    to evict the oldest value instead of re-sorting the whole window.
+    '''
+    def __init__(self, window_size):
+        if window_size < 1:
+            raise ValueError("window_size must be at least 1.")
+        self.window_size = window_size
+        self.ring = deque(maxlen=window_size)  # Values in arrival order
+        self.sorted = []                       # Same values in sorted order
+
+    def __len__(self):
+        return len(self.ring)
+
+    def clear(self):
+        self.ring.clear()
+        self.sorted.clear()
+
+    def push(self, value):
+        '''
+        Adds a value to the window, evicting the oldest one when the window is full.
+        '''
+        if len(self.ring) == self.window_size:
+            oldest = self.ring[0]
+            del self.sorted[bisect_left(self.sorted, oldest)]
+        self.ring.append(value)
+        insort(self.sorted, value)
+
+    def median(self):
+        '''
+        Returns the median of the current window, matching statistics.median.
+        '''
+        n = len(self.sorted)
+        if n == 0:
+            raise ValueError("no median for empty window")
+        i = n // 2
+        if n % 2 == 1:
+            return self.sorted[i]
+        return (self.sorted[i - 1] + self.sorted[i]) / 2
+
 class MedianFilter(Module):
     '''
-    Mean Filter with configurable window size
+    Median Filter with configurable window size
+
+    backend: 'sorted' uses the incremental RollingMedian engine, 'statistics'
+             recomputes statistics.median over the whole window for every sample.
+             Both produce identical outputs.
     '''
-    def __init__(self, window_size=99):
+    BACKENDS = ('sorted', 'statistics')
+
+    def __init__(self, window_size=99, backend='sorted'):
         super().__init__()
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {self.BACKENDS}.")
         self.window_size = window_size  # Set the window size
+        self.backend = backend
+        self.reset()
         self.start()
 
     def start(self):
@@ -19,15 +75,22 @@ class MedianFilter(Module):
         self.input.put(None)
         self.process_thread.join()
 
-    def process(self):
-        window = []
-        while True:
-            data = self.input.get()
-            if data is None:
-                break
-            window.append(data)
-            if len(window) > self.window_size:
-                window.pop(0)  # Keep the window at the correct size
-            if len(window) == self.window_size:
-                median_value = median(window)
-                self.output.put(median_value)
+    def reset(self):
+        if self.backend == 'sorted':
+            self.window = RollingMedian(self.window_size)
+        else:
+            self.window = []
+
+    def step(self, value, timestamp=None):
+        if self.backend == 'sorted':
+            self.window.push(value)
+            if len(self.window) == self.window_size:
+                return self.window.median()
+            return None
+
+        self.window.append(value)
+        if len(self.window) > self.window_size:
+            self.window.pop(0)  # Keep the window at the correct size
+        if len(self.window) == self.window_size:
+            return median(self.window)
+        return None
@@ -1,6 +1,165 @@
 import queue
+import time
+from collections import namedtuple
+import numpy as np
+from .BoundedQueue import BoundedQueue
+
+# A value tagged with a sequence number and the time it was acquired, see Pipeline(tag_samples=True)
+Sample = namedtuple('Sample', ['seq', 't_monotonic', 't_wall', 'value'])
 
 class Module:
+    '''
+    Base class for pipeline modules.
+
+    A module reads values from its input queue and writes results to its output
+    queue from a background thread. The same processing is available synchronously
+    through step()/process_array(), which is what Pipeline.replay uses to run
+    recorded data through the modules without threads or queues.
+
+    In batch mode (batch_size > 1) items are moved between modules as lists of
+    values: the module gathers up to batch_size values from its input, waiting at
+    most max_latency seconds after the first one, and forwards all results as a
+    single list. A list arriving on the input is always answered with a list.
+
+    Sample records are unwrapped before processing: step() receives the value and
+    t_monotonic as its timestamp, and the result is forwarded as the same Sample
+    with its value replaced.
+    '''
+    batch_size = 1
+    max_latency = 0.0
+
     def __init__(self):
-        self.input = queue.Queue()
-        self.output = queue.Queue()
\ No newline at end of file
+        self.input = BoundedQueue()
+        self.output = BoundedQueue()
+
+    def reset(self):
+        '''
+        Clears the processing state so the module can start on a new stream.
+        '''
+        pass
+
+    def step(self, value, timestamp=None):
+        '''
+        Processes a single value.
+
+        :param value: The input value.
+        :param timestamp: Time of the value in seconds, if known.
+        :return: The output value, or None if the module emits nothing for this input
+                 (e.g. while a filter window is filling up).
+        '''
+        raise NotImplementedError
+
+    def process_array(self, values, timestamps=None) -> np.ndarray:
+        '''
+        Processes a whole array of values, as if each had been passed to step().
+
+        :param values: Array-like of input values.
+        :param timestamps: Optional array-like of timestamps, one per value.
+        :return: NumPy array of the emitted outputs.
+        '''
+        outputs = []
+        if timestamps is None:
+            for value in values:
+                result = self.step(value)
+                if result is not None:
+                    outputs.append(result)
+        else:
+            for value, timestamp in zip(values, timestamps):
+                result = self.step(value, timestamp)
+                if result is not None:
+                    outputs.append(result)
+        return np.asarray(outputs, dtype=float)
+
+    def configure_queues(self, maxsize=0, overflow='block'):
+        '''
+        Sets the capacity and overflow policy of the module's queues.
+
+        :param maxsize: Maximum number of queued items, 0 for unbounded.
+        :param overflow: One of BoundedQueue.POLICIES.
+        '''
+        for q in (self.input, self.output):
+            if isinstance(q, BoundedQueue):
+                q.configure(maxsize, overflow)
+
+    def configure_batching(self, batch_size=1, max_latency=0.0):
+        '''
+        Sets the batch transport parameters.
+
+        :param batch_size: Maximum number of values gathered into one batch, 1 disables batching.
+        :param max_latency: Maximum time in seconds to wait for a batch to fill up.
+        '''
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+
+    def gather(self, data):
+        '''
+        In batch mode, collects more values from the input queue after `data` until
+        batch_size values are gathered or max_latency has passed. Incoming batches
+        are never split.
+
+        :param data: The item already taken from the input queue.
+        :return: (data, stop) where stop is True if the None sentinel was received.
+        '''
+        if self.batch_size <= 1:
+            return data, False
+
+        batch = list(data) if isinstance(data, (list, np.ndarray)) else [data]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    item = self.input.get(timeout=remaining)
+                else:
+                    item = self.input.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            if isinstance(item, (list, np.ndarray)):
+                batch.extend(item)
+            else:
+                batch.append(item)
+        return batch, False
+
+    def handle(self, data):
+        '''
+        Processes one item from the input queue, a single value or a batch, and
+        forwards the result to the output queue.
+        '''
+        if isinstance(data, (list, np.ndarray)):
+            if len(data) and isinstance(data[0], Sample):
+                outputs = self.process_array([s.value for s in data], [s.t_monotonic for s in data])
+                # Modules only withhold a leading warm-up, so the outputs belong to the last samples
+                tagged = data[len(data) - len(outputs):]
+                outputs = [s._replace(value=v) for s, v in zip(tagged, outputs.tolist())]
+            else:
+                outputs = self.process_array(data).tolist()
+            if outputs:
+                self.output.put(outputs)
+            return
+
+        if isinstance(data, Sample):
+            result = self.step(data.value, data.t_monotonic)
+            if result is not None:
+                self.output.put(data._replace(value=result))
+            return
+
+        result = self.step(data)
+        if result is not None:
+            self.output.put(result)
+
+    def process(self):
+        '''
+        Processing loop run by the module's thread. Stops on a None sentinel.
+        '''
+        while True:
+            data = self.input.get()
+            if data is None:
+                break
+            data, stop = self.gather(data)
+            self.handle(data)
+            if stop:
+                break
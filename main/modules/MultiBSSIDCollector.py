@@ -0,0 +1,216 @@
+from typing import Optional
+import itertools
+import threading
+import time
+from .Module import Module, Sample
+from .Scheduler import DeadlineScheduler
+from .Discovery import DeviceDiscovery, shared_discovery
+from config import COLLECTOR_INTERVAL
+
+def normalize_bssid(bssid: str) -> str:
+    '''
+    Lower-case MAC address without the trailing colon some platforms report.
+    '''
+    return bssid.strip().rstrip(':').lower()
+
+class BSSIDStream(Module):
+    '''
+    Source module fed by a MultiBSSIDCollector with the readings of one access point.
+    Use it as the first module of a Pipeline in place of an RSSICollector.
+    '''
+    def __init__(self, collector: 'MultiBSSIDCollector', bssid: Optional[str]):
+        super().__init__()
+        self.collector = collector
+        self.bssid = bssid  # None follows the strongest BSSID of the connected SSID
+        self.batch = []
+        self.batch_deadline = None
+
+    def publish(self, sample: Sample):
+        '''
+        Outputs one reading, collecting readings into lists in batch mode.
+        '''
+        if self.batch_size <= 1:
+            self.output.put(sample)
+            return
+        if not self.batch:
+            self.batch_deadline = time.monotonic() + self.max_latency
+        self.batch.append(sample)
+        if len(self.batch) >= self.batch_size or time.monotonic() >= self.batch_deadline:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            self.output.put(self.batch)
+            self.batch = []
+
+    def start(self):
+        '''Starts the collector's scan thread unless another stream already did.'''
+        self.collector.start_stream(self)
+
+    def stop(self):
+        '''Stops this stream, the scan thread keeps running until the last started stream stops.'''
+        self.collector.stop_stream(self)
+        self.flush()
+
+    def step(self, value, timestamp=None):
+        '''
+        A replayed reading is exactly what the stream would have output.
+        '''
+        return value
+
+class MultiBSSIDCollector:
+    '''
+    Collects the RSSI of every visible access point with one scan per cycle.
+
+    Readings are keyed by BSSID (MAC address), not SSID, so access points sharing
+    an SSID are kept apart. Any number of BSSIDStreams can subscribe, for the
+    same or different access points; they all share the same scan, so N pipelines
+    or N access points still cost one scan per interval. Every reading is output
+    as a Sample whose sequence number identifies the scan it came from, so
+    readings of different access points can be joined on it.
+    '''
+    def __init__(self, interval: float = COLLECTOR_INTERVAL, iface=None, connected_ssid: Optional[str] = None,
+                 discovery: DeviceDiscovery = None):
+        '''
+        :param interval: Time in seconds between scans.
+        :param iface: pywifi interface to scan with, defaults to the discovered one.
+        :param connected_ssid: SSID followed by streams subscribed without a BSSID,
+                               discovered when the first scan runs if not given.
+        :param discovery: DeviceDiscovery to use, defaults to the one shared by all collectors.
+        '''
+        self.interval = interval
+        self.discovery = discovery if discovery is not None else shared_discovery()
+        self._iface = iface
+        self._connected_ssid = connected_ssid
+        self.streams = []
+        self.active = set()  # Streams started with BSSIDStream.start() and not stopped yet
+        self.lock = threading.Lock()
+        self.latest = {}  # BSSID -> Sample from the last scan that saw it
+        self.ssids = {}  # BSSID -> SSID
+        self.scheduler = DeadlineScheduler(interval)
+        self.counter = itertools.count()  # Scan sequence numbers
+        self.scans = 0
+        self.failed = 0  # Scans that raised an error
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def iface(self):
+        if self._iface is None:
+            self._iface = self.discovery.wifi_interface()
+        return self._iface
+
+    @property
+    def connected_ssid(self) -> Optional[str]:
+        if self._connected_ssid is None:
+            self._connected_ssid = self.discovery.connected_ssid
+        return self._connected_ssid
+
+    def subscribe(self, bssid: Optional[str] = None) -> BSSIDStream:
+        '''
+        Creates a stream of the readings of one access point.
+
+        :param bssid: MAC address of the access point, None for the strongest BSSID
+                      of connected_ssid in each scan.
+        :return: A BSSIDStream to add to a Pipeline as its first module.
+        '''
+        stream = BSSIDStream(self, None if bssid is None else normalize_bssid(bssid))
+        with self.lock:
+            self.streams.append(stream)
+        return stream
+
+    def unsubscribe(self, stream: BSSIDStream):
+        self.stop_stream(stream)
+        with self.lock:
+            self.streams.remove(stream)
+
+    def start_stream(self, stream: BSSIDStream):
+        '''
+        Marks a stream as running and starts the scan thread if it is the first one.
+        '''
+        with self.lock:
+            self.active.add(stream)
+        self.start()
+
+    def stop_stream(self, stream: BSSIDStream):
+        '''
+        Marks a stream as stopped and stops the scan thread once no started stream is left.
+        '''
+        with self.lock:
+            if stream not in self.active:
+                return
+            self.active.discard(stream)
+            last = not self.active
+        if last:
+            self.stop()
+
+    def start(self):
+        '''Starts the background scan thread, once for all streams.'''
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+            print("Multi-BSSID collection started.")
+
+    def stop(self):
+        '''Stops the background scan thread, for all streams.'''
+        if self._thread is not None and self._thread.is_alive():
+            self._stop_event.set()
+            self._thread.join()
+            print("Multi-BSSID collection stopped.")
+
+    def scan(self) -> dict:
+        '''
+        Runs one scan and publishes its readings to the subscribed streams.
+
+        :return: The readings of the scan as a dict mapping BSSID to Sample.
+        '''
+        self.iface.scan()
+        results = self.iface.scan_results()
+        seq = next(self.counter)
+        t_monotonic, t_wall = time.monotonic(), time.time()
+        readings = {}
+        connected = None
+        connected_ssid = self.connected_ssid
+        for network in results:
+            bssid = normalize_bssid(network.bssid)
+            # A BSSID can show up more than once, keep the strongest entry
+            if bssid in readings and readings[bssid].value >= network.signal:
+                continue
+            readings[bssid] = Sample(seq, t_monotonic, t_wall, network.signal)
+            self.ssids[bssid] = network.ssid
+            if network.ssid == connected_ssid and (connected is None or network.signal > readings[connected].value):
+                connected = bssid
+
+        with self.lock:
+            self.latest.update(readings)
+            self.scans += 1
+            streams = list(self.streams)
+        for stream in streams:
+            bssid = connected if stream.bssid is None else stream.bssid
+            if bssid in readings:
+                stream.publish(readings[bssid])
+        return readings
+
+    def _run(self):
+        self.scheduler.interval = self.interval
+        self.scheduler.reset()
+        while self.scheduler.wait(self._stop_event):
+            try:
+                self.scan()
+            except Exception as e:
+                self.failed += 1
+                print(f"Error scanning: {e}")
+        with self.lock:
+            streams = list(self.streams)
+        for stream in streams:
+            stream.flush()
+
+    def timing_stats(self) -> dict:
+        '''
+        :return: The scheduler's statistics and the number of scans and failed scans.
+        '''
+        stats = self.scheduler.stats()
+        stats['scans'] = self.scans
+        stats['failed_scans'] = self.failed
+        return stats
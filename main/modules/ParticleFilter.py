@@ -0,0 +1,228 @@
+from .AnchorJoin import AnchorJoin
+from .Module import Sample
+from typing import Optional
+import math
+import time
+import numpy as np
+
+def systematic_resample(weights: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    '''
+    Systematic resampling: one random offset, `count` evenly spaced pointers into the
+    cumulative weights.
+
+    :param weights: Normalized particle weights.
+    :param count: Number of particles to draw, may differ from len(weights).
+    :return: Indices of the drawn particles.
+    '''
+    positions = (rng.random() + np.arange(count)) / count
+    cumulative = np.cumsum(weights)
+    cumulative[-1] = 1.0  # Guard against rounding leaving the last pointer past the end
+    return np.searchsorted(cumulative, positions)
+
+class ParticleFilter(AnchorJoin):
+    '''
+    2D position tracker fusing the RSSI of several access points (anchors) with a particle filter.
+
+    Each particle is a candidate position. Between measurements the particles
+    take a Gaussian random walk of motion_std * sqrt(dt). A measurement weighs
+    every particle by the likelihood of the RSSI of each anchor under that
+    anchor's LogdistancePathLossModel, with rssi_std dB of shadowing, so
+    beliefs with several modes (e.g. either side of a wall) are kept until the
+    measurements tell them apart. Particles are resampled systematically when
+    the effective sample size drops below resample_threshold * N.
+
+    Everything is vectorized over the particles. The particle count adapts to
+    time_budget: it shrinks when an update takes longer than the budget and
+    grows back towards max_particles when there is time to spare.
+
+    Like Trilateration, anchors are fed with connect() and joined on the Sample
+    sequence number (see AnchorJoin), and one position estimate is output per
+    scan, in sequence order. step() takes the RSSI of all anchors in anchor order
+    (NaN for a missing one) or as a mapping.
+    '''
+    def __init__(self, anchors: dict, models, bounds: Optional[tuple] = None,
+                 particles: int = 2000, min_particles: int = 200, max_particles: int = 20000,
+                 time_budget: Optional[float] = 0.005, motion_std: float = 0.5, rssi_std: Optional[float] = None,
+                 resample_threshold: float = 0.5, dt: float = 1.0, use_timestamps: bool = True,
+                 arrival_time: bool = False, seed: Optional[int] = None, max_pending: int = 4):
+        '''
+        :param anchors: Mapping of anchor name (e.g. BSSID) to its (x, y) position in meters.
+        :param models: A calibrated LogdistancePathLossModel for all anchors, or a mapping of
+                       anchor name to the model of that anchor.
+        :param bounds: Area (x_min, y_min, x_max, y_max) the particles start in, defaults to the
+                       anchors' bounding box with a margin.
+        :param particles: Initial number of particles.
+        :param min_particles: Lower limit of the adaptive particle count.
+        :param max_particles: Upper limit of the adaptive particle count.
+        :param time_budget: Target time in seconds for one update, None for a fixed particle count.
+        :param motion_std: Standard deviation of the movement in meters per sqrt(second).
+        :param rssi_std: Standard deviation of the RSSI around the model in dB, None to use the
+                         models' fitted sigma (or 4 dB if they have none).
+        :param resample_threshold: Resample when the effective sample size falls below this fraction.
+        :param dt: Time step between measurements when no timestamps are available.
+        :param use_timestamps: Derive the time step from measurement timestamps.
+        :param arrival_time: Use the time a measurement is processed as its timestamp when it has none,
+                             otherwise such measurements use the nominal dt.
+        :param seed: Seed of the random generator.
+        :param max_pending: Number of incomplete scans kept waiting for missing anchors.
+        '''
+        if not 1 <= min_particles <= particles <= max_particles:
+            raise ValueError("Need 1 <= min_particles <= particles <= max_particles.")
+        super().__init__(anchors, max_pending)
+        if self.anchors.ndim != 2 or self.anchors.shape[1] != 2:
+            raise ValueError("Anchor positions must be (x, y).")
+        if isinstance(models, dict):
+            models = {self.anchor_key(name): model for name, model in models.items()}
+            self.models = [models[name] for name in self.names]
+        else:
+            self.models = [models] * len(self.names)
+        if bounds is None:
+            low, high = self.anchors.min(axis=0), self.anchors.max(axis=0)
+            margin = 0.1 * (high - low).max() + 1.0
+            bounds = (low[0] - margin, low[1] - margin, high[0] + margin, high[1] + margin)
+        self.bounds = bounds
+        self.initial_particles = particles
+        self.min_particles = min_particles
+        self.max_particles = max_particles
+        self.time_budget = time_budget
+        self.motion_std = motion_std
+        self.rssi_std = rssi_std
+        self.resample_threshold = resample_threshold
+        self.dt = dt
+        self.use_timestamps = use_timestamps
+        self.arrival_time = arrival_time
+        self.seed = seed
+        self.reset()
+        self.start()
+
+    def reset(self):
+        '''
+        Spreads the particles uniformly over the bounds again.
+        '''
+        self.rng = np.random.default_rng(self.seed)
+        x_min, y_min, x_max, y_max = self.bounds
+        self.particles = self.rng.uniform((x_min, y_min), (x_max, y_max), size=(self.initial_particles, 2))
+        self.weights = np.full(self.initial_particles, 1.0 / self.initial_particles)
+        self.target_particles = self.initial_particles
+        self.last_timestamp = None
+        self.update_time = 0.0  # Duration of the last update in seconds
+        self.reset_join()
+
+    @property
+    def particle_count(self) -> int:
+        return len(self.particles)
+
+    @property
+    def effective_sample_size(self) -> float:
+        return 1.0 / np.dot(self.weights, self.weights)
+
+    def estimate(self) -> np.ndarray:
+        '''
+        Weighted mean position of the particles.
+        '''
+        return self.weights @ self.particles
+
+    def covariance(self) -> np.ndarray:
+        '''
+        Weighted 2x2 covariance of the particles, the uncertainty of the estimate.
+        '''
+        centered = self.particles - self.estimate()
+        return (centered * self.weights[:, None]).T @ centered
+
+    def predict(self, dt: float):
+        '''
+        Moves every particle by a random step for a time step of dt seconds.
+        '''
+        if dt > 0 and self.motion_std > 0:
+            self.particles += self.rng.normal(0.0, self.motion_std * math.sqrt(dt), size=self.particles.shape)
+
+    def _rssi_std(self, model) -> float:
+        if self.rssi_std is not None:
+            return self.rssi_std
+        sigma = model.calibrator.sigma if getattr(model, 'calibrator', None) is not None else math.nan
+        return sigma if math.isfinite(sigma) else 4.0
+
+    def update(self, rssi: np.ndarray):
+        '''
+        Weighs the particles by the likelihood of the RSSI of every anchor (NaN entries are skipped).
+        '''
+        log_weights = np.log(np.maximum(self.weights, 1e-300))
+        for i in np.flatnonzero(np.isfinite(rssi)):
+            model = self.models[i]
+            offset = self.particles - self.anchors[i]
+            distance = np.maximum(np.sqrt(np.einsum('ij,ij->i', offset, offset)), 0.1 * model.d_0)
+            error = (rssi[i] - model.expected_rssi(distance)) / self._rssi_std(model)
+            log_weights -= 0.5 * error * error
+        log_weights -= log_weights.max()
+        weights = np.exp(log_weights)
+        self.weights = weights / weights.sum()
+
+    def resample(self):
+        '''
+        Draws target_particles particles in proportion to their weights.
+        '''
+        indices = systematic_resample(self.weights, self.target_particles, self.rng)
+        self.particles = self.particles[indices]
+        self.weights = np.full(len(indices), 1.0 / len(indices))
+
+    def adapt(self, elapsed: float):
+        '''
+        Sets the particle count for the next resampling from the time the last update took.
+        '''
+        if self.time_budget is None:
+            return
+        count = self.particle_count
+        if elapsed > self.time_budget:
+            # The cost is about linear in the particle count
+            count = int(count * self.time_budget / elapsed)
+        elif elapsed < 0.5 * self.time_budget:
+            count = int(count * 1.25)
+        self.target_particles = min(max(count, self.min_particles), self.max_particles)
+
+    def step(self, value, timestamp=None):
+        '''
+        :param value: RSSI of the anchors in anchor order (NaN where missing), or a mapping of
+                      anchor name to RSSI.
+        :param timestamp: Time of the measurement in seconds, if known.
+        :return: The position estimate as a NumPy array (x, y).
+        '''
+        started = time.perf_counter()
+        rssi = self.anchor_values(value) if isinstance(value, dict) else np.asarray(value, dtype=float)
+
+        if timestamp is None and self.arrival_time:
+            timestamp = time.monotonic()
+        if self.use_timestamps and timestamp is not None:
+            if self.last_timestamp is None:
+                dt = self.dt
+                self.last_timestamp = timestamp
+            else:
+                # A measurement older than the last one does not move time backwards
+                dt = max(timestamp - self.last_timestamp, 0.0)
+                self.last_timestamp += dt
+        else:
+            dt = self.dt
+        self.predict(dt)
+        self.update(rssi)
+
+        resize = abs(self.target_particles - self.particle_count) > 0.25 * self.particle_count
+        if resize or self.effective_sample_size < self.resample_threshold * self.particle_count:
+            self.resample()
+        position = self.estimate()
+        self.update_time = time.perf_counter() - started
+        self.adapt(self.update_time)
+        return position
+
+    def process_array(self, values, timestamps=None) -> np.ndarray:
+        '''
+        Tracks through a recording of the RSSI of all anchors, shape (m, k).
+
+        :return: Position estimates, shape (m, 2).
+        '''
+        values = np.atleast_2d(np.asarray(values, dtype=float))
+        if timestamps is None:
+            return np.array([self.step(rssi) for rssi in values]).reshape(-1, 2)
+        return np.array([self.step(rssi, t) for rssi, t in zip(values, timestamps)]).reshape(-1, 2)
+
+    def emit(self, sample: Sample, rssi: np.ndarray):
+        position = self.step(rssi, sample.t_monotonic)
+        self.output.put(sample._replace(value=tuple(position.tolist())))
@@ -0,0 +1,230 @@
+import json
+import math
+import os
+import threading
+import time
+from typing import Optional
+
+class PathLossCalibrator:
+    '''
+    Recursive least squares fit of the log-distance path loss parameters.
+
+    The model RSSI = P_tx - PL_0 - 10 * n * log10(d / d_0) is linear in
+    (P_tx - PL_0, n), so every labelled (distance, rssi) sample refines both with
+    a constant amount of work, no matter how many samples came before. Samples
+    from a single distance only determine PL_0; the prior on n keeps the fit
+    well-posed until a second distance is seen.
+
+    A forgetting factor below 1 discounts old samples, so the fit follows slow
+    changes of the environment. The state is small and is kept across runs in
+    a CalibrationStore.
+    '''
+    def __init__(self, P_tx: float = 20, d_0: float = 1, PL_0: Optional[float] = None, n: Optional[float] = None,
+                 PL_0_var: float = 1e4, n_var: float = 1.0, noise_var: float = 16.0, forgetting: float = 1.0):
+        '''
+        :param P_tx: Transmitted power in dBm.
+        :param d_0: Reference distance (typically 1 meter).
+        :param PL_0: Prior path loss at d_0, None for an uninformative guess.
+        :param n: Prior path loss exponent, None for 2 (free space).
+        :param PL_0_var: Variance of the PL_0 prior in dB².
+        :param n_var: Variance of the n prior.
+        :param noise_var: Expected variance of the RSSI around the curve in dB², sets how much
+                          a single sample weighs against the prior.
+        :param forgetting: Forgetting factor in (0, 1], 1 weighs all samples equally.
+        '''
+        if not 0 < forgetting <= 1:
+            raise ValueError("forgetting must be in (0, 1].")
+        self.P_tx = P_tx
+        self.d_0 = d_0
+        self.forgetting = forgetting
+        self.lock = threading.Lock()
+        self.prior = (PL_0, n, PL_0_var / noise_var, n_var / noise_var)
+        self.reset()
+
+    def reset(self):
+        '''
+        Discards all samples and restarts from the prior.
+        '''
+        PL_0, n, PL_0_var, n_var = self.prior
+        # theta = (P_tx - PL_0, n), P is its symmetric 2x2 covariance relative to the noise variance
+        self.a = self.P_tx - (PL_0 if PL_0 is not None else 40.0)
+        self.b = n if n is not None else 2.0
+        self.p00, self.p01, self.p11 = PL_0_var, 0.0, n_var
+        self.count = 0
+        self.sse = 0.0              # Discounted sum of squared prediction errors
+        self.weight = 0.0           # Discounted sample count
+        self.log_min = math.inf     # Range of log10(d / d_0) seen, n is only observable if it is not empty
+        self.log_max = -math.inf
+
+    @property
+    def PL_0(self) -> float:
+        return self.P_tx - self.a
+
+    @property
+    def n(self) -> float:
+        return self.b
+
+    @property
+    def sigma(self) -> float:
+        '''
+        Standard deviation of the RSSI around the fitted curve in dB (the shadowing), NaN before 3 samples.
+        '''
+        if self.weight <= 2:
+            return math.nan
+        return math.sqrt(self.sse / (self.weight - 2))
+
+    @property
+    def distances_seen(self) -> bool:
+        '''
+        True once samples from at least two different distances were used, so n is fitted from data.
+        '''
+        return self.log_max > self.log_min
+
+    def update(self, distance: float, rssi: float):
+        '''
+        Adds one labelled sample.
+
+        :param distance: True distance in meters.
+        :param rssi: RSSI measured at that distance in dBm.
+        :return: The updated (PL_0, n).
+        '''
+        if distance <= 0:
+            raise ValueError("distance must be positive.")
+        # Regressor x = (1, -10 * log10(d / d_0)), prediction x . theta
+        log_d = math.log10(distance / self.d_0)
+        x1 = -10.0 * log_d
+        lam = self.forgetting
+        with self.lock:
+            p00, p01, p11 = self.p00, self.p01, self.p11
+            k0 = p00 + p01 * x1
+            k1 = p01 + p11 * x1
+            denom = lam + k0 + x1 * k1
+            error = rssi - (self.a + x1 * self.b)
+            k0 /= denom
+            k1 /= denom
+            self.a += k0 * error
+            self.b += k1 * error
+            # P = (P - k x^T P) / lambda, with x^T P = (k0, k1) * denom
+            self.p00 = (p00 - k0 * k0 * denom) / lam
+            self.p01 = (p01 - k0 * k1 * denom) / lam
+            self.p11 = (p11 - k1 * k1 * denom) / lam
+            self.sse = lam * self.sse + error * error * lam / denom
+            self.weight = lam * self.weight + 1.0
+            self.count += 1
+            if log_d < self.log_min:
+                self.log_min = log_d
+            if log_d > self.log_max:
+                self.log_max = log_d
+        return self.P_tx - self.a, self.b
+
+    def update_array(self, distances, rssi):
+        '''
+        Adds labelled samples in order, same as calling update() for each pair.
+
+        :return: The updated (PL_0, n).
+        '''
+        result = (self.PL_0, self.n)
+        for distance, value in zip(distances, rssi):
+            result = self.update(float(distance), float(value))
+        return result
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                'P_tx': self.P_tx, 'd_0': self.d_0, 'forgetting': self.forgetting,
+                'PL_0': self.P_tx - self.a, 'n': self.b, 'prior': list(self.prior),
+                'covariance': [self.p00, self.p01, self.p11],
+                'count': self.count, 'sse': self.sse, 'weight': self.weight,
+                'log_range': [self.log_min, self.log_max] if self.count else None,
+                'time': time.time(),
+            }
+
+    @classmethod
+    def from_dict(cls, state: dict) -> 'PathLossCalibrator':
+        calibrator = cls(P_tx=state['P_tx'], d_0=state['d_0'], PL_0=state['PL_0'], n=state['n'],
+                         forgetting=state.get('forgetting', 1.0))
+        if state.get('prior'):
+            calibrator.prior = tuple(state['prior'])
+        calibrator.p00, calibrator.p01, calibrator.p11 = state['covariance']
+        calibrator.count = state.get('count', 0)
+        calibrator.sse = state.get('sse', 0.0)
+        calibrator.weight = state.get('weight', 0.0)
+        if state.get('log_range'):
+            calibrator.log_min, calibrator.log_max = state['log_range']
+        return calibrator
+
+class CalibrationStore:
+    '''
+    JSON file of PathLossCalibrator fits, one profile per device MAC address,
+    access point BSSID and environment tag (e.g. 'office', 'hallway').
+
+    Every save re-reads the file and replaces only its own profile, so models
+    sharing a file do not overwrite each other's fits. The file is replaced
+    atomically, a reader never sees a partly written store.
+    '''
+    ANY = '*'  # Key part used for an unknown MAC address or BSSID
+    _lock = threading.Lock()  # Shared by all stores in the process, they may use the same file
+
+    def __init__(self, filename: str):
+        self.filename = os.path.expanduser(filename)
+
+    @classmethod
+    def key(cls, mac: Optional[str], bssid: Optional[str], environment: Optional[str]) -> str:
+        parts = (mac, bssid, environment)
+        return '|'.join(part.strip().rstrip(':').lower() if part else cls.ANY for part in parts)
+
+    def _read(self) -> dict:
+        try:
+            with open(self.filename) as file:
+                profiles = json.load(file).get('profiles', {})
+            return profiles if isinstance(profiles, dict) else {}
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def _write(self, profiles: dict):
+        os.makedirs(os.path.dirname(self.filename) or '.', exist_ok=True)
+        temporary = f'{self.filename}.{os.getpid()}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({'profiles': profiles}, file, indent=1)
+        os.replace(temporary, self.filename)
+
+    def profiles(self) -> dict:
+        '''
+        All stored fits, by key().
+        '''
+        with self._lock:
+            return self._read()
+
+    def load(self, mac: Optional[str], bssid: Optional[str], environment: Optional[str]) -> Optional[PathLossCalibrator]:
+        '''
+        :return: The stored fit for the profile, or None if there is none.
+        '''
+        state = self.profiles().get(self.key(mac, bssid, environment))
+        try:
+            return PathLossCalibrator.from_dict(state) if state else None
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def save(self, mac: Optional[str], bssid: Optional[str], environment: Optional[str], state: dict):
+        '''
+        Stores a fit for the profile, keeping all other profiles in the file.
+
+        :param state: Snapshot of the fit from PathLossCalibrator.to_dict().
+        '''
+        with self._lock:
+            profiles = self._read()
+            profiles[self.key(mac, bssid, environment)] = state
+            self._write(profiles)
+
+    def remove(self, mac: Optional[str], bssid: Optional[str], environment: Optional[str]) -> bool:
+        '''
+        Deletes the profile.
+
+        :return: False if there was no such profile.
+        '''
+        with self._lock:
+            profiles = self._read()
+            if profiles.pop(self.key(mac, bssid, environment), None) is None:
+                return False
+            self._write(profiles)
+            return True
@@ -1,74 +1,305 @@
-from .Module import Module
+from .Module import Module, Sample
+from .BoundedQueue import BoundedQueue
+import itertools
 import queue
+import threading
+import time
+import numpy as np
 
-class CapturingQueue:
+class SampleTagger:
     def __init__(self, target_queue):
         """
-        Initialize the CapturingQueue with a target queue where items will be forwarded.
-        
+        Initialize the SampleTagger with a target queue where tagged items will be forwarded.
+
+        Plain values (and the values in a batch) are wrapped in a Sample with a
+        sequence number and the current monotonic and wall-clock time. Items that
+        already are Samples are forwarded unchanged.
+
+        :param target_queue: The queue to which items are forwarded.
+        """
+        self.target_queue = target_queue
+        self.counter = itertools.count()
+
+    def tag(self, value) -> Sample:
+        if isinstance(value, Sample):
+            return value
+        return Sample(next(self.counter), time.monotonic(), time.time(), value)
+
+    def put(self, item, *args, **kwargs):
+        if item is not None:
+            if isinstance(item, (list, np.ndarray)):
+                item = [self.tag(value) for value in item]
+            else:
+                item = self.tag(item)
+        self.target_queue.put(item, *args, **kwargs)
+
+    def __getattr__(self, attr):
+        return getattr(self.target_queue, attr)
+
+class OutputTap:
+    def __init__(self, target_queue, capacity=1024):
+        """
+        Initialize the OutputTap with a target queue where items will be forwarded.
+
+        Every item is also written to a fixed-size ring buffer that any number of
+        TapReaders can follow independently. Publishing never blocks on readers:
+        a reader that falls more than `capacity` items behind skips ahead and
+        counts the items it missed.
+
         :param target_queue: The queue to which items are forwarded (e.g., the next module's input queue).
+        :param capacity: Number of items kept in the ring buffer.
         """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1.")
         self.target_queue = target_queue
-        self.capture_queue = queue.Queue()
+        self.capacity = capacity
+        self.buffer = [None] * capacity
+        self.count = 0  # Total number of items published, item i is at buffer[i % capacity]
+        self.condition = threading.Condition()
+        self.listeners = []  # Extra events set on every publish, see TapReader
 
     def put(self, item, *args, **kwargs):
         """
-        Put an item into both the target queue and the capture queue.
-        
-        :param item: The item to be put into the queues.
+        Publish an item to the ring buffer and put it into the target queue.
+
+        :param item: The item to be forwarded.
         """
-        self.capture_queue.put(item)
+        with self.condition:
+            self.buffer[self.count % self.capacity] = item
+            self.count += 1
+            self.condition.notify_all()
+        for event in self.listeners:
+            event.set()
         self.target_queue.put(item, *args, **kwargs)
 
-    def get_capture_queue(self):
+    def subscribe(self, event: threading.Event = None) -> 'TapReader':
         """
-        Retrieve the capture queue for reading captured items.
-        
-        :return: The capture queue.
+        Create a reader that receives every item published from now on.
+
+        :param event: Optional event that is set whenever an item is published, so one
+                      thread can wait for data on several taps.
+        :return: A new TapReader.
+        """
+        with self.condition:
+            if event is not None:
+                self.listeners.append(event)
+            return TapReader(self, self.count)
+
+    def add_listener(self, event: threading.Event):
+        """
+        Registers an event that is set whenever an item is published.
+        """
+        with self.condition:
+            self.listeners.append(event)
+
+    def stats(self) -> dict:
+        """
+        :return: Capacity and number of published items.
         """
-        return self.capture_queue
+        with self.condition:
+            return {'capacity': self.capacity, 'published': self.count}
 
     def __getattr__(self, attr):
         """
         Delegate attribute access to the target queue.
-        This allows the CapturingQueue to behave like a regular queue for other operations.
+        This allows the OutputTap to behave like a regular queue for other operations.
         
         :param attr: The attribute name.
         :return: The attribute from the target queue.
         """
         return getattr(self.target_queue, attr)
 
+class TapReader:
+    """
+    Cursor into an OutputTap's ring buffer with a queue-like read interface.
+    """
+    def __init__(self, tap: OutputTap, cursor: int):
+        self.tap = tap
+        self.cursor = cursor
+        self.missed = 0  # Items overwritten before this reader got to them
+
+    def _skip_overwritten(self):
+        oldest = self.tap.count - self.tap.capacity
+        if self.cursor < oldest:
+            self.missed += oldest - self.cursor
+            self.cursor = oldest
+
+    def add_listener(self, event: threading.Event):
+        """
+        Registers an event that is set whenever the tap publishes an item.
+        """
+        self.tap.add_listener(event)
+
+    def qsize(self) -> int:
+        with self.tap.condition:
+            self._skip_overwritten()
+            return self.tap.count - self.cursor
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def get(self, block=True, timeout=None):
+        """
+        Get the next item, waiting for one if block is True.
+
+        :raises queue.Empty: If no item is available.
+        """
+        with self.tap.condition:
+            if block:
+                if not self.tap.condition.wait_for(lambda: self.cursor < self.tap.count, timeout):
+                    raise queue.Empty
+            elif self.cursor >= self.tap.count:
+                raise queue.Empty
+            self._skip_overwritten()
+            item = self.tap.buffer[self.cursor % self.tap.capacity]
+            self.cursor += 1
+            return item
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def drain(self) -> list:
+        """
+        Get all pending items without blocking.
+        """
+        with self.tap.condition:
+            self._skip_overwritten()
+            items = [self.tap.buffer[i % self.tap.capacity] for i in range(self.cursor, self.tap.count)]
+            self.cursor = self.tap.count
+            return items
+
 class Pipeline:
     """
     Pipeline class that contains a list of modules and connects them together in series.
-    Additionally, captures the output between each module.
+    Optionally, captures the output of selected modules.
     """
-    def __init__(self):
+    def __init__(self, batch_size=1, max_latency=0.05, queue_size=0, overflow='block',
+                 capture=False, capture_size=1024, tag_samples=False):
+        """
+        :param batch_size: Maximum number of samples moved between stages as one list.
+                           1 moves every sample on its own.
+        :param max_latency: Maximum time in seconds a stage waits for a batch to fill up.
+        :param queue_size: Capacity of the queues between modules, 0 for unbounded.
+        :param overflow: Overflow policy of the queues between modules, see BoundedQueue.
+        :param capture: Default for add_module's capture argument.
+        :param capture_size: Number of items kept by each capture ring buffer.
+        :param tag_samples: Wrap the first module's outputs in Sample records carrying a sequence
+                            number and timestamps, which every later stage passes along. This lets
+                            consumers such as CSVLogger join the outputs of different stages.
+        """
         self.modules = []
-        self.capturing_queues = []  # List to store capture queues
+        self.capture_flags = []  # Whether each module's output is captured
+        self.taps = []  # OutputTaps of the captured modules
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.capture = capture
+        self.capture_size = capture_size
+        self.tag_samples = tag_samples
 
-    def add_module(self, module: Module):
+    def add_module(self, module: Module, capture: bool = None):
         """
-        Add a module to the pipeline and set up capturing of its output.
+        Add a module to the pipeline and connect the previous module's output to it.
         
         :param module: The module to add to the pipeline.
+        :param capture: Capture this module's output so it is returned by get_outputs().
+                        Defaults to the pipeline's capture setting. Uncaptured stages are
+                        connected directly, without any extra work per item.
         """
+        module.configure_batching(self.batch_size, self.max_latency)
+        module.configure_queues(self.queue_size, self.overflow)
         if self.modules:
             previous_module = self.modules[-1]
-            # Replace the previous module's output with a CapturingQueue
-            capturing_queue = CapturingQueue(target_queue=module.input)
-            previous_module.output = capturing_queue
-            # Store the capture queue for later retrieval
-            self.capturing_queues.append(capturing_queue.get_capture_queue())
+            if self.capture_flags[-1]:
+                # Replace the previous module's output with an OutputTap
+                tap = OutputTap(target_queue=module.input, capacity=self.capture_size)
+                previous_module.output = tap
+                self.taps.append(tap)
+            else:
+                previous_module.output = module.input
+            if self.tag_samples and len(self.modules) == 1:
+                # Tag the source's output before it is captured or forwarded
+                previous_module.output = SampleTagger(previous_module.output)
         self.modules.append(module)
+        self.capture_flags.append(self.capture if capture is None else capture)
 
-    def get_outputs(self) -> list:
+    def get_outputs(self, event: threading.Event = None) -> list:
         """
-        Get the list of capture queues between modules.
-        
-        :return: A list of queues capturing the outputs between modules.
+        Get readers for the captured outputs followed by the last module's output queue.
+        Every call subscribes new readers, so several consumers can each get all items.
+
+        :param event: Optional event set whenever a captured output receives an item.
+        :return: A list of TapReaders for the captured modules and the last module's output queue.
         """
         if not self.modules:
             raise ValueError("Pipeline has no modules.")
         
-        return self.capturing_queues + [self.modules[-1].output]
\ No newline at end of file
+        return [tap.subscribe(event) for tap in self.taps] + [self.modules[-1].output]
+
+    def stats(self) -> dict:
+        """
+        Get depth and drop counters for every queue in the pipeline.
+
+        :return: A dict mapping queue names to BoundedQueue.stats() or OutputTap.stats() dicts.
+        """
+        stats = {}
+        seen = set()
+        # Inputs first, so a queue between two modules is named after the module reading it
+        for kind in ('input', 'output'):
+            for index, module in enumerate(self.modules):
+                name = f"{index}:{type(module).__name__}"
+                q = getattr(module, kind)
+                if isinstance(q, SampleTagger):
+                    q = q.target_queue
+                if isinstance(q, OutputTap):
+                    stats[f"{name}.capture"] = q.stats()
+                    q = q.target_queue
+                if isinstance(q, BoundedQueue) and id(q) not in seen:
+                    seen.add(id(q))
+                    stats[f"{name}.{kind}"] = q.stats()
+        return stats
+
+    def replay(self, values, timestamps=None, reset=True) -> list:
+        """
+        Runs recorded values synchronously through the module chain with process_array,
+        bypassing the threads and queues. The first module receives the values, so for a
+        pipeline starting with an RSSICollector the values are the recorded RSSI.
+
+        Modules only withhold a leading warm-up (filling a window, calibration), so the
+        outputs of each stage line up with the last len(output) timestamps.
+
+        :param values: Array-like of input values.
+        :param timestamps: Optional array-like of timestamps in seconds, one per value.
+        :param reset: Reset every module before replaying.
+        :return: A list with one NumPy array of outputs per module.
+        """
+        if not self.modules:
+            raise ValueError("Pipeline has no modules.")
+
+        data = np.asarray(values, dtype=float).reshape(-1)
+        times = None if timestamps is None else np.asarray(timestamps, dtype=float).reshape(-1)
+        outputs = []
+        for module in self.modules:
+            if reset:
+                module.reset()
+            data = module.process_array(data, times)
+            if times is not None:
+                times = times[len(times) - len(data):]
+            outputs.append(data)
+        return outputs
+
+    def replay_csv(self, filename, column=1, reset=True) -> tuple:
+        """
+        Replays one column of a recorded CSV file (e.g. the raw RSSI column of a CSVLogger
+        file) through the pipeline. The first column is used as timestamps.
+
+        :param filename: Path to the CSV file.
+        :param column: Index of the column to replay.
+        :param reset: Reset every module before replaying.
+        :return: (timestamps, outputs) where outputs is the list returned by replay().
+        """
+        recorded = np.genfromtxt(filename, delimiter=',', usecols=(0, column), ndmin=2)
+        recorded = recorded[~np.isnan(recorded).any(axis=1)]
+        timestamps, values = recorded[:, 0], recorded[:, 1]
+        return timestamps, self.replay(values, timestamps, reset=reset)
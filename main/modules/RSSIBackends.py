@@ -0,0 +1,128 @@
+from typing import Optional
+import os
+import re
+import shutil
+import subprocess
+
+'''
+Ways for RSSICollector to read the signal level of the connected access point.
+
+ProcWirelessBackend and IwLinkBackend ask the driver for the signal of the
+current link (the value the driver updates from every received frame), so a
+reading takes microseconds to milliseconds instead of the seconds an active
+scan takes. ScanBackend is the portable pywifi scan path, used when neither
+of the Linux interfaces is available.
+'''
+
+class ProcWirelessBackend:
+    '''
+    Reads the link signal level from /proc/net/wireless (Linux wireless extensions).
+    '''
+    name = 'proc'
+    PATH = '/proc/net/wireless'
+
+    def __init__(self, interface: str):
+        self.interface = interface
+        self.file = open(self.PATH, 'rb')
+
+    @classmethod
+    def available(cls, interface: str) -> bool:
+        try:
+            with open(cls.PATH, 'rb') as file:
+                return cls._parse(file.read(), interface) is not None
+        except OSError:
+            return False
+
+    @staticmethod
+    def _parse(content: bytes, interface: str) -> Optional[int]:
+        # Lines look like: " wlan0: 0000   54.  -56.  -256        0      0      0      0      0        0"
+        prefix = interface.encode() + b':'
+        for line in content.splitlines()[2:]:
+            line = line.strip()
+            if line.startswith(prefix):
+                fields = line[len(prefix):].split()
+                level = int(float(fields[2].rstrip(b'.')))
+                # Some drivers report dBm as an unsigned byte
+                return level - 256 if level > 0 else level
+        return None
+
+    def read(self) -> Optional[int]:
+        # seek(0) makes the kernel regenerate the file without reopening it
+        self.file.seek(0)
+        return self._parse(self.file.read(), self.interface)
+
+    def close(self):
+        self.file.close()
+
+class IwLinkBackend:
+    '''
+    Reads the station signal of the current link through nl80211 with `iw dev <interface> link`.
+    '''
+    name = 'iw'
+    SIGNAL = re.compile(rb'signal:\s*(-?\d+)\s*dBm')
+
+    def __init__(self, interface: str):
+        self.interface = interface
+        self.command = [shutil.which('iw') or 'iw', 'dev', interface, 'link']
+
+    @classmethod
+    def available(cls, interface: str) -> bool:
+        if shutil.which('iw') is None:
+            return False
+        try:
+            return cls(interface).read() is not None
+        except (OSError, subprocess.SubprocessError):
+            return False
+
+    def read(self) -> Optional[int]:
+        result = subprocess.run(self.command, capture_output=True, timeout=1.0)
+        match = self.SIGNAL.search(result.stdout)
+        return int(match.group(1)) if match else None
+
+    def close(self):
+        pass
+
+class ScanBackend:
+    '''
+    Triggers a scan with pywifi and reads the signal of the connected SSID from the results.
+    The interface and SSID are taken from a DeviceDiscovery when the first reading is taken.
+    '''
+    name = 'scan'
+
+    def __init__(self, discovery):
+        self.discovery = discovery
+
+    def read(self) -> Optional[int]:
+        iface = self.discovery.wifi_interface()
+        ssid = self.discovery.connected_ssid
+        iface.scan()
+        for network in iface.scan_results():
+            if network.ssid == ssid:
+                return network.signal
+        return None
+
+    def close(self):
+        pass
+
+# Link backends tried in order by backend='auto'
+LINK_BACKENDS = {
+    ProcWirelessBackend.name: ProcWirelessBackend,
+    IwLinkBackend.name: IwLinkBackend,
+}
+BACKENDS = tuple(LINK_BACKENDS) + (ScanBackend.name, 'auto')
+
+def create_link_backend(interface: Optional[str], backend: str = 'auto'):
+    '''
+    Creates a backend that reads the connected link's signal without scanning.
+
+    :param interface: Name of the wireless interface, e.g. 'wlan0'.
+    :param backend: 'proc', 'iw' or 'auto' to use the first one that works.
+    :return: The backend, or None if none is available (e.g. not on Linux).
+    '''
+    if not interface or os.name != 'posix':
+        return None
+    names = tuple(LINK_BACKENDS) if backend == 'auto' else (backend,)
+    for name in names:
+        if LINK_BACKENDS[name].available(interface):
+            return LINK_BACKENDS[name](interface)
+    return None
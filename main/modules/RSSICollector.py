@@ -1,72 +1,56 @@
-from pywifi import PyWiFi, const
 from typing import Optional
+import itertools
 import threading
 import time
-import socket
-import psutil
-from .Module import Module
-from config import COLLECTOR_INTERVAL
-
-def find_internet_connected_interface():
-    """Finds the network interface used for the internet connection."""
-    try:
-        # Use a temporary socket to detect the IP used for internet connection
-        test_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        test_socket.settimeout(2)
-        test_socket.connect(("8.8.8.8", 80))
-        ip = test_socket.getsockname()[0]
-        test_socket.close()
-
-        # Match the IP address to a network interface
-        for interface, addrs in psutil.net_if_addrs().items():
-            for addr in addrs:
-                if addr.address == ip:
-                    return interface  # Return the interface name
-    except Exception as e:
-        print(f"Error detecting interface: {e}")
-        return None
-
-def get_mac_address():
-    """Retrieves the MAC address of the current internet-connected interface."""
-    interface_name = find_internet_connected_interface()
-    if not interface_name:
-        print("No active internet connection or interface could be detected.")
-        return None
-
-    # Retrieve MAC address of the detected interface
-    for addr in psutil.net_if_addrs().get(interface_name, []):
-        if addr.family == psutil.AF_LINK:  # Checks for MAC address type
-            return addr.address
-
-    print("MAC address not found for the internet-connected interface.")
-    return None
+from .Module import Module, Sample
+from .Discovery import DeviceDiscovery, shared_discovery
+# Kept importable from here for existing callers
+from .Discovery import find_internet_connected_interface, get_mac_address, get_connected_ssid
+from .Scheduler import DeadlineScheduler
+from .RSSIBackends import BACKENDS, ScanBackend, create_link_backend
+from config import COLLECTOR_INTERVAL, COLLECTOR_BACKEND
 
 class RSSICollector(Module):
     '''
     Class to collect RSSI values from the WiFi interface.
+
+    By default the signal of the connected link is read directly from the driver
+    (see RSSIBackends), which is fast enough for the configured interval. If that
+    is not possible the collector falls back to scanning, which takes seconds per
+    reading on most drivers.
     '''
-    def __init__(self, interval: float = COLLECTOR_INTERVAL):
-        self.device_id = get_mac_address()
-        print(f"Device ID (MAC Address): {self.device_id}")
-
-        self.wifi = PyWiFi()
-        self.iface = self.wifi.interfaces()[0]
-        
-
-        if self.iface.status() == const.IFACE_CONNECTED:
-            print("Wi-Fi interface is connected.")
-            self.connected_ssid = self._get_connected_ssid()
-            if self.connected_ssid:
-                print(f"Connected SSID: {self.connected_ssid}")
-            else:
-                print("Could not retrieve the connected SSID.")
-        else:
-            print("Wi-Fi interface is not connected or ready.")
-            self.connected_ssid = None
+    def __init__(self, interval: float = COLLECTOR_INTERVAL, backend: str = COLLECTOR_BACKEND,
+                 timestamped: bool = True, discovery: DeviceDiscovery = None):
+        '''
+        :param interval: Time in seconds between readings, 0 to read as fast as the backend allows.
+        :param backend: 'proc' (/proc/net/wireless), 'iw' (nl80211 via iw), 'scan' (pywifi scans)
+                        or 'auto' for the first link backend that works, falling back to scanning.
+        :param timestamped: Output Sample records with the acquisition times instead of plain values.
+        :param discovery: DeviceDiscovery to get the interface and SSID from, defaults to the one
+                          shared by all collectors.
+        '''
+        super().__init__()
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}.")
+        self.discovery = discovery if discovery is not None else shared_discovery()
+
+        # Only the interface name is needed here, the SSID and MAC address are looked up when used
+        self.backend = None
+        if backend != ScanBackend.name:
+            self.backend = create_link_backend(self.discovery.interface, backend)
+            if self.backend is None:
+                print(f"RSSI backend '{backend}' is not available, falling back to scanning.")
+        if self.backend is None:
+            self.backend = ScanBackend(self.discovery)
+        print(f"RSSI backend: {self.backend.name}")
 
         self._stop_event = threading.Event()
         self._thread = None
         self.interval = interval
+        self.timestamped = timestamped
+        self.scheduler = DeadlineScheduler(interval)
+        self.counter = itertools.count()  # Sequence numbers of the output Samples
+        self.failed = 0  # Readings that returned no value
 
     def start(self):
         '''Starts the background collection thread.'''
@@ -86,43 +70,85 @@ class RSSICollector(Module):
     def _run(self):
         '''
         The method that runs in the background thread to collect RSSI periodically.
+
+        Readings are taken on the deadlines of a DeadlineScheduler and output as
+        Sample(seq, t_monotonic, t_wall, rssi) records (plain values with
+        timestamped=False), where the times are those at which the reading was
+        taken. In batch mode the records are collected into lists that are output
+        once they hold batch_size readings or max_latency has passed since their
+        first reading. Failed readings are left out.
         '''
-        while not self._stop_event.is_set():
+        self.scheduler.interval = self.interval
+        self.scheduler.reset()
+        batch = []
+        deadline = None
+        while self.scheduler.wait(self._stop_event):
             rssi = self.collect_rssi()
-            self.output.put(rssi)
-            time.sleep(self.interval)
+            if rssi is None:
+                self.failed += 1
+                continue
+            if self.timestamped:
+                rssi = Sample(next(self.counter), time.monotonic(), time.time(), rssi)
+
+            if self.batch_size <= 1:
+                self.output.put(rssi)
+                continue
+            if not batch:
+                deadline = time.monotonic() + self.max_latency
+            batch.append(rssi)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self.output.put(batch)
+                batch = []
+        if batch:
+            self.output.put(batch)
+
+    def timing_stats(self) -> dict:
+        '''
+        :return: The scheduler's statistics (rate, missed deadlines, jitter) and the number of failed readings.
+        '''
+        stats = self.scheduler.stats()
+        stats['failed_readings'] = self.failed
+        return stats
+
+    def step(self, value, timestamp=None):
+        '''
+        A replayed reading is exactly what the collector would have output.
+        '''
+        return value
+
+    @property
+    def device_id(self) -> Optional[str]:
+        '''MAC address of this device.'''
+        return self.discovery.mac_address
+
+    @property
+    def connected_ssid(self) -> Optional[str]:
+        '''SSID of the connected network.'''
+        return self.discovery.connected_ssid
+
+    @property
+    def iface(self):
+        '''The pywifi interface.'''
+        return self.discovery.wifi_interface()
 
     def _get_connected_ssid(self) -> Optional[str]:
         '''
         Gets the SSID of the currently connected Wi-Fi network.
         :return: SSID if connected, else None.
         '''
-        try:
-            self.iface.scan()
-            scan_results = self.iface.scan_results()
-            for network in scan_results:
-                if self.iface.status() == const.IFACE_CONNECTED and network.ssid:
-                    return network.ssid
-        except Exception as e:
-            print(f"Error retrieving connected SSID: {e}")
-        return None
+        return self.discovery.connected_ssid
 
     def collect_rssi(self) -> Optional[int]:
         '''
         Collects the RSSI value from the WiFi interface for the connected SSID.
         :return: The RSSI value if successful, otherwise None.
         '''
-        if not self.connected_ssid:
+        if isinstance(self.backend, ScanBackend) and not self.connected_ssid:
             print("Not connected to any Wi-Fi network.")
             return None
 
         try:
-            self.iface.scan()
-            scan_results = self.iface.scan_results()
-            for network in scan_results:
-                if network.ssid == self.connected_ssid:
-                    rssi = network.signal
-                    return rssi
+            return self.backend.read()
         except Exception as e:
             print(f"Error collecting RSSI: {e}")
         return None
\ No newline at end of file
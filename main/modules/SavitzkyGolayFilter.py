@@ -1,15 +1,43 @@
 from .Module import Module
 import threading
-from scipy.signal import savgol_filter
+import numpy as np
+
+def savgol_last_point_coeffs(window_size, polyorder):
+    '''
+    Computes the convolution coefficients that evaluate a least-squares polynomial
+    fit of order `polyorder` at the last point of a window of `window_size` samples.
+
+    This is the closed form of savgol_filter(window, window_size, polyorder)[-1]:
+    the fitted value at t=0 is the constant term of the fit, i.e. the first row of
+    the pseudo-inverse of the Vandermonde matrix over t = -(window_size-1) .. 0.
+    '''
+    if polyorder >= window_size:
+        raise ValueError("polyorder must be less than window_size.")
+    # Scale positions to [-1, 0] to keep the Vandermonde matrix well conditioned,
+    # the value at t=0 does not depend on the scaling.
+    t = np.arange(-(window_size - 1), 1, dtype=float) / max(window_size - 1, 1)
+    vandermonde = t[:, np.newaxis] ** np.arange(polyorder + 1)
+    return np.linalg.pinv(vandermonde)[0]
 
 class SavitzkyGolayFilter(Module):
     '''
     Savitzky-Golay Filter with configurable window size and polynomial order
+
+    backend: 'streaming' precomputes the last-point coefficients once and outputs
+             a dot product over a preallocated ring buffer, 'scipy' runs
+             scipy.signal.savgol_filter over the whole window for every sample.
     '''
-    def __init__(self, window_size=99, polyorder=3):
+    BACKENDS = ('streaming', 'scipy')
+
+    def __init__(self, window_size=99, polyorder=3, backend='streaming'):
         super().__init__()
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {self.BACKENDS}.")
         self.window_size = window_size  # Set the window size
         self.polyorder = polyorder      # Set the polynomial order
+        self.backend = backend
+        self.coeffs = savgol_last_point_coeffs(window_size, polyorder)
+        self.reset()
         self.start()
 
     def start(self):
@@ -20,18 +48,64 @@ class SavitzkyGolayFilter(Module):
         self.input.put(None)
         self.process_thread.join()
 
-    def process(self):
-        window = []
-        while True:
-            data = self.input.get()
-            if data is None:
-                break
-            window.append(data)
-            if len(window) > self.window_size:
-                window.pop(0)
-            
-            # Only apply the filter when the window is full
-            if len(window) == self.window_size:
-                # Apply the Savitzky-Golay filter
-                smoothed_value = savgol_filter(window, window_length=self.window_size, polyorder=self.polyorder)[-1]
-                self.output.put(smoothed_value)
+    def reset(self):
+        # Every sample is written twice, at i and i + window_size, so the current
+        # window is always the contiguous slice buffer[i:i + window_size].
+        self.buffer = np.zeros(2 * self.window_size)
+        self.index = 0
+        self.count = 0
+        self.window = []
+
+    def step(self, value, timestamp=None):
+        if self.backend == 'scipy':
+            return self._step_scipy(value)
+
+        w = self.window_size
+        self.buffer[self.index] = self.buffer[self.index + w] = value
+        self.index = (self.index + 1) % w
+        self.count += 1
+
+        # Only apply the filter when the window is full
+        if self.count >= w:
+            return float(np.dot(self.coeffs, self.buffer[self.index:self.index + w]))
+        return None
+
+    def _step_scipy(self, value):
+        from scipy.signal import savgol_filter
+
+        self.window.append(value)
+        if len(self.window) > self.window_size:
+            self.window.pop(0)
+
+        # Only apply the filter when the window is full
+        if len(self.window) == self.window_size:
+            # Apply the Savitzky-Golay filter
+            return savgol_filter(self.window, window_length=self.window_size, polyorder=self.polyorder)[-1]
+        return None
+
+    def process_array(self, values, timestamps=None) -> np.ndarray:
+        if self.backend == 'scipy':
+            return super().process_array(values, timestamps)
+
+        values = np.asarray(values, dtype=float).reshape(-1)
+        if len(values) == 0:
+            return values
+        w = self.window_size
+
+        # Prepend the last window_size - 1 samples already seen and correlate in one pass
+        held = min(self.count, w - 1)
+        history = self.buffer[self.index + w - held:self.index + w]
+        samples = np.concatenate([history, values])
+        if len(samples) >= w:
+            outputs = np.lib.stride_tricks.sliding_window_view(samples, w) @ self.coeffs
+        else:
+            outputs = np.empty(0)
+
+        # Carry the last window_size samples over to the ring buffer
+        tail = samples[-w:]
+        self.buffer[:] = 0.0
+        self.buffer[w - len(tail):w] = tail
+        self.buffer[2 * w - len(tail):] = tail
+        self.index = 0
+        self.count += len(values)
+        return outputs
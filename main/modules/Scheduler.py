@@ -0,0 +1,89 @@
+import math
+import threading
+import time
+
+class DeadlineScheduler:
+    '''
+    Fixed-rate scheduler on the monotonic clock.
+
+    Deadlines are start + k * interval, so the time spent taking a reading does
+    not add to the period and the rate does not drift. A reading that overruns
+    one or more deadlines skips them (they are counted as missed) instead of
+    firing a burst of late readings to catch up.
+
+    Jitter is the lateness of each wakeup relative to its deadline. An interval
+    of 0 disables waiting, so readings are taken as fast as the source allows.
+    '''
+    def __init__(self, interval: float):
+        '''
+        :param interval: Time in seconds between deadlines, 0 for as fast as possible.
+        '''
+        if interval < 0:
+            raise ValueError("interval must not be negative.")
+        self.interval = interval
+        self.reset()
+
+    def reset(self):
+        '''
+        Restarts the schedule at the next call to wait() and clears the statistics.
+        '''
+        self.deadline = None
+        self.started = None
+        self.ticks = 0              # Deadlines served
+        self.missed = 0             # Deadlines skipped because a reading overran them
+        self.jitter_mean = 0.0      # Running mean of the wakeup lateness, in seconds
+        self._jitter_m2 = 0.0       # Running sum of squared deviations (Welford)
+        self.jitter_max = 0.0
+
+    def wait(self, stop_event: threading.Event = None) -> bool:
+        '''
+        Waits for the next deadline.
+
+        :param stop_event: Optional event that interrupts the wait.
+        :return: False if stop_event was set, True otherwise.
+        '''
+        now = time.monotonic()
+        if self.deadline is None:
+            self.started = self.deadline = now
+        elif self.interval > 0:
+            self.deadline += self.interval
+            if now > self.deadline + self.interval:
+                # Skip the deadlines that already passed, keeping the original phase
+                skipped = math.floor((now - self.deadline) / self.interval)
+                self.missed += skipped
+                self.deadline += skipped * self.interval
+        else:
+            self.deadline = now
+
+        delay = self.deadline - now
+        if delay > 0:
+            if stop_event is not None:
+                if stop_event.wait(delay):
+                    return False
+            else:
+                time.sleep(delay)
+        elif stop_event is not None and stop_event.is_set():
+            return False
+
+        lateness = time.monotonic() - self.deadline
+        self.ticks += 1
+        delta = lateness - self.jitter_mean
+        self.jitter_mean += delta / self.ticks
+        self._jitter_m2 += delta * (lateness - self.jitter_mean)
+        self.jitter_max = max(self.jitter_max, lateness)
+        return True
+
+    def stats(self) -> dict:
+        '''
+        :return: Number of ticks, missed deadlines, achieved rate and jitter statistics in seconds.
+        '''
+        elapsed = time.monotonic() - self.started if self.started is not None else 0.0
+        return {
+            'interval': self.interval,
+            'ticks': self.ticks,
+            'missed_deadlines': self.missed,
+            'rate': self.ticks / elapsed if elapsed > 0 else 0.0,
+            'jitter_mean': self.jitter_mean,
+            'jitter_std': math.sqrt(self._jitter_m2 / self.ticks) if self.ticks else 0.0,
+            'jitter_max': self.jitter_max,
+        }
@@ -0,0 +1,313 @@
+from typing import Optional
+import threading
+import time
+import numpy as np
+from scipy.signal import lfilter
+from .Module import Module, Sample
+from .Scheduler import DeadlineScheduler
+
+'''
+Synthetic RSSI sources with the same output contract as RSSICollector: start()
+and stop() run a background thread that puts Sample(seq, t_monotonic, t_wall,
+rssi) records (or plain values with timestamped=False) on the output queue, as
+lists of up to batch_size records in batch mode. They need no Wi-Fi hardware,
+so pipelines can be load tested and benchmarked anywhere.
+
+Samples are generated in blocks with NumPy, so rates up to 100 kHz are
+possible. The timestamps are those of the source's own timeline (the simulated
+time, or the recorded time of a replayed file), whatever speed the samples are
+emitted at, so time-aware filters behave as they would on the original data.
+'''
+
+class SyntheticSource(Module):
+    '''
+    Base class for the synthetic sources: paces the blocks returned by
+    next_block() on the monotonic clock and outputs them.
+
+    speed: 1.0 emits samples in real time, 10.0 ten times faster, None as fast
+           as the pipeline accepts them.
+    tick: Time in seconds between emitted blocks when pacing.
+    max_block: Maximum number of samples emitted per block.
+    '''
+    def __init__(self, speed: Optional[float] = 1.0, tick: float = 0.01, max_block: int = 4096,
+                 timestamped: bool = True):
+        super().__init__()
+        if speed is not None and speed <= 0:
+            raise ValueError("speed must be positive or None.")
+        self.speed = speed
+        self.tick = tick
+        self.max_block = max_block
+        self.timestamped = timestamped
+        self.scheduler = DeadlineScheduler(tick)
+        self.next_seq = 0  # Sequence number of the next output Sample
+        self.emitted = 0
+        self.dropped = 0  # Samples the source withheld (simulated dropouts)
+        self.finished = threading.Event()  # Set when a finite source has emitted everything
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def next_block(self, until: float, max_samples: int):
+        '''
+        Returns the next samples of the source's timeline whose offset from the
+        start is at most `until` seconds.
+
+        :return: (offsets, values) arrays, or None when the source is exhausted.
+        '''
+        raise NotImplementedError
+
+    def wall_times(self, offsets: np.ndarray, start_wall: float) -> np.ndarray:
+        '''
+        Wall-clock times of the samples at the given offsets.
+        '''
+        return start_wall + offsets
+
+    def start(self):
+        '''Starts the background generation thread.'''
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self.finished.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        '''Stops the background generation thread.'''
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+
+    def _run(self):
+        self.scheduler.interval = 0 if self.speed is None else self.tick
+        self.scheduler.reset()
+        start_monotonic, start_wall = time.monotonic(), time.time()
+        while self.scheduler.wait(self._stop_event):
+            if self.speed is None:
+                until = np.inf
+            else:
+                until = (time.monotonic() - start_monotonic) * self.speed
+            block = self.next_block(until, self.max_block)
+            if block is None:
+                self.finished.set()
+                break
+            offsets, values = block
+            if len(values):
+                self.publish(offsets, values, start_monotonic, start_wall)
+
+    def publish(self, offsets, values, start_monotonic, start_wall):
+        '''
+        Puts one block of samples on the output queue.
+        '''
+        if self.timestamped:
+            first = self.next_seq
+            self.next_seq += len(values)
+            items = list(map(Sample, range(first, self.next_seq), (start_monotonic + offsets).tolist(),
+                             self.wall_times(offsets, start_wall).tolist(), values.tolist()))
+        else:
+            items = values.tolist()
+        self.emitted += len(items)
+
+        if self.batch_size <= 1:
+            for item in items:
+                self.output.put(item)
+        else:
+            for i in range(0, len(items), self.batch_size):
+                self.output.put(items[i:i + self.batch_size])
+
+    def timing_stats(self) -> dict:
+        '''
+        :return: The scheduler's statistics and the number of emitted and dropped samples.
+        '''
+        stats = self.scheduler.stats()
+        stats['emitted'] = self.emitted
+        stats['dropped'] = self.dropped
+        return stats
+
+    def step(self, value, timestamp=None):
+        '''
+        A replayed reading is exactly what the source would have output.
+        '''
+        return value
+
+class SimulatedRSSISource(SyntheticSource):
+    '''
+    Generates RSSI at a fixed rate from the log-distance path loss equation used by
+    LogdistancePathLossModel,
+
+        rssi = P_tx - PL_0 - 10 * n * log10(d / d_0) + shadowing + fading + outliers
+
+    where d follows a trajectory over time and:
+        shadowing: slow log-normal fading, a Gauss-Markov process with standard
+                   deviation shadowing_std dB and correlation time shadowing_tau s.
+        fading:    fast multipath fading drawn independently for every sample,
+                   Rician with factor fading_k (0 is Rayleigh, None disables it).
+        outliers:  with probability outlier_prob a sample is offset by N(0, outlier_std) dB.
+        dropouts:  with probability dropout_prob a sample is not emitted at all, like
+                   a failed reading of RSSICollector.
+    '''
+    def __init__(self, rate: float = 10.0, trajectory=1.0, P_tx=20, PL_0=70, n=2.5, d_0=1,
+                 shadowing_std=2.0, shadowing_tau=5.0, fading_k=None, outlier_prob=0.0, outlier_std=15.0,
+                 dropout_prob=0.0, quantize=True, duration: Optional[float] = None, seed=None,
+                 speed: Optional[float] = 1.0, timestamped: bool = True):
+        '''
+        :param rate: Samples per second on the simulated timeline (1 Hz to 100 kHz).
+        :param trajectory: Distance in meters, as a constant, a function of an array of
+                           times in seconds, or a list of (time, distance) waypoints that
+                           are linearly interpolated (see linear_trajectory, oscillating_trajectory).
+        :param P_tx: Transmit power in dBm.
+        :param PL_0: Path loss at the reference distance d_0 in dB.
+        :param n: Path loss exponent.
+        :param d_0: Reference distance in meters.
+        :param quantize: Round to whole dBm, as Wi-Fi drivers report.
+        :param duration: Simulated seconds after which the source finishes, None for no end.
+        :param seed: Seed of the random generator, for reproducible runs.
+        :param speed: Emission speed, see SyntheticSource.
+        '''
+        if rate <= 0:
+            raise ValueError("rate must be positive.")
+        super().__init__(speed=speed, tick=max(1.0 / rate, 0.001), timestamped=timestamped)
+        self.rate = rate
+        self.trajectory = trajectory
+        self.P_tx = P_tx
+        self.PL_0 = PL_0
+        self.n = n
+        self.d_0 = d_0
+        self.shadowing_std = shadowing_std
+        self.shadowing_tau = shadowing_tau
+        self.fading_k = fading_k
+        self.outlier_prob = outlier_prob
+        self.outlier_std = outlier_std
+        self.dropout_prob = dropout_prob
+        self.quantize = quantize
+        self.duration = duration
+        self.seed = seed
+        self.reset()
+
+    @staticmethod
+    def linear_trajectory(d_start, d_end, duration):
+        '''Moves from d_start to d_end meters in duration seconds, then stays.'''
+        return [(0.0, d_start), (duration, d_end)]
+
+    @staticmethod
+    def oscillating_trajectory(d_min, d_max, period):
+        '''Walks back and forth between d_min and d_max meters, one round trip per period seconds.'''
+        def distance(t):
+            phase = np.abs(((np.asarray(t) / period) % 1.0) * 2 - 1)  # 1 -> 0 -> 1
+            return d_max - (d_max - d_min) * (1 - phase)
+        return distance
+
+    def reset(self):
+        self.rng = np.random.default_rng(self.seed)
+        self.index = 0  # Next sample index on the simulated timeline
+        self.shadowing = self.rng.normal(0.0, self.shadowing_std) if self.shadowing_std else 0.0
+
+    def distance(self, t: np.ndarray) -> np.ndarray:
+        '''
+        Distance in meters at the given times, following the trajectory.
+        '''
+        if callable(self.trajectory):
+            d = self.trajectory(t)
+        elif np.ndim(self.trajectory) == 0:
+            d = np.full(len(t), float(self.trajectory))
+        else:
+            waypoints = np.asarray(self.trajectory, dtype=float)
+            d = np.interp(t, waypoints[:, 0], waypoints[:, 1])
+        return np.maximum(np.asarray(d, dtype=float), 1e-3)
+
+    def _shadowing(self, count: int) -> np.ndarray:
+        # Gauss-Markov process x[k] = rho * x[k-1] + sqrt(1 - rho^2) * sigma * e[k]
+        if not self.shadowing_std:
+            return np.zeros(count)
+
+        rho = np.exp(-1.0 / (self.rate * self.shadowing_tau)) if self.shadowing_tau > 0 else 0.0
+        noise = self.rng.standard_normal(count) * (np.sqrt(1 - rho ** 2) * self.shadowing_std)
+        values, _ = lfilter([1.0], [1.0, -rho], noise, zi=[rho * self.shadowing])
+        self.shadowing = values[-1]
+        return values
+
+    def _fading(self, count: int) -> np.ndarray:
+        # Power gain of a unit-power Rician channel with factor K, in dB
+        if self.fading_k is None:
+            return np.zeros(count)
+        k = self.fading_k
+        los = np.sqrt(k / (k + 1))
+        scatter = np.sqrt(1 / (2 * (k + 1)))
+        h = los + scatter * (self.rng.standard_normal(count) + 1j * self.rng.standard_normal(count))
+        return 10 * np.log10(np.maximum(np.abs(h) ** 2, 1e-12))
+
+    def generate(self, count: int):
+        '''
+        Generates the next `count` samples of the simulated timeline, without threads.
+
+        :return: (times, rssi, valid) where times are seconds from the start of the
+                 simulation and valid is False for the samples lost to dropouts.
+        '''
+        t = (self.index + np.arange(count)) / self.rate
+        self.index += count
+        rssi = self.P_tx - self.PL_0 - 10 * self.n * np.log10(self.distance(t) / self.d_0)
+        rssi += self._shadowing(count) + self._fading(count)
+        if self.outlier_prob:
+            outliers = self.rng.random(count) < self.outlier_prob
+            rssi[outliers] += self.rng.normal(0.0, self.outlier_std, outliers.sum())
+        if self.quantize:
+            rssi = np.round(rssi)
+        valid = self.rng.random(count) >= self.dropout_prob if self.dropout_prob else np.ones(count, dtype=bool)
+        return t, rssi, valid
+
+    def next_block(self, until, max_samples):
+        end = self.index + max_samples
+        if np.isfinite(until):
+            end = min(end, int(np.floor(until * self.rate)) + 1)
+        if self.duration is not None:
+            last = int(np.ceil(self.duration * self.rate))
+            if self.index >= last:
+                return None
+            end = min(end, last)
+        if end <= self.index:
+            return np.empty(0), np.empty(0)
+        t, rssi, valid = self.generate(end - self.index)
+        self.dropped += int(len(valid) - valid.sum())
+        return t[valid], rssi[valid]
+
+class CSVReplaySource(SyntheticSource):
+    '''
+    Replays one column of a recorded CSV file (e.g. the raw RSSI column written by
+    CSVLogger) as a live source, at the original pace, accelerated, or as fast as
+    possible. The output Samples carry the recorded times: t_wall is the recorded
+    timestamp and t_monotonic advances exactly as the recording did.
+    '''
+    def __init__(self, filename, column=1, speed: Optional[float] = 1.0, loop=False, timestamped: bool = True):
+        '''
+        :param filename: Path to the CSV file, the first column holds the timestamps.
+        :param column: Index of the column to replay.
+        :param speed: Emission speed, see SyntheticSource.
+        :param loop: Start over at the end of the file instead of finishing.
+        '''
+        super().__init__(speed=speed, timestamped=timestamped)
+        recorded = np.genfromtxt(filename, delimiter=',', usecols=(0, column), ndmin=2)
+        recorded = recorded[~np.isnan(recorded).any(axis=1)]
+        if not len(recorded):
+            raise ValueError(f"'{filename}' has no rows to replay.")
+        self.filename = filename
+        self.timestamps = recorded[:, 0]
+        self.values = recorded[:, 1]
+        self.offsets = self.timestamps - self.timestamps[0]
+        # Keep the typical sample spacing between the end of one pass and the start of the next
+        self.period = self.offsets[-1] + (np.median(np.diff(self.offsets)) if len(self.offsets) > 1 else 1.0)
+        self.loop = loop
+        self.reset()
+
+    def reset(self):
+        self.index = 0  # Next row, counting across loops
+
+    def wall_times(self, offsets, start_wall):
+        return self.timestamps[0] + offsets
+
+    def next_block(self, until, max_samples):
+        rows = len(self.values)
+        if not self.loop and self.index >= rows:
+            return None
+        end = self.index + max_samples if self.loop else min(self.index + max_samples, rows)
+        indices = np.arange(self.index, end)
+        offsets = self.offsets[indices % rows] + (indices // rows) * self.period
+        count = int(np.searchsorted(offsets, until, side='right'))
+        self.index += count
+        return offsets[:count], self.values[indices[:count] % rows]
@@ -0,0 +1,213 @@
+from .AnchorJoin import AnchorJoin
+from .Module import Sample
+from collections import namedtuple
+from typing import Optional
+import numpy as np
+
+# Solution of trilaterate() for m devices and k anchors: positions (m, dim), NaN where there
+# were too few anchors, RMS of the normalized log residuals (m,) and the anchors used (m, k)
+TrilaterationResult = namedtuple('TrilaterationResult', ['position', 'residual', 'used'])
+
+def _solve(matrices: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    # Batched solve of the small normal equations, singular systems give NaN
+    try:
+        return np.linalg.solve(matrices, vectors[..., None])[..., 0]
+    except np.linalg.LinAlgError:
+        solution = np.full(vectors.shape, np.nan)
+        for i, (matrix, vector) in enumerate(zip(matrices, vectors)):
+            try:
+                solution[i] = np.linalg.solve(matrix, vector)
+            except np.linalg.LinAlgError:
+                pass
+        return solution
+
+def linear_fix(anchors: np.ndarray, distances: np.ndarray, used: np.ndarray) -> np.ndarray:
+    '''
+    Closed-form position estimate from the linearized range equations.
+
+    |x - a_i|² = d_i² is linear in (x, |x|²): -2 a_i·x + |x|² = d_i² - |a_i|²,
+    solved by weighted least squares for every device at once. The squared
+    equations weigh far anchors too much, so each is weighted by 1/d⁴.
+
+    :param anchors: Anchor positions, shape (k, dim).
+    :param distances: Distances, shape (m, k), only read where `used` is True.
+    :param used: Boolean mask of the usable distances, shape (m, k).
+    :return: Positions, shape (m, dim), NaN where the system is singular.
+    '''
+    k, dim = anchors.shape
+    A = np.hstack([-2.0 * anchors, np.ones((k, 1))])
+    d = np.where(used, distances, 1.0)
+    b = d * d - np.einsum('ki,ki->k', anchors, anchors)
+    w = used / np.maximum(d, 1e-3) ** 4
+    normal = np.einsum('mk,ki,kj->mij', w, A, A)
+    rhs = np.einsum('mk,ki,mk->mi', w, A, b)
+    return _solve(normal, rhs)[:, :dim]
+
+def gauss_newton(anchors: np.ndarray, distances: np.ndarray, weights: np.ndarray, position: np.ndarray,
+                 iterations: int = 10, tolerance: float = 1e-4, damping: float = 1e-6) -> np.ndarray:
+    '''
+    Refines positions by minimizing sum(w_i * (|x - a_i| - d_i)²) for every device at once.
+
+    :param weights: Weight of each distance, shape (m, k), 0 for unused ones.
+    :param position: Initial positions, shape (m, dim).
+    :param iterations: Maximum number of iterations.
+    :param tolerance: Stop when no position moves more than this.
+    :param damping: Levenberg damping that keeps the steps defined when the geometry is degenerate.
+    :return: Refined positions, shape (m, dim).
+    '''
+    x = position.copy()
+    d = np.where(weights > 0, distances, 0.0)
+    identity = damping * np.eye(anchors.shape[1])
+    for _ in range(iterations):
+        diff = x[:, None, :] - anchors[None, :, :]
+        ranges = np.maximum(np.sqrt(np.einsum('mki,mki->mk', diff, diff)), 1e-9)
+        J = diff / ranges[..., None]
+        r = ranges - d
+        H = np.einsum('mk,mki,mkj->mij', weights, J, J) + identity
+        g = np.einsum('mk,mki,mk->mi', weights, J, r)
+        step = _solve(H, g)
+        step = np.where(np.isfinite(step), step, 0.0)
+        x -= step
+        if np.abs(step).max(initial=0.0) < tolerance:
+            break
+    return x
+
+def _normalized_residuals(anchors, distances, used, relative_std, position) -> np.ndarray:
+    # ln(|x - a_i| / d_i) / relative_std, 0 for unused anchors. The log keeps a distance
+    # that is four times too long as suspicious as one that is four times too short
+    diff = position[:, None, :] - anchors[None, :, :]
+    ranges = np.maximum(np.sqrt(np.einsum('mki,mki->mk', diff, diff)), 1e-3)
+    residual = np.log(ranges / np.maximum(np.where(used, distances, 1.0), 1e-3)) / relative_std
+    return np.where(used & np.isfinite(residual), residual, 0.0)
+
+def trilaterate(anchors, distances, relative_std: float = 0.3, outlier_threshold: float = 3.0,
+                iterations: int = 10, tolerance: float = 1e-4) -> TrilaterationResult:
+    '''
+    Positions of m devices from their distances to k anchors with known positions.
+
+    A linearized least squares fix is refined by Gauss-Newton. Distances from the
+    log-distance model have an error roughly proportional to the distance, so each
+    residual is weighted by 1 / (relative_std * d)². While a device has more anchors
+    than the dim + 1 needed, the anchor with the largest log residual
+    |ln(range / d)| / relative_std is dropped if it exceeds outlier_threshold, and the
+    position refined again. The RMS of these normalized residuals is returned as a
+    quality measure.
+
+    :param anchors: Anchor positions, shape (k, 2) or (k, 3).
+    :param distances: Distances in the same unit, shape (k,) for one device or (m, k).
+                      NaN marks a missing distance.
+    :param relative_std: Expected standard deviation of a distance relative to the distance.
+    :param outlier_threshold: Normalized residual above which an anchor is rejected, None to keep all.
+    :param iterations: Maximum Gauss-Newton iterations per refinement.
+    :param tolerance: Gauss-Newton stops when no position moves more than this.
+    :return: TrilaterationResult, with a single position for a single device.
+    '''
+    anchors = np.asarray(anchors, dtype=float)
+    distances = np.asarray(distances, dtype=float)
+    single = distances.ndim == 1
+    distances = np.atleast_2d(distances)
+    m, k = distances.shape
+    dim = anchors.shape[1]
+    if anchors.shape[0] != k:
+        raise ValueError(f"Got {k} distances per device for {anchors.shape[0]} anchors.")
+
+    used = np.isfinite(distances) & (distances >= 0)
+    scale = relative_std * np.maximum(np.where(used, distances, 1.0), 1e-3)
+    solvable = used.sum(axis=1) > dim
+
+    position = np.full((m, dim), np.nan)
+    rows = np.flatnonzero(solvable)
+    if len(rows):
+        weights = used[rows] / scale[rows] ** 2
+        start = linear_fix(anchors, distances[rows], used[rows])
+        # Fall back to the centroid of the used anchors where the linear system was singular
+        bad = ~np.isfinite(start).all(axis=1)
+        if bad.any():
+            start[bad] = (used[rows][bad] @ anchors) / used[rows][bad].sum(axis=1, keepdims=True)
+        position[rows] = gauss_newton(anchors, distances[rows], weights, start, iterations, tolerance)
+
+    residual = _normalized_residuals(anchors, distances, used, relative_std, position)
+    if outlier_threshold is not None:
+        for _ in range(k - dim - 1):
+            worst = np.argmax(np.abs(residual), axis=1)
+            worst_value = np.abs(residual[np.arange(m), worst])
+            reject = solvable & (used.sum(axis=1) > dim + 1) & (worst_value > outlier_threshold)
+            if not reject.any():
+                break
+            rows = np.flatnonzero(reject)
+            used[rows, worst[rows]] = False
+            weights = used[rows] / scale[rows] ** 2
+            position[rows] = gauss_newton(anchors, distances[rows], weights, position[rows], iterations, tolerance)
+            residual[rows] = _normalized_residuals(anchors, distances[rows], used[rows], relative_std, position[rows])
+
+    count = np.maximum(used.sum(axis=1), 1)
+    rms = np.sqrt((residual ** 2).sum(axis=1) / count)
+    rms[~solvable] = np.nan
+    if single:
+        return TrilaterationResult(position[0], rms[0], used[0])
+    return TrilaterationResult(position, rms, used)
+
+class Trilateration(AnchorJoin):
+    '''
+    Positioning stage: solves for the device position from the distance estimates
+    of three or more access points with known positions (anchors).
+
+    Build one pipeline per anchor, e.g. a MultiBSSIDCollector stream of the
+    anchor's BSSID followed by a LogdistancePathLossModel, and connect() its last
+    module. The distances of one scan are joined on their sequence number (see
+    AnchorJoin) and one position is output per scan, as a Sample whose value is
+    the position as a tuple.
+
+    step() and process_array() take distances in anchor order directly, the latter
+    for many devices at once.
+    '''
+    def __init__(self, anchors: dict, relative_std: float = 0.3, outlier_threshold: Optional[float] = 3.0,
+                 iterations: int = 10, max_pending: int = 4):
+        '''
+        :param anchors: Mapping of anchor name (e.g. BSSID) to its position, (x, y) or (x, y, z) in meters.
+        :param relative_std: Expected standard deviation of a distance relative to the distance.
+        :param outlier_threshold: Normalized residual above which an anchor is rejected, None to keep all.
+        :param iterations: Maximum Gauss-Newton iterations.
+        :param max_pending: Number of incomplete scans kept waiting for missing anchors.
+        '''
+        if len(anchors) < 3:
+            raise ValueError("Trilateration needs at least 3 anchors.")
+        super().__init__(anchors, max_pending)
+        if self.anchors.ndim != 2 or self.anchors.shape[1] not in (2, 3):
+            raise ValueError("Anchor positions must all be 2D or all be 3D.")
+        self.relative_std = relative_std
+        self.outlier_threshold = outlier_threshold
+        self.iterations = iterations
+        self.last_result = None  # TrilaterationResult of the last position
+        self.start()
+
+    def reset(self):
+        self.reset_join()
+
+    def solve(self, distances) -> TrilaterationResult:
+        return trilaterate(self.anchors, distances, self.relative_std, self.outlier_threshold, self.iterations)
+
+    def step(self, value, timestamp=None):
+        '''
+        :param value: Distances in anchor order, or a mapping of anchor name to distance.
+        :return: The position as a NumPy array, None if fewer than dim + 1 distances are known.
+        '''
+        distances = self.anchor_values(value) if isinstance(value, dict) else value
+        self.last_result = self.solve(distances)
+        position = self.last_result.position
+        return None if np.isnan(position).any() else position
+
+    def process_array(self, values, timestamps=None) -> np.ndarray:
+        '''
+        Positions of many devices at once.
+
+        :param values: Distances, shape (m, k) in anchor order, NaN where missing.
+        :return: Positions, shape (m, dim), NaN rows where a device had too few distances.
+        '''
+        self.last_result = self.solve(np.atleast_2d(np.asarray(values, dtype=float)))
+        return self.last_result.position
+
+    def emit(self, sample: Sample, distances: np.ndarray):
+        position = self.step(distances)
+        if position is not None:
+            self.output.put(sample._replace(value=tuple(position.tolist())))
@@ -1,7 +1,15 @@
 from .RSSICollector import RSSICollector
+from .Discovery import DeviceDiscovery, shared_discovery
+from .MultiBSSIDCollector import MultiBSSIDCollector, BSSIDStream
+from .SimulatedRSSISource import SimulatedRSSISource, CSVReplaySource
 from .Pipeline import Pipeline
 from .LogDistancePathLossModel import LogdistancePathLossModel
-from .Module import Module
+from .PathLossCalibration import PathLossCalibrator
+from .Module import Module, Sample
+from .BoundedQueue import BoundedQueue
+from .Scheduler import DeadlineScheduler
+from .Trilateration import Trilateration, trilaterate
+from .ParticleFilter import ParticleFilter
 from .MeanFilter import MeanFilter
 from .MedianFilter import MedianFilter
 from .KalmanFilter import KalmanFilter
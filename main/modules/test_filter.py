@@ -18,14 +18,6 @@ class TESTFilter(Module):
         self.input.put(None)
         self.process_thread.join()
 
-    def process(self):
-        while True:
-            data = self.input.get()
-
-            if data is None:
-                break
-
-            # Process the data here
-            data = data
-
-            self.output.put(data)
+    def step(self, value, timestamp=None):
+        # Process the data here
+        return value
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Modules import `config` and each other relative to main/, as the scripts do
+MAIN = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, MAIN)
+# The plot helpers (capture_loader) live in the repository root
+sys.path.insert(1, os.path.dirname(MAIN))
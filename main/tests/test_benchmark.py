@@ -0,0 +1,39 @@
+import json
+import pytest
+import benchmark
+
+def test_chain_warmup_counts_the_windowed_filters():
+    assert benchmark.chain_warmup([]) == 0
+    assert benchmark.chain_warmup([('MeanFilter', {'window_size': 30}),
+                                   ('KalmanFilter', {'dt': 0.01}),
+                                   ('MedianFilter', {'window_size': 21})]) == 29 + 20
+
+def test_calibrated_model_outputs_from_the_first_sample():
+    model = benchmark.calibrated_model()
+    try:
+        assert model.step(-40) == pytest.approx(model.distance(-40.0))
+    finally:
+        model.stop()
+
+def test_rate_benchmark_runs_past_the_warmup():
+    chain = [('MeanFilter', {'window_size': 30})]
+    metrics = benchmark.bench_pipeline_rate(chain, rate=200, duration=0.01, batch_size=1, seed=1, min_samples=20)
+    assert metrics['duration'] == pytest.approx((29 + 20) / 200)
+    assert metrics['delivered'] > 0
+    assert metrics['emitted'] >= metrics['delivered'] + 29
+
+def test_pipeline_memory_benchmark_delivers_the_samples():
+    metrics = benchmark.bench_pipeline_memory([('MedianFilter', {'window_size': 5})], count=500, batch_size=8, seed=1)
+    assert metrics['delivered'] >= 500
+    assert metrics['peak_bytes'] >= metrics['retained_bytes'] > 0
+
+def test_compare_reports_regressions(tmp_path):
+    def result(throughput, latency):
+        return {'benchmark': 'step', 'name': 'MeanFilter', 'params': {'window_size': 10},
+                'metrics': {'throughput': throughput, 'latency_p50_us': latency}}
+    baseline = tmp_path / 'baseline.json'
+    baseline.write_text(json.dumps({'results': [result(1000.0, 10.0)]}))
+    assert benchmark.compare([result(950.0, 10.5)], baseline, 0.1) == []
+    regressions = benchmark.compare([result(500.0, 20.0)], baseline, 0.1)
+    assert len(regressions) == 2
+    assert 'throughput' in regressions[0] and 'latency_p50_us' in regressions[1]
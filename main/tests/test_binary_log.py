@@ -0,0 +1,72 @@
+import csv
+import math
+import queue
+import numpy as np
+import pytest
+from modules import CSVLogger
+from modules.BinaryLog import (BinaryLogWriter, HEADER, MAGIC, binary_to_csv, csv_to_binary,
+                               is_binary_log, read_binary_log)
+
+ROWS = [[1700000000.25, -61.0, 2.5], [1700000000.5, None, 3.0], [1700000001.0, -63.0, math.nan]]
+
+def write(path, rows, **params):
+    writer = BinaryLogWriter(path, 3, **params)
+    writer.write_rows(rows)
+    writer.close()
+    return writer
+
+def expected(rows):
+    return np.array([[np.nan if value is None else value for value in row] for row in rows])
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_round_trip(tmp_path, mmap):
+    path = tmp_path / 'log.bin'
+    writer = write(path, ROWS, flush_rows=2)
+    assert writer.rows_written == 3
+    assert is_binary_log(path)
+    records = read_binary_log(path, mmap=mmap)
+    assert records.shape == (3, 3)
+    # Timestamps keep full float64 precision, None is stored as NaN
+    assert np.array_equal(records, expected(ROWS), equal_nan=True)
+
+def test_partial_record_is_ignored(tmp_path):
+    path = tmp_path / 'log.bin'
+    write(path, ROWS)
+    with open(path, 'ab') as file:
+        file.write(b'\x00' * 12)  # A record cut off by a crash
+    assert len(read_binary_log(path)) == 3
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'log.csv'
+    path.write_bytes(HEADER.pack(b'NOTALOG\x00', 1, 3))
+    assert not is_binary_log(path)
+    with pytest.raises(ValueError):
+        read_binary_log(path)
+    path.write_bytes(HEADER.pack(MAGIC, 99, 3))
+    with pytest.raises(ValueError):
+        read_binary_log(path)
+
+def test_csv_conversion_round_trip(tmp_path):
+    source = tmp_path / 'log.csv'
+    with open(source, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerows([[1.5, -60, 2.0], [2.5, 'None', 3.0], [3.5, -62], [4.5, -63, 'x'], [5.5, -64, 4.0]])
+    binary, back = tmp_path / 'log.bin', tmp_path / 'back.csv'
+    # Rows with a different number of fields or non-numeric values are skipped
+    assert csv_to_binary(source, binary) == 3
+    assert np.array_equal(read_binary_log(binary), [[1.5, -60, 2.0], [2.5, np.nan, 3.0], [5.5, -64, 4.0]],
+                          equal_nan=True)
+    assert binary_to_csv(binary, back) == 3
+    assert np.array_equal(np.genfromtxt(back, delimiter=','), read_binary_log(binary), equal_nan=True)
+
+@pytest.mark.parametrize('log_format', CSVLogger.WRITERS)
+def test_csv_logger_formats(tmp_path, log_format):
+    path = tmp_path / 'log'
+    logger = CSVLogger(path, [queue.Queue(), queue.Queue()], log_format=log_format, quiet=True)
+    logger.write_headers()
+    logger.record_writer.write_rows([[1.0, -60.0, 2.0]])
+    logger.close()
+    if log_format == 'binary':
+        assert np.array_equal(read_binary_log(path), [[1.0, -60.0, 2.0]])
+    else:
+        assert path.read_text().splitlines() == ['timestamp,output_0,output_1', '1.0,-60.0,2.0']
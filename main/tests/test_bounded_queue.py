@@ -0,0 +1,33 @@
+import pytest
+from modules.BoundedQueue import BoundedQueue
+
+def drain(q):
+    items = []
+    while not q.empty():
+        items.append(q.get_nowait())
+    return items
+
+@pytest.mark.parametrize('overflow, expected', [
+    ('drop_oldest', [None, 4, 5]),
+    ('coalesce_latest', [None, 5]),
+])
+def test_overflow_keeps_the_stop_sentinel(overflow, expected):
+    q = BoundedQueue(maxsize=2, overflow=overflow)
+    for item in (1, 2, None, 3, 4, 5):
+        q.put(item)
+    assert drain(q) == expected
+    assert q.unfinished_tasks == len(expected)
+
+@pytest.mark.parametrize('overflow, depth, last', [
+    ('drop_oldest', 3, 9),
+    ('drop_newest', 3, 2),
+    ('coalesce_latest', 1, 9),
+])
+def test_overflow_counts_dropped_items(overflow, depth, last):
+    q = BoundedQueue(maxsize=3, overflow=overflow)
+    for item in range(10):
+        q.put(item)
+    stats = q.stats()
+    assert stats['depth'] == depth
+    assert stats['dropped'] == 10 - depth
+    assert drain(q)[-1] == last
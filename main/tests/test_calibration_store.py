@@ -0,0 +1,96 @@
+import json
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from modules.PathLossCalibration import CalibrationStore, PathLossCalibrator
+from modules.LogDistancePathLossModel import LogdistancePathLossModel
+
+MAC, BSSID, OTHER_BSSID = 'AA:BB:CC:DD:EE:01', '11:22:33:44:55:66', '11:22:33:44:55:77'
+
+def fitted(PL_0=45.0, n=2.5):
+    calibrator = PathLossCalibrator(P_tx=20)
+    distances = np.array([1.0, 2.0, 4.0, 8.0] * 10)
+    calibrator.update_array(distances, 20 - PL_0 - 10 * n * np.log10(distances))
+    return calibrator
+
+def test_profiles_are_kept_apart(tmp_path):
+    store = CalibrationStore(tmp_path / 'calibration.json')
+    store.save(MAC, BSSID, 'office', fitted(40.0).to_dict())
+    store.save(MAC, OTHER_BSSID, 'office', fitted(50.0).to_dict())
+    store.save(MAC, BSSID, 'hallway', fitted(60.0).to_dict())
+    assert len(store.profiles()) == 3
+    assert store.load(MAC, BSSID, 'office').PL_0 == pytest.approx(40.0, abs=0.1)
+    assert store.load(MAC, OTHER_BSSID, 'office').PL_0 == pytest.approx(50.0, abs=0.1)
+    assert store.load(MAC, BSSID, 'hallway').PL_0 == pytest.approx(60.0, abs=0.1)
+    assert store.load(MAC, BSSID, 'kitchen') is None
+
+def test_keys_are_normalized(tmp_path):
+    store = CalibrationStore(tmp_path / 'calibration.json')
+    store.save(MAC.lower(), BSSID + ':', 'Office', fitted().to_dict())
+    assert store.load(MAC, BSSID, 'office') is not None
+    assert CalibrationStore.key(None, None, 'office') == '*|*|office'
+
+def test_saves_keep_other_writers_profiles(tmp_path):
+    path = tmp_path / 'calibration.json'
+    first, second = CalibrationStore(path), CalibrationStore(path)
+    first.save(MAC, BSSID, None, fitted().to_dict())
+    second.save(MAC, OTHER_BSSID, None, fitted().to_dict())
+    assert len(first.profiles()) == 2
+    assert first.remove(MAC, BSSID, None)
+    assert not first.remove(MAC, BSSID, None)
+    assert list(second.profiles()) == [CalibrationStore.key(MAC, OTHER_BSSID, None)]
+
+def test_unreadable_files_and_profiles(tmp_path):
+    path = tmp_path / 'calibration.json'
+    path.write_text('{"profiles": ')
+    store = CalibrationStore(path)
+    assert store.profiles() == {}
+    path.write_text(json.dumps({'profiles': {CalibrationStore.key(MAC, BSSID, None): {'P_tx': 20}}}))
+    assert store.load(MAC, BSSID, None) is None
+
+def model(path, bssid=None, **params):
+    discovery = SimpleNamespace(mac_address=MAC, connected_bssid=BSSID)
+    return LogdistancePathLossModel(P_tx=20, calibration_file=str(path), bssid=bssid, environment='office',
+                                    discovery=discovery, **params)
+
+def test_model_warm_starts_from_its_profile(tmp_path):
+    path = tmp_path / 'calibration.json'
+    first = model(path, calibration_samples=40)
+    try:
+        distances = np.array([1.0, 2.0, 4.0, 8.0] * 10)
+        for distance, rssi in zip(distances, 20 - 45.0 - 25.0 * np.log10(distances)):
+            first.calibrate_sample(distance, rssi)
+    finally:
+        first.stop()
+    # bssid=None is the connected access point's profile
+    assert list(CalibrationStore(path).profiles()) == [CalibrationStore.key(MAC, BSSID, 'office')]
+
+    second = model(path, bssid=BSSID)
+    other = model(path, bssid=OTHER_BSSID)
+    try:
+        assert second.calibrated
+        assert (second.PL_0, second.n) == pytest.approx((45.0, 2.5), abs=0.1)
+        assert second.step(20 - 45.0 - 25.0 * np.log10(4.0)) == pytest.approx(4.0, rel=0.05)
+        assert not other.calibrated
+        assert other.step(-60) is None
+    finally:
+        second.stop()
+        other.stop()
+
+def test_model_saves_only_new_samples(tmp_path):
+    path = tmp_path / 'calibration.json'
+    CalibrationStore(path).save(MAC, BSSID, 'office', fitted().to_dict())
+    before = path.read_text()
+    unchanged = model(path)
+    unchanged.step(-60)
+    unchanged.stop()
+    assert path.read_text() == before
+
+    refined = model(path, refine=True, calibration_samples=5)
+    try:
+        outputs = [refined.step(-60) for _ in range(5)]
+    finally:
+        refined.stop()
+    # A stored fit outputs from the first reading while it is refined
+    assert None not in outputs
+    assert CalibrationStore(path).load(MAC, BSSID, 'office').count == 45
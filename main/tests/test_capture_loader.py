@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+from capture_loader import Capture, _count_lines, load_capture, minmax_indices
+from modules.BinaryLog import BinaryLogWriter
+
+CAPTURE = (b'1.0,-60,2.0\n'
+           b'\n\n\n'
+           b'2.0,None,3.0\n'
+           b'3.0,-62\n'              # Too few fields, padded with NaN
+           b'4.0,-63,4.0,9\n'        # Too many fields, skipped
+           b'x,-64,5.0\n'            # Invalid timestamp, dropped
+           b'\r\n'
+           b'6.0,-65,6.0')           # No trailing newline
+
+@pytest.fixture
+def capture(tmp_path):
+    path = tmp_path / 'capture.csv'
+    path.write_bytes(CAPTURE)
+    return path
+
+def test_count_lines_skips_blank_runs():
+    assert _count_lines(b'1\n\n\n\n2\n', 1) == (2, 0)
+    assert _count_lines(b'\n\r\n1,2\n \n3\n', 2) == (2, 1)
+
+@pytest.mark.parametrize('chunk_bytes', [7, 16, 1 << 20])
+def test_load_capture(capture, chunk_bytes):
+    loaded = load_capture(capture, chunk_bytes=chunk_bytes)
+    expected = [[1.0, -60, 2.0], [2.0, np.nan, 3.0], [3.0, -62, np.nan], [6.0, -65, 6.0]]
+    assert np.array_equal(loaded.data, expected, equal_nan=True)
+    assert loaded.total_lines == 6
+    assert loaded.bad_lines == 2  # The short and the long line
+    assert loaded.invalid_timestamps == 1
+
+def test_selected_columns(capture):
+    loaded = load_capture(capture, columns=[-1])
+    assert loaded.columns == [0, 2]
+    assert np.array_equal(loaded.column(1), [2.0, 3.0, np.nan, 6.0], equal_nan=True)
+    with pytest.raises(ValueError):
+        load_capture(capture, columns=[5])
+
+def test_binary_capture(tmp_path):
+    path = tmp_path / 'capture.bin'
+    writer = BinaryLogWriter(path, 3)
+    writer.write_rows([[1.0, -60.0, 2.0], [2.0, None, 3.0]])
+    writer.close()
+    loaded = load_capture(path, columns=[0, 2])
+    assert np.array_equal(loaded.data, [[1.0, 2.0], [2.0, 3.0]])
+    assert loaded.total_lines == 2 and loaded.bad_lines == 0
+    assert isinstance(load_capture(path).data, np.memmap)
+
+def test_empty_capture(tmp_path):
+    path = tmp_path / 'capture.csv'
+    path.write_bytes(b'\n\n')
+    with pytest.raises(pd.errors.EmptyDataError):
+        load_capture(path)
+
+def test_minmax_indices_keep_every_extreme():
+    rng = np.random.default_rng(0)
+    x = np.cumsum(rng.uniform(0.5, 1.5, 100000))
+    y = rng.normal(-60, 2, 100000)
+    y[12345], y[67890] = -20.0, -120.0  # Spikes that must stay visible
+    y[500] = np.nan
+    indices = minmax_indices(x, y, 800)
+    assert len(indices) <= 1600
+    assert np.all(np.diff(indices) > 0)
+    assert {12345, 67890} <= set(indices.tolist())
+    # Every bucket's minimum and maximum is drawn
+    edges = np.linspace(x[0], x[-1], 801)
+    bucket = np.clip(np.searchsorted(edges, x[indices], side='right') - 1, 0, 799)
+    for b in range(0, 800, 97):
+        inside = (x >= edges[b]) & ((x < edges[b + 1]) if b < 799 else True)
+        assert np.nanmax(y[inside]) in y[indices[bucket == b]]
+        assert np.nanmin(y[inside]) in y[indices[bucket == b]]
+
+def test_minmax_indices_keep_short_series():
+    assert np.array_equal(minmax_indices(np.arange(10.0), np.arange(10.0), 5), np.arange(10))
+
+def test_decimated_capture():
+    data = np.column_stack([np.arange(10000.0), np.sin(np.arange(10000.0) / 100)])
+    capture = Capture(data, [0, 1])
+    datetimes, values, decimated = capture.decimated(1, 100)
+    assert decimated and len(values) <= 200
+    assert values.max() == data[:, 1].max() and values.min() == data[:, 1].min()
+    assert datetimes.dtype == np.dtype('datetime64[ns]')
+    assert not capture.decimated(1, 10000)[2]
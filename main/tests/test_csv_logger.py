@@ -0,0 +1,68 @@
+import csv
+import queue
+import time
+from modules import CSVLogger, MeanFilter, Pipeline, Sample
+from modules.test_filter import TESTFilter
+
+def sample(seq, value):
+    return Sample(seq, float(seq), 1000.0 + seq, value)
+
+def read_rows(path):
+    with open(path, newline='') as file:
+        return [[float(field) for field in row] for row in csv.reader(file)]
+
+def test_tagged_outputs_are_joined_on_seq(tmp_path):
+    raw, filtered = queue.Queue(), queue.Queue()
+    for seq in range(5):
+        raw.put(sample(seq, -60 - seq))
+    # The filter withheld seq 1 and delivers its outputs as one batch
+    filtered.put([sample(seq, 10 + seq) for seq in (0, 2, 3)])
+    logger = CSVLogger(tmp_path / 'log.csv', [raw, filtered], quiet=True)
+    logger.drain()
+    rows = logger.join_rows()
+    assert rows == [[1000.0, -60, 10], [1002.0, -62, 12], [1003.0, -63, 13]]
+    # seq 4 waits for the filter, seq 1 was given up
+    assert list(logger.pending_tagged[0]) == [4]
+    assert not logger.pending_tagged[1]
+    logger.close()
+
+def test_untagged_outputs_are_paired_in_arrival_order(tmp_path):
+    first, second = queue.Queue(), queue.Queue()
+    for value in (1, 2, 3):
+        first.put(value)
+    for value in (4, 5):
+        second.put(value)
+    logger = CSVLogger(tmp_path / 'log.csv', [first, second], quiet=True)
+    logger.drain()
+    assert [row[1:] for row in logger.join_rows()] == [[1, 4], [2, 5]]
+    assert list(logger.pending[0]) == [3]
+    logger.close()
+
+def test_max_pending_drops_the_oldest(tmp_path):
+    raw, filtered = queue.Queue(), queue.Queue()
+    for seq in range(10):
+        raw.put(sample(seq, seq))
+    logger = CSVLogger(tmp_path / 'log.csv', [raw, filtered], max_pending=3, quiet=True)
+    logger.drain()
+    assert list(logger.pending_tagged[0]) == [7, 8, 9]
+    logger.close()
+
+def test_logs_a_tagged_pipeline(tmp_path):
+    pipeline = Pipeline(capture=True, tag_samples=True)
+    source, mean = TESTFilter(), MeanFilter(window_size=3)
+    pipeline.add_module(source)
+    pipeline.add_module(mean)
+    path = tmp_path / 'log.csv'
+    logger = CSVLogger(path, pipeline.get_outputs(), quiet=True, flush_interval=0.0)
+    logger.start()
+    for value in (1.0, 2.0, 3.0, 4.0, 5.0):
+        source.input.put(value)
+    deadline = time.monotonic() + 5
+    while logger.record_writer.rows_written < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    logger.stop()
+    logger.join()
+    source.stop()
+    mean.stop()
+    # The first two samples are withheld by the filter, every row pairs a sample with its own mean
+    assert [row[1:] for row in read_rows(path)] == [[3.0, 2.0], [4.0, 3.0], [5.0, 4.0]]
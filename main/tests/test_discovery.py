@@ -0,0 +1,100 @@
+import json
+import time
+import pytest
+import modules.Discovery as discovery_module
+from modules.Discovery import DeviceDiscovery
+
+@pytest.fixture
+def lookups(monkeypatch):
+    '''Replaces the system lookups with counters returning fixed values.'''
+    calls = {'mac_address': 0, 'connected_ssid': 0, 'connected_bssid': 0}
+    results = {'mac_address': 'aa:bb:cc:dd:ee:01', 'connected_ssid': 'lab', 'connected_bssid': '11:22:33:44:55:66'}
+
+    def lookup(field):
+        def call(*args):
+            calls[field] += 1
+            return results[field]
+        return call
+    monkeypatch.setattr(discovery_module, 'get_mac_address', lookup('mac_address'))
+    monkeypatch.setattr(discovery_module, 'get_interface_mac', lookup('mac_address'))
+    monkeypatch.setattr(discovery_module, 'get_link_ssid', lookup('connected_ssid'))
+    monkeypatch.setattr(discovery_module, 'get_link_bssid', lookup('connected_bssid'))
+    return calls, results
+
+def discovery(path, **params):
+    return DeviceDiscovery(interface='wlan0', cache_file=str(path), **params)
+
+def test_lookups_are_lazy_and_done_once(tmp_path, lookups):
+    calls, _ = lookups
+    found = discovery(tmp_path / 'discovery.json')
+    assert calls == {'mac_address': 0, 'connected_ssid': 0, 'connected_bssid': 0}
+    assert found.mac_address == 'aa:bb:cc:dd:ee:01'
+    assert found.mac_address == 'aa:bb:cc:dd:ee:01'
+    assert calls == {'mac_address': 1, 'connected_ssid': 0, 'connected_bssid': 0}
+
+def test_cache_is_reused_by_later_runs(tmp_path, lookups):
+    calls, _ = lookups
+    path = tmp_path / 'discovery.json'
+    first = discovery(path)
+    first.mac_address, first.connected_ssid, first.connected_bssid
+    later = discovery(path)
+    assert (later.mac_address, later.connected_ssid, later.connected_bssid) == \
+        ('aa:bb:cc:dd:ee:01', 'lab', '11:22:33:44:55:66')
+    assert calls == {'mac_address': 1, 'connected_ssid': 1, 'connected_bssid': 1}
+
+def test_fields_expire_by_their_own_age(tmp_path, lookups):
+    calls, results = lookups
+    path = tmp_path / 'discovery.json'
+    now = time.time()
+    path.write_text(json.dumps({
+        'interface': 'wlan0', 'mac_address': 'aa:bb:cc:dd:ee:99', 'connected_ssid': 'old',
+        'times': {'interface': now, 'mac_address': now - 10, 'connected_ssid': now - 1000},
+    }))
+    found = discovery(path, cache_ttl=300)
+    assert found.mac_address == 'aa:bb:cc:dd:ee:99'  # Still fresh
+    assert found.connected_ssid == 'lab'              # Expired, looked up again
+    assert calls['mac_address'] == 0 and calls['connected_ssid'] == 1
+
+    # Saving the new SSID does not make the cached MAC address look newer
+    times = json.loads(path.read_text())['times']
+    assert times['mac_address'] == pytest.approx(now - 10)
+    assert times['connected_ssid'] >= now
+
+def test_offline_uses_the_cache_however_old(tmp_path, lookups):
+    calls, _ = lookups
+    path = tmp_path / 'discovery.json'
+    path.write_text(json.dumps({'interface': 'wlan0', 'connected_bssid': '11:22:33:44:55:77',
+                                'times': {'connected_bssid': 0}}))
+    found = discovery(path, offline=True, cache_ttl=1)
+    assert found.connected_bssid == '11:22:33:44:55:77'
+    assert found.connected_ssid is None  # Never scanned for offline
+    assert calls['connected_ssid'] == calls['connected_bssid'] == 0
+    with pytest.raises(ValueError):
+        DeviceDiscovery(interface=None, offline=True)
+
+def test_cache_of_another_interface_is_ignored(tmp_path, lookups):
+    calls, _ = lookups
+    path = tmp_path / 'discovery.json'
+    discovery(path).mac_address
+    other = DeviceDiscovery(interface='wlan1', cache_file=str(path))
+    other.mac_address
+    assert calls['mac_address'] == 2
+
+def test_failed_lookups_are_not_cached(tmp_path, lookups):
+    calls, results = lookups
+    path = tmp_path / 'discovery.json'
+    results['mac_address'] = None
+    assert discovery(path).mac_address is None
+    results['mac_address'] = 'aa:bb:cc:dd:ee:01'
+    assert discovery(path).mac_address == 'aa:bb:cc:dd:ee:01'
+    assert calls['mac_address'] == 2
+
+def test_refresh_forgets_everything(tmp_path, lookups):
+    calls, _ = lookups
+    path = tmp_path / 'discovery.json'
+    found = discovery(path)
+    found.mac_address
+    found.refresh()
+    assert not path.exists()
+    found.mac_address
+    assert calls['mac_address'] == 2
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+from modules import KalmanFilter
+
+@pytest.mark.parametrize('model', KalmanFilter.MODELS)
+def test_values_without_timestamps_use_the_nominal_dt(model):
+    values = np.random.default_rng(0).normal(-60, 2, 200)
+    streamed = KalmanFilter(dt=0.1, process_var=0.005, model=model)
+    batched = KalmanFilter(dt=0.1, process_var=0.005, model=model)
+    fixed = KalmanFilter(dt=0.1, process_var=0.005, model=model, use_timestamps=False)
+    # The same stream filters the same whether it arrives one by one or in batches
+    outputs = [streamed.step(value) for value in values]
+    assert np.allclose(outputs, np.concatenate([batched.process_batch(values[:70]),
+                                                batched.process_batch(values[70:])]))
+    assert np.allclose(outputs, fixed.process_batch(values))
+
+def test_timestamps_set_dt():
+    values = np.random.default_rng(1).normal(-60, 2, 50)
+    timestamps = np.cumsum(np.full(50, 0.5))
+    streamed = KalmanFilter(dt=0.1, process_var=0.005, model='constant_velocity')
+    batched = KalmanFilter(dt=0.1, process_var=0.005, model='constant_velocity')
+    nominal = KalmanFilter(dt=0.1, process_var=0.005, model='constant_velocity')
+    outputs = [streamed.step(value, t) for value, t in zip(values, timestamps)]
+    assert np.allclose(outputs, batched.process_batch(values, timestamps))
+    assert not np.allclose(outputs, nominal.process_batch(values))
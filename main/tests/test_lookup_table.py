@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from modules import LogdistancePathLossModel
+
+@pytest.fixture
+def model():
+    model = LogdistancePathLossModel(P_tx=20, n=2.5, calibration_samples=1)
+    model.step(-45)  # Calibrates PL_0 at 1 m
+    yield model
+    model.stop()
+
+def test_table_matches_the_formula(model):
+    low, high = model.TABLE_RANGE
+    for rssi in range(low, high + 1, 7):
+        assert model.step(rssi) == pytest.approx(model.distance(float(rssi)), rel=1e-12)
+    # Integer-valued floats, NumPy integers and out-of-range or fractional values all agree
+    assert model.step(-60.0) == model.step(-60) == model.step(np.int16(-60))
+    assert model.step(-60.5) == pytest.approx(model.distance(-60.5))
+    assert model.step(-300) == pytest.approx(model.distance(-300.0))
+
+def test_parameter_changes_rebuild_the_table(model):
+    before = model.step(-60)
+    model.n = 3.0
+    assert model.step(-60) == pytest.approx(model.distance(-60.0))
+    assert model.step(-60) != before
+
+def test_process_array_matches_step(model):
+    values = np.array([-40, -60, -80, 200, -200], dtype=np.int32)
+    expected = [model.step(value) for value in values.tolist()]
+    assert np.allclose(model.process_array(values), expected)
+    assert np.allclose(model.process_array(values.astype(float) + 0.25),
+                       model.distance(values.astype(float) + 0.25))
+
+def test_calibration_samples_are_withheld():
+    model = LogdistancePathLossModel(P_tx=20, n=2.0, calibration_samples=3)
+    try:
+        outputs = model.process_array(np.array([-40, -40, -40, -40, -60]))
+    finally:
+        model.stop()
+    assert len(outputs) == 2
+    assert outputs[0] == pytest.approx(1.0)
+    assert outputs[1] == pytest.approx(10.0)
+    with pytest.raises(ValueError):
+        LogdistancePathLossModel().table
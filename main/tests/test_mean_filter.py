@@ -0,0 +1,72 @@
+import math
+import statistics
+import numpy as np
+import pytest
+from modules.MeanFilter import MeanFilter, RollingMean
+
+def rssi(count=300, seed=0):
+    return np.random.default_rng(seed).integers(-75, -55, count).tolist()
+
+def noisy(count=300, seed=0):
+    return np.random.default_rng(seed).normal(-60, 4, count).tolist()
+
+def reference(values, window_size):
+    # What the filter computed before: statistics.mean over each full window
+    return [statistics.mean(values[i - window_size + 1:i + 1]) for i in range(window_size - 1, len(values))]
+
+def run(values, window_size, timestamps=None, **params):
+    module = MeanFilter(window_size, **params)
+    try:
+        if timestamps is None:
+            return [module.step(value) for value in values]
+        return [module.step(value, t) for value, t in zip(values, timestamps)]
+    finally:
+        module.stop()
+
+@pytest.mark.parametrize('window_size', [1, 2, 10, 30])
+def test_window_mode_matches_statistics_mean_on_integers(window_size):
+    values = rssi()
+    outputs = run(values, window_size)
+    assert outputs[:window_size - 1] == [None] * (window_size - 1)
+    # Sums of whole dBm values are exact, so the means are identical
+    assert outputs[window_size - 1:] == reference(values, window_size)
+
+@pytest.mark.parametrize('window_size', [1, 2, 10, 30])
+def test_window_mode_matches_statistics_mean_on_floats(window_size):
+    values = noisy()
+    outputs = run(values, window_size)
+    assert outputs[:window_size - 1] == [None] * (window_size - 1)
+    assert outputs[window_size - 1:] == pytest.approx(reference(values, window_size), rel=1e-14)
+
+def test_long_runs_do_not_drift():
+    # A large offset makes the running sum lose precision without compensation
+    values = (np.random.default_rng(1).normal(0, 1, 50000) + 1e6).tolist()
+    window = RollingMean(100, resync_interval=10 ** 9)
+    for value in values:
+        window.push(value)
+    assert window.mean() == pytest.approx(math.fsum(values[-100:]) / 100, rel=1e-15)
+
+def test_exponential_mode():
+    values = noisy(100)
+    outputs = run(values, 10, mode='exponential')
+    expected, alpha = values[0], 2 / 11
+    for i, value in enumerate(values[1:], start=1):
+        expected += alpha * (value - expected)
+        if i >= 9:
+            assert outputs[i] == pytest.approx(expected)
+    assert outputs[:9] == [None] * 9
+
+def test_time_mode_weights_by_elapsed_time():
+    values = noisy(100)
+    # Evenly spaced samples weigh the same, once the first (weightless) sample left the window
+    even = run(values, 10, timestamps=np.arange(100) * 0.5, mode='time')
+    assert even[10:] == pytest.approx(reference(values, 10)[1:], rel=1e-12)
+    # A sample after a long gap dominates the window
+    timestamps = np.arange(100, dtype=float)
+    timestamps[50:] += 1000
+    gap = run(values, 10, timestamps=timestamps, mode='time')
+    assert gap[50] == pytest.approx(values[50], abs=0.1)
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        MeanFilter(10, mode='median')
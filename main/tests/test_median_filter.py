@@ -0,0 +1,50 @@
+import statistics
+import numpy as np
+import pytest
+from modules.MedianFilter import MedianFilter, RollingMedian
+
+def rssi(count=300, seed=0):
+    # Whole dBm readings with many repeated values, as the drivers report them
+    return np.random.default_rng(seed).integers(-75, -55, count).tolist()
+
+def noisy(count=300, seed=0):
+    return np.random.default_rng(seed).normal(-60, 4, count).tolist()
+
+def reference(values, window_size):
+    # What the filter computed before: statistics.median over each full window
+    return [statistics.median(values[i - window_size + 1:i + 1]) for i in range(window_size - 1, len(values))]
+
+def run(backend, values, window_size):
+    module = MedianFilter(window_size, backend=backend)
+    try:
+        return [module.step(value) for value in values]
+    finally:
+        module.stop()
+
+@pytest.mark.parametrize('values', [rssi(), noisy()], ids=['integer', 'float'])
+@pytest.mark.parametrize('window_size', [1, 2, 5, 10, 21])
+@pytest.mark.parametrize('backend', MedianFilter.BACKENDS)
+def test_step_matches_statistics_median(backend, window_size, values):
+    outputs = run(backend, values, window_size)
+    assert outputs[:window_size - 1] == [None] * (window_size - 1)
+    # Identical, not just close: same values and same types
+    expected = reference(values, window_size)
+    assert outputs[window_size - 1:] == expected
+    assert [type(output) for output in outputs[window_size - 1:]] == [type(value) for value in expected]
+
+def test_rolling_median_evicts_duplicates():
+    window = RollingMedian(3)
+    for value in [-60, -60, -70, -60, -50, -50, -50]:
+        window.push(value)
+        assert sorted(window.ring) == window.sorted
+    assert window.median() == -50
+
+def test_reset_restarts_the_window():
+    values = rssi(50)
+    module = MedianFilter(7)
+    try:
+        first = module.process_array(values)
+        module.reset()
+        assert np.array_equal(module.process_array(values), first)
+    finally:
+        module.stop()
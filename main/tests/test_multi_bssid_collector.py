@@ -0,0 +1,91 @@
+import time
+from types import SimpleNamespace
+from modules import MultiBSSIDCollector, Sample
+
+AP1, AP2, AP3 = '11:22:33:44:55:01', '11:22:33:44:55:02', '11:22:33:44:55:03'
+
+class FakeInterface:
+    '''Returns one prepared list of (ssid, BSSID, signal) per scan, the last one repeated.'''
+    def __init__(self, *scans):
+        self.scans = list(scans)
+        self.count = 0
+
+    def scan(self):
+        self.count += 1
+
+    def scan_results(self):
+        scan = self.scans[min(self.count, len(self.scans)) - 1]
+        return [SimpleNamespace(ssid=ssid, bssid=bssid, signal=signal) for ssid, bssid, signal in scan]
+
+def collector(*scans, **params):
+    return MultiBSSIDCollector(interval=0.01, iface=FakeInterface(*scans), connected_ssid='lab', **params)
+
+def test_one_scan_feeds_every_stream():
+    multi = collector([('lab', AP1 + ':', -50), ('lab', AP2.upper(), -60), ('guest', AP3, -40),
+                       ('lab', AP2, -55)])
+    first, second, connected, missing = (multi.subscribe(AP1), multi.subscribe(AP2),
+                                         multi.subscribe(), multi.subscribe(AP3.replace('03', '09')))
+    readings = multi.scan()
+    # BSSIDs are normalized and a duplicate keeps its strongest entry
+    assert {bssid: sample.value for bssid, sample in readings.items()} == {AP1: -50, AP2: -55, AP3: -40}
+    assert first.output.get_nowait() == readings[AP1]
+    assert second.output.get_nowait().value == -55
+    # Without a BSSID a stream follows the strongest access point of the connected SSID
+    assert connected.output.get_nowait().value == -50
+    assert missing.output.empty()
+    assert multi.ssids[AP3] == 'guest'
+
+def test_readings_of_a_scan_share_its_sequence_number():
+    multi = collector([('lab', AP1, -50), ('lab', AP2, -60)], [('lab', AP1, -51), ('lab', AP2, -61)])
+    streams = [multi.subscribe(AP1), multi.subscribe(AP2)]
+    multi.scan()
+    multi.scan()
+    samples = [[stream.output.get_nowait() for _ in range(2)] for stream in streams]
+    assert all(isinstance(sample, Sample) for row in samples for sample in row)
+    assert [sample.seq for sample in samples[0]] == [sample.seq for sample in samples[1]] == [0, 1]
+    assert samples[0][0].t_monotonic == samples[1][0].t_monotonic
+
+def wait_for_scans(multi, count, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while multi.scans < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+def test_scanning_continues_until_the_last_stream_stops():
+    multi = collector([('lab', AP1, -50)])
+    first, second = multi.subscribe(AP1), multi.subscribe(AP1)
+    first.start()
+    second.start()
+    wait_for_scans(multi, 2)
+    first.stop()
+    scans = multi.scans
+    wait_for_scans(multi, scans + 2)
+    assert multi._thread.is_alive() and multi.scans >= scans + 2
+    second.stop()
+    assert not multi._thread.is_alive()
+    # Stopping a stream twice or unsubscribing a stopped one does not touch the others
+    second.stop()
+    multi.unsubscribe(first)
+    assert multi.streams == [second]
+
+def test_batched_streams_flush_on_stop():
+    multi = collector([('lab', AP1, -50)])
+    stream = multi.subscribe(AP1)
+    stream.configure_batching(batch_size=1000, max_latency=60.0)
+    stream.start()
+    wait_for_scans(multi, 3)
+    stream.stop()
+    batch = stream.output.get_nowait()
+    assert isinstance(batch, list) and len(batch) == multi.scans
+    assert [sample.seq for sample in batch] == list(range(len(batch)))
+
+def test_failed_scans_are_counted():
+    multi = collector([('lab', AP1, -50)])
+    multi.iface.scan_results = lambda: 1 / 0
+    stream = multi.subscribe(AP1)
+    stream.start()
+    deadline = time.monotonic() + 5
+    while multi.failed < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stream.stop()
+    assert multi.timing_stats()['failed_scans'] >= 2
+    assert stream.output.empty()
@@ -0,0 +1,49 @@
+import numpy as np
+from modules import Sample, LogdistancePathLossModel
+from modules.ParticleFilter import ParticleFilter, systematic_resample
+
+ANCHORS = {'a': (0, 0), 'b': (10, 0), 'c': (0, 10), 'd': (10, 10)}
+
+def calibrated_model():
+    model = LogdistancePathLossModel(n=3, calibration_samples=1)
+    model.step(-50)
+    model.stop()
+    return model
+
+def test_systematic_resample_follows_the_weights():
+    rng = np.random.default_rng(0)
+    weights = np.array([0.5, 0.25, 0.25, 0.0])
+    counts = np.bincount(systematic_resample(weights, 8, rng), minlength=4)
+    assert counts.tolist() == [4, 2, 2, 0]
+
+def test_scans_are_emitted_once_in_sequence_order():
+    model = calibrated_model()
+    tracker = ParticleFilter(ANCHORS, model, seed=1, time_budget=None)
+    rssi = model.expected_rssi(np.linalg.norm(tracker.anchors - [3.0, 4.0], axis=1))
+    try:
+        events = [(anchor, seq) for seq in range(5) for anchor in ANCHORS if (anchor, seq) != ('d', 1)]
+        timestamps = []
+        for anchor, seq in events + [('d', 1)]:
+            tracker.handle((anchor, Sample(seq, float(seq), float(seq), rssi[tracker.index[anchor]])))
+            timestamps.append(tracker.last_timestamp)
+        outputs = []
+        while not tracker.output.empty():
+            outputs.append(tracker.output.get_nowait())
+    finally:
+        tracker.stop()
+    assert [sample.seq for sample in outputs] == [0, 1, 2, 3, 4]
+    assert tracker.late == 1
+    # Time never runs backwards for the filter
+    timestamps = [t for t in timestamps if t is not None]
+    assert timestamps == sorted(timestamps)
+
+def test_tracks_a_static_device():
+    model = calibrated_model()
+    tracker = ParticleFilter(ANCHORS, model, seed=1, rssi_std=2.0, motion_std=0.1, time_budget=None)
+    try:
+        rng = np.random.default_rng(2)
+        rssi = model.expected_rssi(np.linalg.norm(tracker.anchors - [3.0, 4.0], axis=1))
+        estimates = tracker.process_array(rssi + rng.normal(0, 2.0, (50, 4)), np.arange(50.0))
+    finally:
+        tracker.stop()
+    assert np.linalg.norm(estimates[-1] - [3.0, 4.0]) < 1.0
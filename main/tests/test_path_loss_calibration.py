@@ -0,0 +1,90 @@
+import math
+import numpy as np
+import pytest
+from modules.PathLossCalibration import PathLossCalibrator
+from modules.LogDistancePathLossModel import LogdistancePathLossModel
+
+def measurements(PL_0=45.0, n=2.7, P_tx=20, count=400, noise=3.0, seed=0):
+    rng = np.random.default_rng(seed)
+    distances = rng.choice([1.0, 2.0, 3.0, 5.0, 10.0, 20.0], count)
+    rssi = P_tx - PL_0 - 10 * n * np.log10(distances) + rng.normal(0, noise, count)
+    return distances, rssi
+
+def regularized_least_squares(calibrator, distances, rssi):
+    # The closed form the recursion must reproduce: least squares on (P_tx - PL_0, n) with the prior as
+    # pseudo-observations weighted by the inverse prior covariance
+    PL_0, n, PL_0_var, n_var = calibrator.prior
+    X = np.column_stack([np.ones(len(distances)), -10 * np.log10(distances / calibrator.d_0)])
+    prior_precision = np.diag([1 / PL_0_var, 1 / n_var])
+    prior_mean = np.array([calibrator.P_tx - (PL_0 if PL_0 is not None else 40.0), n if n is not None else 2.0])
+    a, b = np.linalg.solve(prior_precision + X.T @ X, prior_precision @ prior_mean + X.T @ rssi)
+    return calibrator.P_tx - a, b
+
+def test_recursion_matches_batch_least_squares():
+    distances, rssi = measurements()
+    calibrator = PathLossCalibrator(P_tx=20)
+    PL_0, n = calibrator.update_array(distances, rssi)
+    expected = regularized_least_squares(PathLossCalibrator(P_tx=20), distances, rssi)
+    assert (PL_0, n) == pytest.approx(expected, rel=1e-9)
+    assert (PL_0, n) == pytest.approx((45.0, 2.7), abs=0.5)
+    assert calibrator.count == len(distances)
+    assert calibrator.distances_seen
+    assert calibrator.sigma == pytest.approx(3.0, rel=0.15)
+
+def test_single_distance_keeps_the_prior_exponent():
+    calibrator = PathLossCalibrator(P_tx=20, n=3.0, n_var=1e-6)
+    for rssi in (-50.0, -52.0, -51.0):
+        calibrator.update(4.0, rssi)
+    assert not calibrator.distances_seen
+    assert calibrator.n == pytest.approx(3.0, abs=1e-3)
+    # PL_0 absorbs the readings: -51 dBm at 4 m with n = 3
+    assert calibrator.PL_0 == pytest.approx(20 + 51 - 30 * math.log10(4), abs=0.1)
+    assert math.isnan(PathLossCalibrator().sigma)
+
+def test_forgetting_follows_a_changed_environment():
+    before = measurements(PL_0=40.0, seed=1)
+    after = measurements(PL_0=55.0, seed=2)
+    remembering, forgetting = PathLossCalibrator(P_tx=20), PathLossCalibrator(P_tx=20, forgetting=0.98)
+    for calibrator in (remembering, forgetting):
+        calibrator.update_array(*before)
+        calibrator.update_array(*after)
+    assert forgetting.PL_0 == pytest.approx(55.0, abs=1.5)
+    assert abs(remembering.PL_0 - 55.0) > abs(forgetting.PL_0 - 55.0)
+    with pytest.raises(ValueError):
+        PathLossCalibrator(forgetting=0)
+
+def test_state_round_trip():
+    calibrator = PathLossCalibrator(P_tx=18, d_0=2, forgetting=0.99)
+    calibrator.update_array(*measurements(P_tx=18, count=50))
+    restored = PathLossCalibrator.from_dict(calibrator.to_dict())
+    for name in ('P_tx', 'd_0', 'forgetting', 'prior', 'PL_0', 'n', 'p00', 'p01', 'p11',
+                 'count', 'sse', 'weight', 'log_min', 'log_max'):
+        assert getattr(restored, name) == pytest.approx(getattr(calibrator, name)), name
+    # Both continue identically
+    assert restored.update(7.0, -70.0) == pytest.approx(calibrator.update(7.0, -70.0))
+
+def test_rejects_non_positive_distances():
+    with pytest.raises(ValueError):
+        PathLossCalibrator().update(0.0, -60.0)
+
+def test_model_applies_the_fit():
+    distances, rssi = measurements(count=100)
+    model = LogdistancePathLossModel(P_tx=20, calibration_samples=100)
+    try:
+        for distance, value in zip(distances, rssi):
+            model.calibrate_sample(distance, value)
+        assert model.calibrated
+        assert (model.PL_0, model.n) == pytest.approx((model.calibrator.PL_0, model.calibrator.n))
+        assert model.step(-60) == pytest.approx(model.distance(-60.0))
+    finally:
+        model.stop()
+
+def test_single_distance_calibration_corrects_for_the_initial_distance():
+    model = LogdistancePathLossModel(initial_distance=4, P_tx=20, calibration_samples=3, n=2)
+    try:
+        outputs = [model.step(value) for value in (-50, -52, -51, -51)]
+        assert outputs[:3] == [None] * 3
+        # The calibration RSSI maps back to the initial distance
+        assert outputs[3] == pytest.approx(4.0)
+    finally:
+        model.stop()
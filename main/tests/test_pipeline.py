@@ -0,0 +1,158 @@
+import queue
+import numpy as np
+import pytest
+from modules import KalmanFilter, MeanFilter, MedianFilter, Pipeline, SavitzkyGolayFilter
+from modules.Pipeline import OutputTap
+from modules.test_filter import TESTFilter
+
+def values(count=200, seed=0):
+    return np.random.default_rng(seed).integers(-75, -55, count).astype(float)
+
+def chain():
+    return [TESTFilter(), MeanFilter(window_size=5), MedianFilter(window_size=3)]
+
+def build(modules, **params):
+    pipeline = Pipeline(**params)
+    for module in modules:
+        pipeline.add_module(module)
+    return pipeline
+
+def stop(modules):
+    # Every processing loop stops on a None sentinel (KalmanFilter has no stop())
+    for module in modules:
+        module.input.put(None)
+
+def collect(output, count, timeout=5.0):
+    items = []
+    while len(items) < count:
+        item = output.get(timeout=timeout)
+        items.extend(item if isinstance(item, list) else [item])
+    return items
+
+@pytest.mark.parametrize('module', [
+    lambda: MeanFilter(window_size=10),
+    lambda: MedianFilter(window_size=10),
+    lambda: SavitzkyGolayFilter(window_size=11, polyorder=2),
+    lambda: KalmanFilter(dt=0.1, process_var=0.005),
+], ids=['mean', 'median', 'savitzky_golay', 'kalman'])
+def test_process_array_matches_step(module):
+    stepped, batched = module(), module()
+    try:
+        expected = [output for output in (stepped.step(value) for value in values().tolist()) if output is not None]
+        assert np.allclose(batched.process_array(values()), expected)
+    finally:
+        stop([stepped, batched])
+
+def test_replay_matches_the_threaded_pipeline():
+    modules = chain()
+    build(modules)
+    data = values()
+    try:
+        for value in data.tolist():
+            modules[0].input.put(value)
+        threaded = collect(modules[-1].output, len(data) - 6)
+        outputs = build(chain()).replay(data)
+    finally:
+        stop(modules)
+    assert [len(output) for output in outputs] == [len(data), len(data) - 4, len(data) - 6]
+    assert np.allclose(outputs[-1], threaded)
+
+def test_replay_resets_and_aligns_timestamps(tmp_path):
+    pipeline = build(chain())
+    data = values(50)
+    first = pipeline.replay(data)
+    assert all(np.array_equal(a, b) for a, b in zip(first, pipeline.replay(data)))
+
+    path = tmp_path / 'capture.csv'
+    np.savetxt(path, np.column_stack([np.arange(50) * 0.1, data]), delimiter=',')
+    timestamps, outputs = pipeline.replay_csv(path)
+    assert np.allclose(timestamps, np.arange(50) * 0.1)
+    assert np.allclose(outputs[-1], first[-1])
+    with pytest.raises(ValueError):
+        Pipeline().replay(data)
+
+def test_batched_pipeline_matches_replay():
+    modules = chain()
+    build(modules, batch_size=16, max_latency=0.01)
+    data = values()
+    try:
+        for start in range(0, len(data), 7):
+            modules[0].input.put(data[start:start + 7].tolist())
+        items = []
+        while sum(len(item) for item in items) < len(data) - 6:
+            items.append(modules[-1].output.get(timeout=5))
+    finally:
+        stop(modules)
+    # Batches arrive as non-empty lists, in order
+    assert all(isinstance(item, list) and item for item in items)
+    assert np.allclose(sum(items, []), build(chain()).replay(data)[-1])
+
+def test_batches_keep_samples_aligned():
+    modules = chain()
+    build(modules, batch_size=8, max_latency=0.01, tag_samples=True)
+    data = values(40)
+    try:
+        for value in data.tolist():
+            modules[0].input.put(value)
+        samples = collect(modules[-1].output, len(data) - 6)
+    finally:
+        stop(modules)
+    # The withheld warm-up is at the start, every output keeps the sequence number of its input
+    assert [sample.seq for sample in samples] == list(range(6, len(data)))
+    assert np.allclose([sample.value for sample in samples], build(chain()).replay(data)[-1])
+
+def test_sentinel_inside_a_batch_stops_after_processing():
+    module = TESTFilter()
+    module.configure_batching(batch_size=100, max_latency=1.0)
+    for value in (1.0, 2.0, 3.0):
+        module.input.put(value)
+    module.input.put(None)
+    module.process_thread.join(timeout=5)
+    assert not module.process_thread.is_alive()
+    assert module.output.get_nowait() == [1.0, 2.0, 3.0]
+    with pytest.raises(ValueError):
+        module.configure_batching(batch_size=0)
+
+def test_capture_is_opt_in():
+    modules = chain()
+    pipeline = build(modules)
+    try:
+        assert pipeline.get_outputs() == [modules[-1].output]
+    finally:
+        stop(modules)
+
+    modules = chain()
+    pipeline = Pipeline(capture=True)
+    pipeline.add_module(modules[0])
+    pipeline.add_module(modules[1], capture=False)
+    pipeline.add_module(modules[2])
+    try:
+        outputs = pipeline.get_outputs()
+        # The source is captured, the mean filter connects directly to the median filter
+        assert len(outputs) == 2 and outputs[1] is modules[-1].output
+        assert modules[1].output is modules[2].input
+        for value in (1.0, 2.0, 3.0):
+            modules[0].input.put(value)
+        assert [outputs[0].get(timeout=5) for _ in range(3)] == [1.0, 2.0, 3.0]
+    finally:
+        stop(modules)
+
+def test_tap_readers_are_independent_and_never_block():
+    target = queue.Queue()
+    tap = OutputTap(target, capacity=4)
+    early = tap.subscribe()
+    for value in range(3):
+        tap.put(value)
+    late = tap.subscribe()
+    for value in range(3, 10):
+        tap.put(value)
+    # Every item is forwarded, the readers only see the last `capacity` items
+    assert target.qsize() == 10
+    assert early.drain() == [6, 7, 8, 9] and early.missed == 6
+    assert late.get_nowait() == 6 and late.missed == 3
+    assert late.qsize() == 3
+    with pytest.raises(queue.Empty):
+        early.get(timeout=0.01)
+    assert tap.stats() == {'capacity': 4, 'published': 10}
+    with pytest.raises(ValueError):
+        OutputTap(target, capacity=0)
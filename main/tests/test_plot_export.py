@@ -0,0 +1,29 @@
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.image
+import numpy as np
+import pytest
+from capture_loader import Capture
+from plot2 import figure_columns, plot_combined
+
+@pytest.fixture
+def capture():
+    rng = np.random.default_rng(0)
+    timestamps = 1700000000 + np.arange(2000) * 0.1
+    data = np.column_stack([timestamps, rng.normal(-60, 3, (2000, 12))])
+    return Capture(data, list(range(13)))
+
+def test_figure_columns(capture):
+    figures = figure_columns(capture, plots_per_figure=5)
+    # The timestamp and the last column are not plotted on their own
+    assert [len(columns) for columns in figures] == [5, 5, 1]
+    assert figures[0][0] == ('output_1', 1) and figures[-1][-1] == ('output_11', 11)
+
+def test_parallel_export_matches_sequential(capture, tmp_path):
+    sequential = plot_combined(capture, plots_per_figure=5, save_plots=True, output_dir=tmp_path / 'seq', workers=1)
+    parallel = plot_combined(capture, plots_per_figure=5, save_plots=True, output_dir=tmp_path / 'par', workers=2)
+    assert [path.name for path in sorted((tmp_path / 'seq').iterdir())] == \
+           [path.name for path in sorted((tmp_path / 'par').iterdir())]
+    assert len(sequential) == len(parallel) == 3
+    for (first, _), (second, _) in zip(sequential, parallel):
+        assert np.array_equal(matplotlib.image.imread(first), matplotlib.image.imread(second))
@@ -0,0 +1,57 @@
+from types import SimpleNamespace
+import pytest
+from modules.RSSIBackends import IwLinkBackend, ProcWirelessBackend, ScanBackend, create_link_backend
+
+PROC = (b'Inter-| sta-|   Quality        |   Discarded packets               | Missed | WE\n'
+        b' face | tus | link level noise |  nwid  crypt   frag  retry   misc | beacon | 22\n'
+        b'  eth9: 0000   10.  -70.  -256        0      0      0      0      0        0\n'
+        b' wlan0: 0000   54.  -56.  -256        0      0      0      0      0        0\n'
+        b' wlan1: 0000   40.  200.  -256        0      0      0      0      0        0\n')
+
+IW = b'''Connected to 11:22:33:44:55:66 (on wlan0)
+\tSSID: lab
+\tfreq: 5180
+\tsignal: -48 dBm
+\ttx bitrate: 866.7 MBit/s
+'''
+
+def test_proc_parse():
+    assert ProcWirelessBackend._parse(PROC, 'wlan0') == -56
+    # Drivers reporting an unsigned byte
+    assert ProcWirelessBackend._parse(PROC, 'wlan1') == -56
+    assert ProcWirelessBackend._parse(PROC, 'wlan2') is None
+    # The header lines are never matched
+    assert ProcWirelessBackend._parse(PROC, 'face') is None
+
+def test_proc_rereads_the_file(tmp_path, monkeypatch):
+    path = tmp_path / 'wireless'
+    path.write_bytes(PROC)
+    monkeypatch.setattr(ProcWirelessBackend, 'PATH', str(path))
+    assert ProcWirelessBackend.available('wlan0')
+    assert not ProcWirelessBackend.available('wlan2')
+    backend = create_link_backend('wlan0', 'auto')
+    try:
+        assert isinstance(backend, ProcWirelessBackend)
+        assert backend.read() == -56
+        path.write_bytes(PROC.replace(b'-56.', b'-61.'))
+        assert backend.read() == -61
+    finally:
+        backend.close()
+
+def test_iw_signal():
+    assert int(IwLinkBackend.SIGNAL.search(IW).group(1)) == -48
+    assert IwLinkBackend.SIGNAL.search(b'Not connected.') is None
+
+def test_no_link_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(ProcWirelessBackend, 'PATH', str(tmp_path / 'missing'))
+    monkeypatch.setattr(IwLinkBackend, 'available', classmethod(lambda cls, interface: False))
+    assert create_link_backend('wlan0') is None
+    assert create_link_backend(None) is None
+
+def test_scan_backend_reads_the_connected_ssid():
+    results = [SimpleNamespace(ssid='other', signal=-40), SimpleNamespace(ssid='lab', signal=-67)]
+    iface = SimpleNamespace(scan=lambda: None, scan_results=lambda: results)
+    discovery = SimpleNamespace(wifi_interface=lambda: iface, connected_ssid='lab')
+    assert ScanBackend(discovery).read() == -67
+    discovery.connected_ssid = 'gone'
+    assert ScanBackend(discovery).read() is None
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from scipy.signal import savgol_filter
+from modules.SavitzkyGolayFilter import SavitzkyGolayFilter, savgol_last_point_coeffs
+
+PARAMETERS = [(5, 2), (11, 3), (21, 2), (7, 0), (31, 4)]
+
+def signal(count=200, seed=0):
+    rng = np.random.default_rng(seed)
+    return -60 + 5 * np.sin(np.arange(count) / 10) + rng.normal(0, 2, count)
+
+def reference(values, window_size, polyorder):
+    # What the filter computed before: savgol_filter over each full window, last point
+    return np.array([savgol_filter(values[i - window_size + 1:i + 1], window_size, polyorder)[-1]
+                     for i in range(window_size - 1, len(values))])
+
+def run(backend, values, window_size, polyorder):
+    module = SavitzkyGolayFilter(window_size, polyorder, backend=backend)
+    try:
+        return [module.step(value) for value in values]
+    finally:
+        module.stop()
+
+@pytest.mark.parametrize('window_size, polyorder', PARAMETERS)
+def test_coefficients_match_savgol_filter(window_size, polyorder):
+    window = signal(window_size)
+    coeffs = savgol_last_point_coeffs(window_size, polyorder)
+    assert np.dot(coeffs, window) == pytest.approx(savgol_filter(window, window_size, polyorder)[-1], abs=1e-10)
+
+@pytest.mark.parametrize('window_size, polyorder', PARAMETERS)
+def test_streaming_step_matches_savgol_filter(window_size, polyorder):
+    values = signal()
+    outputs = run('streaming', values, window_size, polyorder)
+    # Nothing is output while the first window fills up
+    assert outputs[:window_size - 1] == [None] * (window_size - 1)
+    assert None not in outputs[window_size - 1:]
+    assert np.allclose(outputs[window_size - 1:], reference(values, window_size, polyorder), atol=1e-9)
+
+@pytest.mark.parametrize('window_size, polyorder', PARAMETERS)
+def test_scipy_backend_matches_streaming(window_size, polyorder):
+    values = signal(80)
+    streaming = run('streaming', values, window_size, polyorder)
+    scipy = run('scipy', values, window_size, polyorder)
+    assert [output is None for output in scipy] == [output is None for output in streaming]
+    assert np.allclose(scipy[window_size - 1:], streaming[window_size - 1:], atol=1e-9)
+
+@pytest.mark.parametrize('window_size, polyorder', PARAMETERS)
+def test_process_array_matches_step(window_size, polyorder):
+    values = signal()
+    module = SavitzkyGolayFilter(window_size, polyorder)
+    try:
+        # Split so that a chunk ends inside the warm-up and the history has to be carried over
+        outputs = np.concatenate([module.process_array(values[:window_size // 2]),
+                                  module.process_array(values[window_size // 2:120]),
+                                  module.process_array(values[120:])])
+    finally:
+        module.stop()
+    assert len(outputs) == len(values) - window_size + 1
+    assert np.allclose(outputs, reference(values, window_size, polyorder), atol=1e-9)
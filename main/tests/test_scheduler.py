@@ -0,0 +1,78 @@
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from modules import RSSICollector, Sample
+from modules.Scheduler import DeadlineScheduler
+
+def test_deadlines_do_not_drift():
+    scheduler = DeadlineScheduler(0.02)
+    scheduler.wait()
+    start = scheduler.started
+    for _ in range(10):
+        time.sleep(0.01)  # Work shorter than the interval does not add to the period
+        scheduler.wait()
+    assert scheduler.deadline == pytest.approx(start + 10 * 0.02)
+    assert time.monotonic() - start < 10 * 0.02 + 0.05
+    assert scheduler.missed == 0
+    assert scheduler.stats()['ticks'] == 11
+
+def test_overruns_skip_deadlines_in_phase():
+    scheduler = DeadlineScheduler(0.05)
+    scheduler.wait()
+    start = scheduler.started
+    time.sleep(0.125)  # Overruns the deadlines at 0.05 and 0.10
+    scheduler.wait()
+    # The latest passed deadline is served at once, the ones before it are skipped
+    assert scheduler.missed == 1
+    assert scheduler.deadline == pytest.approx(start + 0.10)
+    scheduler.wait()
+    assert scheduler.deadline == pytest.approx(start + 0.15)
+
+def test_stop_event_interrupts_the_wait():
+    scheduler = DeadlineScheduler(10.0)
+    stop = threading.Event()
+    assert scheduler.wait(stop)
+    threading.Timer(0.05, stop.set).start()
+    started = time.monotonic()
+    assert not scheduler.wait(stop)
+    assert time.monotonic() - started < 1.0
+    with pytest.raises(ValueError):
+        DeadlineScheduler(-1)
+
+def scan_collector(readings, **params):
+    # A collector on the scan backend reading from a fake interface
+    readings = iter(readings)
+    network = SimpleNamespace(ssid='lab', signal=None)
+    def scan():
+        network.signal = next(readings, -60)
+    iface = SimpleNamespace(scan=scan, scan_results=lambda: [network] if network.signal is not None else [])
+    discovery = SimpleNamespace(interface=None, connected_ssid='lab', wifi_interface=lambda: iface)
+    return RSSICollector(backend='scan', discovery=discovery, **params)
+
+def read(output, count):
+    return [output.get(timeout=5) for _ in range(count)]
+
+def test_collector_outputs_timestamped_samples():
+    collector = scan_collector([-50, None, -52, -53], interval=0.01)
+    collector.start()
+    try:
+        samples = read(collector.output, 3)
+    finally:
+        collector.stop()
+    assert all(isinstance(sample, Sample) for sample in samples)
+    # The failed reading is left out without using up a sequence number
+    assert [sample.value for sample in samples] == [-50, -52, -53]
+    assert [sample.seq for sample in samples] == [0, 1, 2]
+    assert samples[0].t_monotonic < samples[1].t_monotonic < samples[2].t_monotonic
+    assert collector.timing_stats()['failed_readings'] == 1
+
+def test_collector_plain_values_and_batches():
+    collector = scan_collector([-50, -51, -52, -53], interval=0, timestamped=False)
+    collector.configure_batching(batch_size=2, max_latency=1.0)
+    collector.start()
+    try:
+        batches = read(collector.output, 2)
+    finally:
+        collector.stop()
+    assert batches == [[-50, -51], [-52, -53]]
@@ -0,0 +1,75 @@
+import queue
+import numpy as np
+import pytest
+from modules import CSVReplaySource, Sample, SimulatedRSSISource
+
+def drain(source, timeout=5.0):
+    # Reads everything a finite source emits, waiting for it to finish
+    assert source.finished.wait(timeout)
+    source.stop()
+    items = []
+    while True:
+        try:
+            item = source.output.get_nowait()
+        except queue.Empty:
+            return items
+        items.extend(item if isinstance(item, list) else [item])
+
+def test_generation_is_reproducible_and_blockwise():
+    whole = SimulatedRSSISource(rate=100, seed=3, fading_k=1.0, outlier_prob=0.05)
+    parts = SimulatedRSSISource(rate=100, seed=3, fading_k=1.0, outlier_prob=0.05)
+    t, rssi, _ = whole.generate(500)
+    pieces = [parts.generate(count) for count in (1, 99, 400)]
+    assert np.array_equal(t, np.concatenate([piece[0] for piece in pieces]))
+    assert np.allclose(t, np.arange(500) / 100)
+    whole.reset()
+    assert np.array_equal(whole.generate(500)[1], rssi)
+    # Blocks draw the random numbers in a different order, but the statistics are the same
+    assert np.mean(np.concatenate([piece[1] for piece in pieces])) == pytest.approx(rssi.mean(), abs=1.5)
+
+def test_follows_the_path_loss_model():
+    source = SimulatedRSSISource(rate=10, trajectory=[(0, 1), (100, 10)], P_tx=20, PL_0=40, n=2.0,
+                                 shadowing_std=0, quantize=False, seed=0)
+    t, rssi, valid = source.generate(1001)
+    assert valid.all()
+    assert rssi[0] == pytest.approx(-20.0)
+    assert rssi[-1] == pytest.approx(-40.0)
+    assert np.all(np.diff(rssi) <= 0)
+
+def test_shadowing_statistics():
+    source = SimulatedRSSISource(rate=10, shadowing_std=3.0, shadowing_tau=1.0, quantize=False, seed=1)
+    _, rssi, _ = source.generate(100000)
+    shadowing = rssi - rssi.mean()
+    assert shadowing.std() == pytest.approx(3.0, rel=0.05)
+    # Correlation after one sample is exp(-1 / (rate * tau))
+    assert np.corrcoef(shadowing[:-1], shadowing[1:])[0, 1] == pytest.approx(np.exp(-0.1), abs=0.02)
+
+def test_dropouts_are_counted_not_emitted():
+    source = SimulatedRSSISource(rate=1000, duration=1.0, dropout_prob=0.2, seed=2, speed=None)
+    source.start()
+    samples = drain(source)
+    assert len(samples) + source.dropped == 1000
+    assert source.dropped == pytest.approx(200, abs=60)
+    # Sequence numbers count the emitted samples, the timestamps show the gaps
+    assert [sample.seq for sample in samples] == list(range(len(samples)))
+    assert np.all(np.diff([sample.t_monotonic for sample in samples]) > 0)
+
+def test_csv_replay(tmp_path):
+    path = tmp_path / 'capture.csv'
+    timestamps = 1700000000 + np.array([0.0, 0.1, 0.2, 0.4])
+    np.savetxt(path, np.column_stack([timestamps, [-60, -61, -62, -63]]), delimiter=',', fmt='%.3f')
+    source = CSVReplaySource(path, speed=None)
+    source.start()
+    samples = drain(source)
+    assert all(isinstance(sample, Sample) for sample in samples)
+    assert [sample.value for sample in samples] == [-60, -61, -62, -63]
+    assert np.allclose([sample.t_wall for sample in samples], timestamps)
+
+    looped = CSVReplaySource(path, speed=None, loop=True, timestamped=False)
+    offsets, values = looped.next_block(np.inf, 10)
+    # The next pass starts one typical spacing after the last row
+    assert np.allclose(offsets[:6], [0.0, 0.1, 0.2, 0.4, 0.5, 0.6], atol=1e-6)
+    assert values[4] == -60
+    (tmp_path / 'unusable.csv').write_text('time,rssi\n')
+    with pytest.raises(ValueError):
+        CSVReplaySource(tmp_path / 'unusable.csv')
@@ -0,0 +1,74 @@
+import numpy as np
+from modules import Sample
+from modules.Trilateration import Trilateration, trilaterate
+
+ANCHORS = np.array([[0, 0], [10, 0], [0, 10], [10, 10], [5, 12]], dtype=float)
+
+def ranges(positions, anchors=ANCHORS):
+    return np.linalg.norm(np.atleast_2d(positions)[:, None, :] - anchors[None, :, :], axis=2)
+
+def test_exact_distances_give_exact_positions():
+    positions = np.array([[3.0, 4.0], [9.5, 1.0], [5.0, 5.0]])
+    result = trilaterate(ANCHORS, ranges(positions))
+    assert np.allclose(result.position, positions, atol=1e-6)
+    assert result.used.all()
+
+def test_single_device_3d():
+    anchors = np.c_[ANCHORS, [0, 1, 2, 3, 1]]
+    result = trilaterate(anchors, ranges([3.0, 4.0, 1.0], anchors)[0])
+    assert result.position.shape == (3,)
+    assert np.allclose(result.position, [3.0, 4.0, 1.0], atol=1e-6)
+
+def test_outlier_is_rejected():
+    position = np.array([4.0, 6.0])
+    distances = ranges(position)[0]
+    distances[2] *= 4
+    result = trilaterate(ANCHORS, distances)
+    assert not result.used[2]
+    assert result.used.sum() == 4
+    assert np.allclose(result.position, position, atol=1e-3)
+    # Without rejection the outlier pulls the position away
+    kept = trilaterate(ANCHORS, distances, outlier_threshold=None)
+    assert kept.used.all()
+    assert np.linalg.norm(kept.position - position) > 0.5
+
+def test_too_few_anchors_give_nan_rows():
+    distances = ranges([[3.0, 4.0], [6.0, 2.0]])
+    distances[1, 1:] = np.nan  # Only one distance left for the second device
+    result = trilaterate(ANCHORS, distances)
+    assert np.allclose(result.position[0], [3.0, 4.0], atol=1e-6)
+    assert np.isnan(result.position[1]).all()
+    assert np.isnan(result.residual[1])
+
+def joined(events, max_pending=4):
+    stage = Trilateration({'a': (0, 0), 'b': (10, 0), 'c': (0, 10), 'd': (10, 10)}, max_pending=max_pending)
+    distances = ranges([3.0, 4.0], stage.anchors)[0]
+    try:
+        for anchor, seq in events:
+            stage.handle((anchor, Sample(seq, float(seq), float(seq), distances[stage.index[anchor]])))
+        outputs = []
+        while not stage.output.empty():
+            outputs.append(stage.output.get_nowait())
+        return stage, outputs
+    finally:
+        stage.stop()
+
+def test_join_emits_complete_scans():
+    stage, outputs = joined([(anchor, seq) for seq in range(3) for anchor in 'abcd'])
+    assert [sample.seq for sample in outputs] == [0, 1, 2]
+    assert np.allclose(outputs[0].value, (3.0, 4.0), atol=1e-6)
+
+def test_join_flushes_older_scans_in_order_and_drops_late_samples():
+    events = [(anchor, seq) for seq in range(5) for anchor in 'abcd' if (anchor, seq) != ('d', 1)]
+    stage, outputs = joined(events + [('d', 1)])
+    # Scan 1 was overtaken by scan 2 and output with three anchors, before it
+    assert [sample.seq for sample in outputs] == [0, 1, 2, 3, 4]
+    assert stage.late == 1
+    assert not stage.pending
+
+def test_join_flushes_when_too_many_scans_are_pending():
+    stage, outputs = joined([('a', seq) for seq in range(4)] + [('b', seq) for seq in range(4)], max_pending=2)
+    # Only two distances per scan, not enough for a position, but the scans are not kept
+    assert outputs == []
+    assert len(stage.pending) == 2
+    assert stage.last_emitted == 1
@@ -2,40 +2,31 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from datetime import datetime
-import csv
+from capture_loader import load_capture, axes_pixel_width
 
 def read_csv(file_path):
     """
-    Reads the CSV file and returns a pandas DataFrame.
-    Converts the timestamp to datetime objects.
+    Reads the timestamp and last column of a capture file (CSV or binary log).
     """
-    # Read the CSV file without headers
-    df = pd.read_csv(file_path, header=None)
+    # Only the first and last columns are loaded
+    capture = load_capture(file_path, columns=[0, -1])
 
     # Ensure there are at least two columns to select
-    if df.shape[1] < 2:
+    if capture.columns[0] == capture.columns[-1]:
         raise ValueError("CSV file does not contain enough columns.")
 
-    # Select the first and last columns
-    df = df.iloc[:, [0, -1]]  # Keeps columns at index 0 and last index
+    return capture
 
-    # Rename columns for clarity
-    df.columns = ['timestamp', 'output']
-
-    # Convert timestamp to datetime
-    # Assuming the timestamp is in seconds since epoch with fractional seconds
-    df['datetime'] = pd.to_datetime(df['timestamp'], unit='s')
-
-    return df
-
-def plot_data(df):
+def plot_data(capture):
     """
     Plots the output data against time.
     """
     plt.figure(figsize=(12, 6))
     
-    # Plot the output column
-    plt.plot(df['datetime'], df['output'], label='Output', marker='o', linestyle='-')
+    # Plot the output column, reduced to the min/max per pixel of the axes
+    datetimes, values, decimated = capture.decimated(-1, axes_pixel_width(plt.gca()))
+    # Markers only make sense while every sample is drawn
+    plt.plot(datetimes, values, label='Output', marker=None if decimated else 'o', linestyle='-')
 
     # Formatting the x-axis for better readability
     plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
@@ -57,13 +48,13 @@ def main():
 
     try:
         # Read the CSV data
-        df = read_csv(csv_file)
+        capture = read_csv(csv_file)
 
         # Handle missing data by forward filling or interpolation if necessary
         # Here, we'll simply plot the available data points
 
         # Plot the data
-        plot_data(df)
+        plot_data(capture)
 
     except FileNotFoundError:
         print(f"Error: The file '{csv_file}' was not found.")
@@ -1,10 +1,16 @@
 import pandas as pd
+import numpy as np
+import matplotlib
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from math import ceil
 from datetime import datetime
 import os
+import time
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from capture_loader import Capture, load_capture, axes_pixel_width
 
 def setup_logging(log_file='csv_read_errors.log'):
     """
@@ -17,158 +23,194 @@ def setup_logging(log_file='csv_read_errors.log'):
         format='%(asctime)s - %(levelname)s - %(message)s'
     )
 
-def read_csv_and_separate(file_path):
+def read_capture(file_path):
     """
-    Reads the CSV file, handles inconsistent rows, and separates data into
-    all except last columns and the last column.
+    Reads a capture file (CSV or binary log) in one pass with the shared loader,
+    logging the lines that had to be skipped.
 
     Parameters:
-    - file_path: Path to the CSV file.
+    - file_path: Path to the capture file.
 
     Returns:
-    - df_all_except_last: DataFrame containing all columns except the last.
-    - df_last: DataFrame containing only the last column.
+    - capture: Capture with the timestamp in column 0, the outputs of every stage
+      in the following columns and the last column output in the last one.
     """
     try:
-        # Read the CSV file with flexible parsing
-        df = pd.read_csv(
-            file_path,
-            header=None,
-            on_bad_lines='skip',  # Skips lines with too many fields
-            engine='python',      # Use the Python engine for better flexibility
-            delimiter=',',        # Ensure comma is used as delimiter
-            quoting=3,            # QUOTE_NONE to prevent misinterpretation of quotes
-            skip_blank_lines=True # Skip empty lines
-        )
+        capture = load_capture(file_path)
     except Exception as e:
         logging.error(f"Failed to read CSV file '{file_path}': {e}")
         raise
 
-    # Log the number of rows read vs total rows
-    try:
-        total_rows = sum(1 for _ in open(file_path))
-        skipped_rows = total_rows - len(df)
-        if skipped_rows > 0:
-            logging.warning(f"Skipped {skipped_rows} rows due to parsing errors.")
-    except Exception as e:
-        logging.error(f"Failed to count total rows in '{file_path}': {e}")
+    if capture.bad_lines > 0:
+        logging.warning(f"Skipped {capture.bad_lines} rows due to parsing errors.")
+    if capture.invalid_timestamps > 0:
+        logging.warning(f"Dropped {capture.invalid_timestamps} rows due to invalid timestamp conversions.")
 
-    # Determine the expected number of columns based on the first valid row
-    expected_columns = df.shape[1]
-    if expected_columns < 2:
+    if len(capture.columns) < 2:
         raise ValueError("CSV file does not contain enough columns after skipping bad lines.")
 
-    # Separate all except last and the last column
-    df_all_except_last = df.iloc[:, :-1].copy()
-    df_last = df.iloc[:, -1].copy()
+    return capture
 
-    # Rename columns for clarity
-    num_columns = df_all_except_last.shape[1]
-    column_names = ['timestamp'] + [f'output_{i}' for i in range(1, num_columns)]
-    df_all_except_last.columns = column_names
+def figure_columns(capture, plots_per_figure=10):
+    """
+    Splits the output columns except the last into groups of plots_per_figure.
 
-    # Rename last column
-    df_last = df_last.to_frame(name='last_column_output')
+    Returns:
+    - A list with one list of (name, column index) pairs per figure.
+    """
+    # Identify all output columns except last, as (name, column index) pairs
+    output_columns = [(f'output_{i}', i) for i in range(1, len(capture.columns) - 1)]
 
-    # Handle potential missing or malformed data
-    # Drop rows where 'timestamp' or any 'output_*' columns are NaN
-    df_all_except_last.dropna(subset=['timestamp'], inplace=True)
+    if not output_columns:
+        raise ValueError("No output columns found to plot in all_except_last.")
 
-    # Convert timestamp to datetime
-    try:
-        df_all_except_last['datetime'] = pd.to_datetime(df_all_except_last['timestamp'], unit='s', errors='coerce')
-        df_last['datetime'] = pd.to_datetime(df_all_except_last['timestamp'], unit='s', errors='coerce')
-    except Exception as e:
-        logging.error(f"Failed to convert timestamps: {e}")
-        raise
+    # Determine number of figures needed for all_except_last
+    total_figures_all_except_last = ceil(len(output_columns) / plots_per_figure)
+    return [output_columns[fig_num * plots_per_figure:(fig_num + 1) * plots_per_figure]
+            for fig_num in range(total_figures_all_except_last)]
 
-    # Drop rows with invalid datetime conversions
-    invalid_datetime_all = df_all_except_last['datetime'].isna().sum()
-    invalid_datetime_last = df_last['datetime'].isna().sum()
+def draw_figure(capture, current_columns):
+    """
+    Draws one figure with a subplot per column in current_columns and the last column below them.
 
-    if invalid_datetime_all > 0:
-        logging.warning(f"Dropped {invalid_datetime_all} rows from all_except_last due to invalid timestamp conversions.")
-        df_all_except_last = df_all_except_last.dropna(subset=['datetime'])
+    Returns:
+    - The matplotlib Figure.
+    """
+    num_current = len(current_columns)
+    cols = 2  # Number of columns in the subplot grid
+    rows = ceil(num_current / cols)
+
+    # Create a figure with subplots for all_except_last and one for last_column
+    fig = plt.figure(figsize=(15, 5 * rows + 5))  # Extra space for last_column plot
+    gs = fig.add_gridspec(rows + 1, cols)  # +1 for last_column plot
+
+    # Plot all_except_last in subplots, each reduced to the min/max per pixel of its axes
+    for idx, (col, column_index) in enumerate(current_columns):
+        ax = fig.add_subplot(gs[idx // cols, idx % cols])
+        datetimes, values, decimated = capture.decimated(column_index, axes_pixel_width(ax))
+        ax.plot(datetimes, values, label=col, marker=None if decimated else 'o', linestyle='-')
+        ax.set_xlabel('Time')
+        ax.set_ylabel('Output Value')
+        ax.set_title(f'{col} Over Time')
+        ax.legend(loc='upper right')
+        ax.grid(True)
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %H:%M:%S'))
+        ax.xaxis.set_major_locator(mdates.AutoDateLocator())
+        plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+
+    # Plot last_column in the last subplot spanning all columns
+    ax_last = fig.add_subplot(gs[rows, :])  # Last row, span all columns
+    datetimes, values, decimated = capture.decimated(-1, axes_pixel_width(ax_last))
+    ax_last.plot(datetimes, values, label='Last Column Output', color='black',
+                 marker=None if decimated else 'o', linestyle='-')
+    ax_last.set_xlabel('Time')
+    ax_last.set_ylabel('Last Column Value')
+    ax_last.set_title('Last Column Output Over Time')
+    ax_last.legend(loc='upper right')
+    ax_last.grid(True)
+    ax_last.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %H:%M:%S'))
+    ax_last.xaxis.set_major_locator(mdates.AutoDateLocator())
+    plt.setp(ax_last.get_xticklabels(), rotation=45, ha='right')
+
+    fig.tight_layout()
+    return fig
+
+def save_figure(capture, fig_num, current_columns, output_dir):
+    """
+    Draws one figure and saves it as a PNG file.
 
-    if invalid_datetime_last > 0:
-        logging.warning(f"Dropped {invalid_datetime_last} rows from last_column_output due to invalid timestamp conversions.")
-        df_last = df_last.dropna(subset=['datetime'])
+    Returns:
+    - (plot_filename, render time in seconds)
+    """
+    start = time.perf_counter()
+    fig = draw_figure(capture, current_columns)
+    plot_filename = os.path.join(output_dir, f'combined_plot_figure_{fig_num + 1}.png')
+    fig.savefig(plot_filename)
+    plt.close(fig)
+    return plot_filename, time.perf_counter() - start
+
+# Capture shared with the export worker processes, see _init_export_worker
+_worker_capture = None
+_worker_memory = None
+
+def _init_export_worker(memory_name, shape, columns):
+    """
+    Runs once in every export worker: switches to the Agg backend and maps the
+    decoded capture from shared memory instead of reading the file again.
+    """
+    global _worker_capture, _worker_memory
+    matplotlib.use('Agg', force=True)
+    _worker_memory = shared_memory.SharedMemory(name=memory_name)
+    data = np.ndarray(shape, dtype=np.float64, buffer=_worker_memory.buf)
+    _worker_capture = Capture(data, columns)
 
-    return df_all_except_last, df_last
+def _export_figure(fig_num, current_columns, output_dir):
+    return save_figure(_worker_capture, fig_num, current_columns, output_dir)
 
-def plot_combined(df_all_except_last, df_last, plots_per_figure=10, save_plots=False, output_dir='plots'):
+def export_figures_parallel(capture, figures, output_dir, workers=None):
+    """
+    Renders and saves the figures concurrently in a process pool with the Agg backend.
+    The decoded capture is copied once into shared memory that every worker maps.
+
+    Parameters:
+    - figures: Column groups returned by figure_columns.
+    - workers: Number of worker processes, defaults to the number of CPUs.
+
+    Returns:
+    - A list of (plot_filename, render time in seconds), one per figure.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(figures))
+    memory = shared_memory.SharedMemory(create=True, size=max(1, capture.data.nbytes))
+    try:
+        np.ndarray(capture.data.shape, dtype=np.float64, buffer=memory.buf)[:] = capture.data
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_export_worker,
+                                 initargs=(memory.name, capture.data.shape, capture.columns)) as executor:
+            futures = [executor.submit(_export_figure, fig_num, current_columns, output_dir)
+                       for fig_num, current_columns in enumerate(figures)]
+            results = []
+            for future in futures:
+                plot_filename, seconds = future.result()
+                print(f"Saved: {plot_filename} ({seconds:.2f} s)")
+                results.append((plot_filename, seconds))
+            return results
+    finally:
+        memory.close()
+        memory.unlink()
+
+def plot_combined(capture, plots_per_figure=10, save_plots=False, output_dir='plots', workers=1):
     """
     Plots all columns except the last and the last column in the same figure.
 
     Parameters:
-    - df_all_except_last: DataFrame containing all columns except the last.
-    - df_last: DataFrame containing only the last column.
+    - capture: Capture returned by read_capture.
     - plots_per_figure: Number of output plots per figure for all_except_last.
     - save_plots: If True, saves plots as PNG files instead of displaying.
     - output_dir: Directory to save plots if save_plots is True.
+    - workers: Number of processes rendering figures when save_plots is True,
+      None for one per CPU. 1 renders them one after another in this process.
+
+    Returns:
+    - When save_plots is True, a list of (plot_filename, render time in seconds).
     """
-    # Identify all output columns except last
-    output_columns = [col for col in df_all_except_last.columns if col.startswith('output_')]
+    figures = figure_columns(capture, plots_per_figure)
 
-    if not output_columns:
-        raise ValueError("No output columns found to plot in all_except_last.")
+    if not save_plots:
+        for current_columns in figures:
+            draw_figure(capture, current_columns)
+            plt.show()
+        return None
 
-    # Total number of output columns except last
-    total_output_columns = len(output_columns)
+    # Create output directory if it doesn't exist
+    os.makedirs(output_dir, exist_ok=True)
+    if workers != 1 and len(figures) > 1:
+        return export_figures_parallel(capture, figures, output_dir, workers)
 
-    # Determine number of figures needed for all_except_last
-    total_figures_all_except_last = ceil(total_output_columns / plots_per_figure)
-
-    # Prepare to plot
-    for fig_num in range(total_figures_all_except_last):
-        start_idx = fig_num * plots_per_figure
-        end_idx = min(start_idx + plots_per_figure, total_output_columns)
-        current_columns = output_columns[start_idx:end_idx]
-
-        num_current = len(current_columns)
-        cols = 2  # Number of columns in the subplot grid
-        rows = ceil(num_current / cols)
-
-        # Create a figure with subplots for all_except_last and one for last_column
-        fig = plt.figure(figsize=(15, 5 * rows + 5))  # Extra space for last_column plot
-        gs = fig.add_gridspec(rows + 1, cols)  # +1 for last_column plot
-
-        # Plot all_except_last in subplots
-        for idx, col in enumerate(current_columns):
-            ax = fig.add_subplot(gs[idx // cols, idx % cols])
-            ax.plot(df_all_except_last['datetime'], df_all_except_last[col], label=col, marker='o', linestyle='-')
-            ax.set_xlabel('Time')
-            ax.set_ylabel('Output Value')
-            ax.set_title(f'{col} Over Time')
-            ax.legend(loc='upper right')
-            ax.grid(True)
-            ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %H:%M:%S'))
-            ax.xaxis.set_major_locator(mdates.AutoDateLocator())
-            plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
-
-        # Plot last_column in the last subplot spanning all columns
-        ax_last = fig.add_subplot(gs[rows, :])  # Last row, span all columns
-        ax_last.plot(df_last['datetime'], df_last['last_column_output'], label='Last Column Output', color='black', marker='o', linestyle='-')
-        ax_last.set_xlabel('Time')
-        ax_last.set_ylabel('Last Column Value')
-        ax_last.set_title('Last Column Output Over Time')
-        ax_last.legend(loc='upper right')
-        ax_last.grid(True)
-        ax_last.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %H:%M:%S'))
-        ax_last.xaxis.set_major_locator(mdates.AutoDateLocator())
-        plt.setp(ax_last.get_xticklabels(), rotation=45, ha='right')
-
-        plt.tight_layout()
-
-        if save_plots:
-            # Create output directory if it doesn't exist
-            os.makedirs(output_dir, exist_ok=True)
-            plot_filename = os.path.join(output_dir, f'combined_plot_figure_{fig_num + 1}.png')
-            plt.savefig(plot_filename)
-            print(f"Saved: {plot_filename}")
-            plt.close(fig)
-        else:
-            plt.show()
+    results = []
+    for fig_num, current_columns in enumerate(figures):
+        plot_filename, seconds = save_figure(capture, fig_num, current_columns, output_dir)
+        print(f"Saved: {plot_filename} ({seconds:.2f} s)")
+        results.append((plot_filename, seconds))
+    return results
 
 def main():
     # Setup logging
@@ -178,16 +220,18 @@ def main():
     csv_file = 'rssi_output.csv'
 
     try:
-        # Read and separate the CSV data
-        df_all_except_last, df_last = read_csv_and_separate(csv_file)
+        # Read the CSV data
+        capture = read_capture(csv_file)
 
         # Parameters
         plots_per_figure = 10  # Adjust based on preference and number of columns
         save_plots = False      # Set to True to save plots instead of displaying
         output_dir = 'plots'    # Directory to save plots
+        workers = None          # Processes rendering saved plots, None for one per CPU
 
         # Plot the combined data
-        plot_combined(df_all_except_last, df_last, plots_per_figure=plots_per_figure, save_plots=save_plots, output_dir=output_dir)
+        plot_combined(capture, plots_per_figure=plots_per_figure, save_plots=save_plots, output_dir=output_dir,
+                      workers=workers)
 
     except FileNotFoundError:
         print(f"Error: The file '{csv_file}' was not found.")